@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.benchmark
+
+Compares the cost of the parsing entry points on the same input:
+
+tokenize   Tokenizing only.
+recognize  pgen2.dfa.recognize(), which validates without building a tree.
+parse      pgen2.dfa.parsetok(), which builds the full tree.
+
+The tokens are read into a list before timing the recognize and parse
+stages, so those timings exclude the tokenizer.  Each stage is run repeat
+times and the best time is kept.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import timeit
+
+from . import dfa
+
+# ______________________________________________________________________
+# Function definitions
+
+def bestTime (function, repeat = 3):
+    """bestTime()
+    Returns the shortest of repeat timings of a call to function.
+    """
+    timer = timeit.default_timer
+    best = None
+    for count in range(repeat):
+        start = timer()
+        function()
+        elapsed = timer() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+    return best
+
+# ______________________________________________________________________
+
+def benchmark (parser, text, repeat = 3):
+    """benchmark()
+    Times each stage on an input string with a PyPgenParser.  Returns a
+    list of (stage name, seconds) pairs along with the token count.
+    """
+    tokens = list(parser.tokenizeString(text))
+    grammar = parser.parseGrammar
+    start = parser.start
+    error = dfa.recognize(iter(tokens), grammar, start)
+    if error is not None:
+        raise SyntaxError("Error in line %d%s" % error)
+    results = [
+        ("tokenize",
+         bestTime(lambda : list(parser.tokenizeString(text)), repeat)),
+        ("recognize",
+         bestTime(lambda : dfa.recognize(iter(tokens), grammar, start),
+                  repeat)),
+        ("parse",
+         bestTime(lambda : dfa.parsetok(iter(tokens), grammar, start),
+                  repeat)),
+    ]
+    return results, len(tokens)
+
+# ______________________________________________________________________
+
+def report (results, tokenCount):
+    """report()
+    Formats benchmark() results as a table, with each stage's throughput
+    and its time relative to the parse stage.
+    """
+    times = dict(results)
+    lines = ["%-10s %10s %14s %9s" % ("stage", "seconds", "tokens/s",
+                                      "vs parse")]
+    for stage, seconds in results:
+        rate = tokenCount / seconds if seconds > 0 else float("inf")
+        lines.append("%-10s %10.4f %14.0f %8.2fx" % (
+            stage, seconds, rate, seconds / times["parse"]))
+    return "\n".join(lines)
+
+# ______________________________________________________________________
+
+def main (*args):
+    """main()
+    Usage: benchmark.py <grammar.pgen> <start symbol> [file ...]
+    Prints the timings of each stage over the concatenated files.
+    """
+    from . import parser, pgen
+    grammarParser = pgen.buildParser(parser.parse_file(args[0]))
+    grammarParser.setStart(grammarParser.stringToSymbolMap()[args[1]])
+    texts = []
+    for filename in args[2:]:
+        with open(filename) as fileObj:
+            texts.append(fileObj.read())
+    results, tokenCount = benchmark(grammarParser, "".join(texts))
+    print("%d tokens" % tokenCount)
+    print(report(results, tokenCount))
+
+# ______________________________________________________________________
+
+if __name__ == "__main__":
+    import sys
+    main(*(sys.argv[1:]))
+
+# ______________________________________________________________________
+# End of pgen2.benchmark
@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.cache
+
+Content-addressed cache of parse trees.
+
+Entries are keyed by (hash of the input text, grammar fingerprint, start
+symbol), so an unchanged input parsed with the same grammar skips
+tokenizing and parsing entirely.  The cache has a bounded in-memory LRU
+tier and an optional on-disk tier (one pgen2.treecodec file per entry in a
+directory).
+Pass a ParseCache to pgen2.pgen.PyPgenParser to use it.
+
+Trees returned from the cache are shared between callers; treat them as
+read-only.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import os
+import threading
+
+from . import treecodec
+
+# ______________________________________________________________________
+# Module data
+
+DISK_SUFFIX = ".tree"
+
+# ______________________________________________________________________
+
+def contentHash (content):
+    """contentHash()
+    Returns the hex SHA-1 digest of an input string.
+    """
+    if not isinstance(content, bytes):
+        content = content.encode("utf-8")
+    return hashlib.sha1(content).hexdigest()
+
+# ______________________________________________________________________
+
+class ParseCache (object):
+    """Class ParseCache
+
+    Parse tree cache with an in-memory LRU tier holding up to maxsize trees
+    and, if directory is given, an on-disk tier that persists across runs.
+    """
+    # ____________________________________________________________
+    def __init__ (self, maxsize = 128, directory = None):
+        """ParseCache.__init__
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        if (directory is not None) and (not os.path.isdir(directory)):
+            os.makedirs(directory)
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+
+    # ____________________________________________________________
+    def key (self, content, fingerprint, start):
+        """ParseCache.key
+        Returns the cache key for an input string.
+        """
+        return (fingerprint, start, contentHash(content))
+
+    # ____________________________________________________________
+    def diskPath (self, key):
+        """ParseCache.diskPath
+        """
+        fingerprint, start, digest = key
+        return os.path.join(self.directory, "%s-%d-%s%s" % (
+            fingerprint, start, digest, DISK_SUFFIX))
+
+    # ____________________________________________________________
+    def get (self, content, fingerprint, start):
+        """ParseCache.get
+        Returns the cached tree for the input, or None.
+        """
+        key = self.key(content, fingerprint, start)
+        with self.lock:
+            tree = self.entries.pop(key, None)
+            if tree is not None:
+                self.entries[key] = tree
+                self.hits += 1
+                return tree
+        if self.directory is not None:
+            tree = self.readDisk(key)
+            if tree is not None:
+                with self.lock:
+                    self.diskHits += 1
+                    self.remember(key, tree)
+                return tree
+        with self.lock:
+            self.misses += 1
+        return None
+
+    # ____________________________________________________________
+    def put (self, content, fingerprint, start, tree):
+        """ParseCache.put
+        Stores the tree for the input in both tiers.
+        """
+        key = self.key(content, fingerprint, start)
+        with self.lock:
+            self.remember(key, tree)
+        if self.directory is not None:
+            self.writeDisk(key, tree)
+
+    # ____________________________________________________________
+    def remember (self, key, tree):
+        """ParseCache.remember
+        Adds an entry to the in-memory tier, evicting the least recently
+        used entries past maxsize.  The caller holds the lock.
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = tree
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last = False)
+
+    # ____________________________________________________________
+    def readDisk (self, key):
+        """ParseCache.readDisk
+        """
+        try:
+            with open(self.diskPath(key), "rb") as fileObj:
+                return treecodec.load(fileObj)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+    # ____________________________________________________________
+    def writeDisk (self, key, tree):
+        """ParseCache.writeDisk
+        Writes through a temporary file so readers never see a partial
+        entry.
+        """
+        path = self.diskPath(key)
+        tempPath = "%s.%d.%d" % (path, os.getpid(),
+                                 threading.current_thread().ident)
+        with open(tempPath, "wb") as fileObj:
+            treecodec.dump(tree, fileObj)
+        try:
+            os.rename(tempPath, path)
+        except OSError:
+            # Windows won't rename over an existing entry.
+            os.remove(tempPath)
+
+    # ____________________________________________________________
+    def invalidate (self, content = None, fingerprint = None, start = None):
+        """ParseCache.invalidate
+        Drops every entry matching all of the given criteria from both
+        tiers: the input text, the grammar fingerprint and the start
+        symbol.  With no arguments this clears the cache.
+        """
+        digest = None
+        if content is not None:
+            digest = contentHash(content)
+        def matches (key):
+            return (((fingerprint is None) or (key[0] == fingerprint)) and
+                    ((start is None) or (key[1] == start)) and
+                    ((digest is None) or (key[2] == digest)))
+        with self.lock:
+            for key in [key for key in self.entries if matches(key)]:
+                del self.entries[key]
+        if self.directory is not None:
+            for fileName in os.listdir(self.directory):
+                if not fileName.endswith(DISK_SUFFIX):
+                    continue
+                parts = fileName[:-len(DISK_SUFFIX)].split("-")
+                if len(parts) != 3:
+                    continue
+                try:
+                    key = (parts[0], int(parts[1]), parts[2])
+                except ValueError:
+                    continue
+                if matches(key):
+                    try:
+                        os.remove(os.path.join(self.directory, fileName))
+                    except OSError:
+                        pass
+
+    # ____________________________________________________________
+    def clear (self):
+        """ParseCache.clear
+        """
+        self.invalidate()
+
+    # ____________________________________________________________
+    def stats (self):
+        """ParseCache.stats
+        Returns a dictionary of hit/miss counters and the in-memory size.
+        """
+        with self.lock:
+            return {"hits" : self.hits, "diskHits" : self.diskHits,
+                    "misses" : self.misses, "size" : len(self.entries)}
+
+# ______________________________________________________________________
+# End of pgen2.cache
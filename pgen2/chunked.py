@@ -0,0 +1,231 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.chunked
+
+Parallel parsing of one large input, split at top-level boundaries.
+
+When the start rule is a repetition (as in "file_input: (NEWLINE | stmt)*
+ENDMARKER"), a long token stream can be cut into chunks at tokens where the
+parse is back in the start DFA's initial (repetition) state.  splitPoints()
+pre-scans the tokens for candidate cuts: tokens at bracket and indentation
+depth zero that follow a NEWLINE or DEDENT and can start a new item of the
+repetition.  Each chunk is then parsed in a worker process from the
+repetition state, and the children of the chunk roots are stitched into a
+single root node.
+
+A lexical cut is not always a parser boundary (a NEWLINE ending a decorator
+line, say, is followed by more of the same statement).  Every worker
+therefore checks that the token after its chunk would pop the parse back to
+the repetition state, as the serial parser would do.  The input is parsed
+serially from the first chunk whose check fails, so the tree, or the
+SyntaxError, is always identical to what pgen2.dfa.parsetok() produces.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import token
+
+from . import dfa
+
+# ______________________________________________________________________
+# Module data
+
+# Chunks are cut at the first candidate split point at least this many
+# tokens after the previous cut.
+CHUNK_TOKENS = 20000
+
+OPEN_BRACKETS = ("(", "[", "{")
+CLOSE_BRACKETS = (")", "]", "}")
+
+# Grammar of the current worker process, set by initWorker().
+workerGrammar = None
+
+# ______________________________________________________________________
+# Function definitions
+
+def repetitionState (grammar, start):
+    """repetitionState()
+    Returns the initial state of the start DFA of an accelerated grammar if
+    the start rule loops back to it (so the rule is a repetition), else
+    None.
+    """
+    startDFA = dfa.findDFA(grammar, start)
+    initial = startDFA[2]
+    for label, arrow in startDFA[3][initial][0]:
+        if arrow == initial:
+            return startDFA[3][initial]
+    return None
+
+# ______________________________________________________________________
+
+def canStart (grammar, state, type, name):
+    """canStart()
+    Returns True if a token has a shift or push arc in the accelerator of
+    an accelerated DFA state.
+    """
+    ilabel = dfa.classify(grammar, type, name)
+    accelUpper, accelLower, accelTable = state[1]
+    return ((accelLower <= ilabel < accelUpper) and
+            (-1 != accelTable[ilabel - accelLower]))
+
+# ______________________________________________________________________
+
+def splitPoints (tokens, grammar, start, chunkSize = CHUNK_TOKENS):
+    """splitPoints()
+    Returns the list of token indices at which to cut a token list into
+    chunks of at least chunkSize tokens, or an empty list if the start rule
+    is not a repetition.
+    """
+    grammar = dfa.addAccelerators(grammar)
+    state = repetitionState(grammar, start)
+    if state is None:
+        return []
+    points = []
+    brackets = 0
+    indents = 0
+    previous = None
+    last = 0
+    for index, (type, name, lineno) in enumerate(tokens):
+        if ((index - last >= chunkSize) and (0 == brackets) and
+            (0 == indents) and (previous in (token.NEWLINE, token.DEDENT)) and
+            (index < len(tokens) - 1) and
+            canStart(grammar, state, type, name)):
+            points.append(index)
+            last = index
+        if type == token.INDENT:
+            indents += 1
+        elif type == token.DEDENT:
+            indents -= 1
+        elif type not in (token.STRING, token.NAME):
+            if name in OPEN_BRACKETS:
+                brackets += 1
+            elif (name in CLOSE_BRACKETS) and (brackets > 0):
+                brackets -= 1
+        previous = type
+    return points
+
+# ______________________________________________________________________
+
+def popsToState (grammar, stack, state, type, name):
+    """popsToState()
+    Returns True if adding a token to a parse stack would first pop it down
+    to a single level in the given state, and the token would then be
+    accepted there.
+    """
+    ilabel = dfa.classify(grammar, type, name)
+    for level in range(len(stack) - 1, -1, -1):
+        levelState = stack[level][0]
+        accelUpper, accelLower, accelTable = levelState[1]
+        if ((accelLower <= ilabel < accelUpper) and
+            (-1 != accelTable[ilabel - accelLower])):
+            return (0 == level) and (levelState is state)
+        if not levelState[2]:
+            return False
+    return False
+
+# ______________________________________________________________________
+
+def parseChunk (grammar, start, tokens, lookahead):
+    """parseChunk()
+    Parses a chunk of tokens from the repetition state of the start rule.
+    lookahead is the first token of the next chunk, or None for the last
+    chunk.  Returns the list of child nodes of the chunk, or None if the
+    chunk does not end on a boundary of the serial parse (or has a syntax
+    error).
+    """
+    grammar = dfa.addAccelerators(grammar)
+    state = repetitionState(grammar, start)
+    rootNode = ((start, None, 0), [])
+    startDFA = dfa.findDFA(grammar, start)
+    stack = [(state, startDFA, rootNode)]
+    result = dfa.E_OK
+    count = 0
+    for type, name, lineno in tokens:
+        result, stack, errMsg = dfa.addToken(grammar, stack, type, name,
+                                             lineno)
+        count += 1
+        if result != dfa.E_OK:
+            break
+    if count != len(tokens):
+        return None
+    if lookahead is None:
+        if result != dfa.E_DONE:
+            return None
+    elif ((result != dfa.E_OK) or
+          (not popsToState(grammar, stack, state, lookahead[0],
+                           lookahead[1]))):
+        return None
+    return rootNode[1]
+
+# ______________________________________________________________________
+
+def initWorker (grammar):
+    """initWorker()
+    Pool initializer; accelerates the grammar once per worker process.
+    """
+    global workerGrammar
+    workerGrammar = dfa.addAccelerators(grammar)
+
+# ______________________________________________________________________
+
+def workerParseChunk (args):
+    """workerParseChunk()
+    Pool task wrapper for parseChunk(); args is (start, tokens, lookahead).
+    """
+    start, tokens, lookahead = args
+    return parseChunk(workerGrammar, start, tokens, lookahead)
+
+# ______________________________________________________________________
+
+def parseChunked (tokens, grammar, start, processes = 0,
+                  chunkSize = CHUNK_TOKENS, pool = None):
+    """parseChunked()
+    Parses a list of (type, string, line number) tokens, splitting it at
+    top-level boundaries and parsing the chunks in a multiprocessing pool of
+    processes workers (0 uses every CPU; None or 1 parses the chunks in this
+    process).  An existing pool whose workers were started with
+    initWorker(grammar) may be passed instead.  Returns the same tree as
+    pgen2.dfa.parsetok(), or raises the same SyntaxError.
+    """
+    tokens = list(tokens)
+    grammar = dfa.addAccelerators(grammar)
+    points = splitPoints(tokens, grammar, start, chunkSize)
+    if not points:
+        return dfa.parsetok(iter(tokens), grammar, start)
+    bounds = [0] + points + [len(tokens)]
+    tasks = []
+    for index in range(len(bounds) - 1):
+        lookahead = None
+        if bounds[index + 1] < len(tokens):
+            lookahead = tokens[bounds[index + 1]]
+        tasks.append((start, tokens[bounds[index]:bounds[index + 1]],
+                      lookahead))
+    if pool is not None:
+        results = pool.map(workerParseChunk, tasks)
+    elif (processes is None) or (processes == 1):
+        results = [parseChunk(grammar, *task) for task in tasks]
+    else:
+        import multiprocessing
+        if processes == 0:
+            processes = multiprocessing.cpu_count()
+        workerPool = multiprocessing.Pool(processes, initWorker, (grammar,))
+        try:
+            results = workerPool.map(workerParseChunk, tasks)
+        finally:
+            workerPool.close()
+            workerPool.join()
+    rootNode = ((start, None, 0), [])
+    for index, children in enumerate(results):
+        if children is None:
+            # Parse the rest serially; the cut before this chunk is known
+            # to be a boundary of the serial parse.
+            tail = dfa.parsetok(iter(tokens[bounds[index]:]), grammar, start)
+            rootNode[1].extend(tail[1])
+            break
+        rootNode[1].extend(children)
+    return rootNode
+
+# ______________________________________________________________________
+# End of pgen2.chunked
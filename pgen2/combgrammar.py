@@ -0,0 +1,287 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.combgrammar
+
+Accelerator tables compressed by row displacement.
+
+pgen2.dfa.accelerateDFA() gives every DFA state a dense list spanning its
+lowest to highest label; with many keyword labels the lists are long,
+mostly -1, and make up most of a compiled grammar's memory.  CombGrammar
+overlays all of them in one comb vector: each distinct row (identical rows
+are stored once) gets a distinct base offset such that its entries land on
+slots no other row uses, and a check array records the base of the row
+owning each slot.  The accelerator entry of a state for a label is then
+
+    slot = stateBase[state] + ilabel
+    value[slot] if check[slot] == stateBase[state] else no entry
+
+which is still one indexing step.  All the tables are array("i") objects.
+stats() reports the sizes of the dense and compressed tables and their
+ratio.  CombGrammar.parse() gives the same trees and errors as
+pgen2.dfa.parsetok().
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import array
+import token
+
+from . import dfa
+
+# ______________________________________________________________________
+# Function definitions
+
+def placeRows (rows, labelCount):
+    """placeRows()
+    Packs rows (lists of (label, value) pairs) into a comb vector with the
+    first fit rule, largest rows first.  Returns (bases, check, value).
+    Every row gets a distinct base, so check can hold the base of the row
+    owning a slot (or -1).  Bases are at least 1 and the vector extends
+    labelCount slots past the last base, so any label in [-1, labelCount)
+    indexes inside it.
+    """
+    bases = [None] * len(rows)
+    used = set()
+    check = array.array("i")
+    value = array.array("i")
+    # firstFree := lowest slot that may still be free
+    firstFree = 0
+    order = sorted(range(len(rows)), key = lambda index: -len(rows[index]))
+    for rowIndex in order:
+        row = rows[rowIndex]
+        if not row:
+            continue
+        while (firstFree < len(check)) and (check[firstFree] != -1):
+            firstFree += 1
+        base = max(1, firstFree - row[0][0])
+        while True:
+            if base in used:
+                base += 1
+                continue
+            for label, labelValue in row:
+                slot = base + label
+                if (slot < len(check)) and (check[slot] != -1):
+                    break
+            else:
+                break
+            base += 1
+        needed = base + row[-1][0] + 1 - len(check)
+        if needed > 0:
+            check.extend([-1] * needed)
+            value.extend([-1] * needed)
+        for label, labelValue in row:
+            check[base + label] = base
+            value[base + label] = labelValue
+        bases[rowIndex] = base
+        used.add(base)
+    # Empty rows own no slots; any unused base will do.
+    emptyBase = 1
+    while emptyBase in used:
+        emptyBase += 1
+    for rowIndex, row in enumerate(rows):
+        if not row:
+            bases[rowIndex] = emptyBase
+    needed = max(bases) + labelCount - len(check) if bases else 0
+    if needed > 0:
+        check.extend([-1] * needed)
+        value.extend([-1] * needed)
+    return bases, check, value
+
+# ______________________________________________________________________
+# Class definitions
+
+class CombGrammar (object):
+    """Class CombGrammar
+
+    Parser over a grammar tuple whose accelerators are compressed by row
+    displacement.  The grammar is accelerated first if needed; the dense
+    accelerator lists are not kept.  Instances are read-only after
+    construction, so they can be shared between threads.
+    """
+    # ____________________________________________________________
+    def __init__ (self, grammar):
+        """CombGrammar.__init__
+        """
+        grammar = dfa.addAccelerators(grammar)
+        dfas, labels, start, accel = grammar
+        self.labels = labels
+        self.start = start
+        self.names = [dfaObj[1] for dfaObj in dfas]
+        self.keywords, self.types = dfa.labelMaps(grammar)
+        self.dfaInitial = array.array("i")
+        self.dfaBase = array.array("i")
+        self.stateFlags = array.array("i")
+        stateRows = []
+        rowIndices = {}
+        rows = []
+        denseEntries = 0
+        for index, dfaObj in enumerate(dfas):
+            if dfaObj[0] != index + token.NT_OFFSET:
+                raise ValueError("DFA %d has type %d" % (index, dfaObj[0]))
+            self.dfaInitial.append(dfaObj[2])
+            self.dfaBase.append(len(self.stateFlags))
+            for arcs, (accelUpper, accelLower, accelTable), accept in \
+                    dfaObj[3]:
+                flags = 0
+                if accept:
+                    flags = 1
+                    if len(arcs) == 1:
+                        flags |= 2
+                self.stateFlags.append(flags)
+                denseEntries += len(accelTable)
+                row = tuple((accelLower + offset, accelResult)
+                            for offset, accelResult in enumerate(accelTable)
+                            if accelResult != -1)
+                if row not in rowIndices:
+                    rowIndices[row] = len(rows)
+                    rows.append(row)
+                stateRows.append(rowIndices[row])
+        bases, self.check, self.value = placeRows(rows, len(labels))
+        self.stateBase = array.array("i", [bases[row] for row in stateRows])
+        self.denseEntries = denseEntries
+        self.rowCount = len(rows)
+
+    # ____________________________________________________________
+    def stats (self):
+        """CombGrammar.stats
+        Returns a dictionary of table sizes: the number of states, distinct
+        rows, dense accelerator entries (the total length of the lists
+        built by pgen2.dfa.accelerateDFA()) and comb entries (the slots of
+        the check and value arrays plus the per-state bases), and ratio,
+        dense entries per comb entry.
+        """
+        combEntries = 2 * len(self.check) + len(self.stateBase)
+        return {
+            "states" : len(self.stateBase),
+            "rows" : self.rowCount,
+            "dense" : self.denseEntries,
+            "comb" : combEntries,
+            "ratio" : float(self.denseEntries) / max(1, combEntries),
+            }
+
+    # ____________________________________________________________
+    def classify (self, type, name):
+        """CombGrammar.classify
+        Same as pgen2.dfa.classify().
+        """
+        if type == token.NAME:
+            ilabel = self.keywords.get(name)
+            if ilabel is not None:
+                return ilabel
+        return self.types.get(type, -1)
+
+    # ____________________________________________________________
+    def lookup (self, state, ilabel):
+        """CombGrammar.lookup
+        Returns the accelerator entry of a (global) state for a label, or
+        -1.
+        """
+        base = self.stateBase[state]
+        if self.check[base + ilabel] == base:
+            return self.value[base + ilabel]
+        return -1
+
+    # ____________________________________________________________
+    def errorMessage (self, state, name):
+        """CombGrammar.errorMessage
+        Builds the message pgen2.dfa.addToken() reports for a token the
+        state has no entry for, from the bounds its dense row would have.
+        """
+        present = [ilabel for ilabel in range(len(self.labels))
+                   if self.lookup(state, ilabel) != -1]
+        if present:
+            lower, upper = present[0], present[-1] + 1
+        else:
+            lower = upper = 0
+        if (upper - 1 <= lower) and (self.labels[lower][1] is not None):
+            return ", %s expected (not %s)" % (self.labels[lower][1],
+                                               repr(name))
+        return ", unexpected %s" % repr(name)
+
+    # ____________________________________________________________
+    def parse (self, tokens, start = None):
+        """CombGrammar.parse
+        Parses an iterable of (type, string, line number) tokens from start
+        (defaults to the grammar's start symbol).  Returns the same tree as
+        pgen2.dfa.parsetok(), and raises the same SyntaxError on errors.
+        """
+        if start is None:
+            start = self.start
+        dfaBase = self.dfaBase
+        dfaInitial = self.dfaInitial
+        stateFlags = self.stateFlags
+        stateBase = self.stateBase
+        check = self.check
+        value = self.value
+        keywords = self.keywords
+        types = self.types
+        NAME = token.NAME
+        NT_OFFSET = token.NT_OFFSET
+        rootNode = ((start, None, 0), [])
+        dfaIndex = start - NT_OFFSET
+        base = dfaBase[dfaIndex]
+        # stack := [ (global state index, DFA base, node) ]
+        stack = [(base + dfaInitial[dfaIndex], base, rootNode)]
+        lineno = 0
+        for type, name, lineno in tokens:
+            ilabel = -1
+            if type == NAME:
+                ilabel = keywords.get(name, -1)
+            if ilabel == -1:
+                ilabel = types.get(type, -1)
+            while True:
+                state, base, parent = stack[-1]
+                rowBase = stateBase[state]
+                if check[rowBase + ilabel] == rowBase:
+                    accelResult = value[rowBase + ilabel]
+                    if accelResult & (1 << 7):
+                        # Push non-terminal
+                        dfaIndex = accelResult >> 8
+                        newAstNode = ((dfaIndex + NT_OFFSET, None, lineno),
+                                      [])
+                        parent[1].append(newAstNode)
+                        stack[-1] = (base + (accelResult & 0x7f), base,
+                                     parent)
+                        newBase = dfaBase[dfaIndex]
+                        stack.append((newBase + dfaInitial[dfaIndex],
+                                      newBase, newAstNode))
+                        continue
+                    # Shift
+                    parent[1].append(((type, name, lineno), []))
+                    state = base + accelResult
+                    stack[-1] = (state, base, parent)
+                    while stateFlags[state] & 2:
+                        stack.pop()
+                        if not stack:
+                            return rootNode
+                        state = stack[-1][0]
+                    break
+                if stateFlags[state] & 1:
+                    stack.pop()
+                    if not stack:
+                        raise SyntaxError("Error in line %d%s" % (
+                            lineno, ", (XXX) empty stack!!!"))
+                    continue
+                raise SyntaxError("Error in line %d%s" % (
+                    lineno, self.errorMessage(state, name)))
+        raise SyntaxError("Error in line %d, unexpected end of input" %
+                          (lineno,))
+
+    # ____________________________________________________________
+    def symbolToStringMap (self):
+        """CombGrammar.symbolToStringMap
+        """
+        return dict((index + token.NT_OFFSET, name)
+                    for index, name in enumerate(self.names))
+
+    # ____________________________________________________________
+    def stringToSymbolMap (self):
+        """CombGrammar.stringToSymbolMap
+        """
+        return dict((name, index + token.NT_OFFSET)
+                    for index, name in enumerate(self.names))
+
+# ______________________________________________________________________
+# End of pgen2.combgrammar
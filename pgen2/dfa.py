@@ -18,6 +18,7 @@ Function isomorphism notes:
 
 acceler.c:
 PyGrammar_AddAccelerators       ~ addAccelerators
+fixdfa                          ~ accelerateDFA
 
 bitset.c:
 testbit                         ~ testbit
@@ -44,13 +45,25 @@ whatever best suits the Python to C translator.
 # XXX The token module dependency may need to be hacked if/when support for
 # other tokenizers is added.
 
+import time
 import token
+import tokenize
 
 # ______________________________________________________________________
 
 E_OK = 0
 E_DONE = 1
 E_SYNTAX = 2
+E_LAZY = 3
+
+# Node type of the nodes parseRecover() makes for skipped tokens, and the
+# token types it resynchronizes on by default.
+ERROR_NODE = token.ERRORTOKEN
+SYNC_TYPES = (token.NEWLINE, token.DEDENT, token.ENDMARKER)
+
+# Exceptions a tokenizer raises on malformed input (IndentationError is a
+# SyntaxError); recognize() and parseRecover() report them as errors.
+TOKENIZER_ERRORS = (SyntaxError, tokenize.TokenError)
 
 __DEBUG__ = False
 
@@ -58,6 +71,98 @@ import string
 
 # ______________________________________________________________________
 
+class ParseLimitExceeded (Exception):
+    """Class ParseLimitExceeded
+
+    Base class of the exceptions raised when a parse goes over one of its
+    ParseLimits.  limit is the bound that was exceeded and lineno the line
+    number of the last token read.
+    """
+    what = "Parse limit"
+    # ____________________________________________________________
+    def __init__ (self, limit, lineno):
+        """ParseLimitExceeded.__init__
+        """
+        Exception.__init__(self, "%s of %s exceeded in line %d" %
+                           (self.what, limit, lineno))
+        self.limit = limit
+        self.lineno = lineno
+
+class TokenLimitExceeded (ParseLimitExceeded):
+    """Class TokenLimitExceeded
+    """
+    what = "Token limit"
+
+class DepthLimitExceeded (ParseLimitExceeded):
+    """Class DepthLimitExceeded
+    """
+    what = "Depth limit"
+
+class NodeLimitExceeded (ParseLimitExceeded):
+    """Class NodeLimitExceeded
+    """
+    what = "Node limit"
+
+class DeadlineExceeded (ParseLimitExceeded):
+    """Class DeadlineExceeded
+    """
+    what = "Deadline"
+
+# ______________________________________________________________________
+
+class ParseLimits (object):
+    """Class ParseLimits
+
+    Bounds on a single parse: maxTokens tokens read, maxDepth levels on the
+    parse stack, maxNodes nodes in the tree, and timeout seconds of wall
+    clock time.  None means unlimited.  Counts and depth are checked after
+    every token; the clock is only read every DEADLINE_INTERVAL tokens to
+    keep the checks cheap.  Instances hold no parse state and can be shared
+    between parsers and threads.
+    """
+    DEADLINE_INTERVAL = 256
+    timer = getattr(time, "monotonic", time.time)
+    # ____________________________________________________________
+    def __init__ (self, maxTokens = None, maxDepth = None, maxNodes = None,
+                  timeout = None):
+        """ParseLimits.__init__
+        """
+        self.maxTokens = maxTokens
+        self.maxDepth = maxDepth
+        self.maxNodes = maxNodes
+        self.timeout = timeout
+
+    # ____________________________________________________________
+    def deadline (self):
+        """ParseLimits.deadline
+        Returns the deadline for a parse starting now, or None.
+        """
+        if self.timeout is None:
+            return None
+        return self.timer() + self.timeout
+
+    # ____________________________________________________________
+    def check (self, tokens, depth, nodes, deadline, lineno):
+        """ParseLimits.check
+        Raises the ParseLimitExceeded subclass for the first limit that the
+        given counts (or the clock, when deadline is not None) exceed.
+        """
+        maxTokens = self.maxTokens
+        if (maxTokens is not None) and (tokens > maxTokens):
+            raise TokenLimitExceeded(maxTokens, lineno)
+        maxDepth = self.maxDepth
+        if (maxDepth is not None) and (depth > maxDepth):
+            raise DepthLimitExceeded(maxDepth, lineno)
+        maxNodes = self.maxNodes
+        if (maxNodes is not None) and (nodes > maxNodes):
+            raise NodeLimitExceeded(maxNodes, lineno)
+        if ((deadline is not None) and
+            (0 == tokens % self.DEADLINE_INTERVAL) and
+            (self.timer() > deadline)):
+            raise DeadlineExceeded(self.timeout, lineno)
+
+# ______________________________________________________________________
+
 def testbit (bitstr, ibit):
     """testbit()
     Mirrors the operation of the C testbit() function in the bitset.c module
@@ -97,17 +202,37 @@ def findDFA (g, nt):
     distribution.
     """
     dfa = g[0][nt - token.NT_OFFSET]
+    if dfa is None:
+        dfa = g[0].build(nt - token.NT_OFFSET)
     assert dfa[0] == nt
     return dfa
 
 # ______________________________________________________________________
 
-def addToken (grammar, stack, type, name, lineno):
+def addToken (grammar, stack, type, name, lineno, pushes = None,
+              lazy = None):
     """addToken()
     Mirrors the operation of the C PyParser_AddToken() in the parser.c module
-    of the Python distribution.
+    of the Python distribution.  If pushes is given, it is a one element
+    list whose item is incremented for every nonterminal node created.
+
+    If lazy is given, it is a set of nonterminal types the caller wants to
+    skip (see pgen2.lazy).  When the token would push one of them, the
+    parent state moves past the nonterminal, nothing is pushed or added to
+    the tree, and (E_LAZY, stack, nonterminal type) is returned.
+    """
+    return addLabelToken(grammar, stack, classify(grammar, type, name), type,
+                         name, lineno, pushes, lazy)
+
+# ______________________________________________________________________
+
+def addLabelToken (grammar, stack, ilabel, type, name, lineno,
+                   pushes = None, lazy = None):
+    """addLabelToken()
+    The body of addToken() for a token that has already been classified
+    as label ilabel, by classify() or by a tokenizer emitting label
+    indices (see Tokenizer.labelStream()).
     """
-    ilabel = classify(grammar, type, name)
     if __DEBUG__:
         if len(name) > 50:
             print("Token: (%d, %d, '%s...')" % (type, ilabel, name[:50]))
@@ -129,6 +254,9 @@ def addToken (grammar, stack, type, name, lineno):
                     # "Push non-terminal"
                     nt = (accelResult >> 8) + token.NT_OFFSET
                     arrow = accelResult & ((1<<7)-1)
+                    if (lazy is not None) and (nt in lazy):
+                        stack[-1] = (dfa[3][arrow], dfa, parent)
+                        return (E_LAZY, stack, nt)
                     nextDFA = findDFA(grammar, nt)
                     # ____________________
                     # INLINE PUSH
@@ -136,6 +264,8 @@ def addToken (grammar, stack, type, name, lineno):
                     parent[1].append(newAstNode)
                     stack[-1] = (dfa[3][arrow], dfa, parent)
                     stack.append((nextDFA[3][nextDFA[2]], nextDFA, newAstNode))
+                    if pushes is not None:
+                        pushes[0] += 1
                     # ____________________
                     if __DEBUG__:
                         print("Push...")
@@ -186,23 +316,19 @@ def addToken (grammar, stack, type, name, lineno):
 
 # ______________________________________________________________________
 
-def addAccelerators (g):
-    """addAccelerators()
-    Adds accelerator data to a grammar tuple if the grammar does not already
-    contain accelerator information.  Returns a new grammar tuple.
+def accelerateDFA (g, dfa):
+    """accelerateDFA()
+    Returns the accelerated form of a single DFA from the (unaccelerated)
+    grammar tuple g.  The result only depends on the DFA, the label list of
+    g and the first sets of the nonterminals the DFA refers to.
     """
     # ____________________________________________________________
-    def handleState (state):
-        """handleState()
-        Warning: this is nested so it can get at the grammar passed to
-        addAccelerators() - rather than accepting it as an argument.  I only
-        do this b/c this function is map()'d.
-        """
-        def warn (message):
-            print("addAccelerators(): Warning: %s" % (message,))
+    def warn (message):
+        print("addAccelerators(): Warning: %s" % (message,))
+    # ____________________________________________________________
+    def handleState (stateIndex, state):
         arcs, accel, accept = state
         accept = 0
-        labelCount = len(labels)
         accelArray = [-1] * labelCount
         for arc in arcs:
             labelIndex, arrow = arc
@@ -223,12 +349,10 @@ def addAccelerators (g):
                         oldVal = accelArray[ibit]
                         if oldVal != -1:
                             # XXX Make this error reporting more better.
-                            oldType = oldVal >> 8
                             warn("ambiguity at bit %d (for %d: was to %x, now "
-                                 "to %x)." % (ibit, states.index(state),
-                                              oldVal, accelVal))
-                        accelArray[ibit] = (arrow | (1 << 7) |
-                                            ((type - token.NT_OFFSET) << 8))
+                                 "to %x)." % (ibit, stateIndex, oldVal,
+                                              accelVal))
+                        accelArray[ibit] = accelVal
             elif 0 == labelIndex:
                 accept = 1
             elif (labelIndex >= 0) and (labelIndex < labelCount):
@@ -243,24 +367,92 @@ def addAccelerators (g):
         accelArray = accelArray[accelLower:accelUpper]
         return (arcs, (accelUpper, accelLower, accelArray), accept)
     # ____________________________________________________________
-    def handleDFA (dfa):
-        type, name, initial, states, first = dfa
-        return (type, name, initial, [handleState(state) for state in states])
-        #return (type, name, initial, map(handleState, states))
+    labels = g[1]
+    labelCount = len(labels)
+    type, name, initial, states, first = dfa
+    return (type, name, initial,
+            [handleState(stateIndex, state)
+             for stateIndex, state in enumerate(states)])
+
+# ______________________________________________________________________
+
+class LazyAccelerators (list):
+    """Class LazyAccelerators
+
+    DFA list of a lazily accelerated grammar (see addAccelerators()).  It
+    starts out holding None for every DFA; findDFA() accelerates a DFA the
+    first time the parser enters it and caches the result in the list.
+    Iterating over the list (or pickling it) accelerates whatever is left,
+    so code that walks all the DFAs sees a complete grammar.
+    """
+    # ____________________________________________________________
+    def __init__ (self, g):
+        """LazyAccelerators.__init__
+        Takes the unaccelerated grammar tuple g.
+        """
+        list.__init__(self, [None] * len(g[0]))
+        self.source = g
+
+    # ____________________________________________________________
+    def build (self, index):
+        """LazyAccelerators.build
+        Accelerates, caches and returns the DFA at index.  Concurrent calls
+        for the same index build equal tuples, so no locking is needed.
+        """
+        dfa = accelerateDFA(self.source, self.source[0][index])
+        self[index] = dfa
+        return dfa
+
+    # ____________________________________________________________
+    def built (self):
+        """LazyAccelerators.built
+        Returns the number of DFAs accelerated so far.
+        """
+        return len(self) - list.count(self, None)
+
+    # ____________________________________________________________
+    def __iter__ (self):
+        """LazyAccelerators.__iter__
+        """
+        for index in range(len(self)):
+            dfa = list.__getitem__(self, index)
+            if dfa is None:
+                dfa = self.build(index)
+            yield dfa
+
     # ____________________________________________________________
+    def __reduce__ (self):
+        """LazyAccelerators.__reduce__
+        Pickles as a plain, fully accelerated list.
+        """
+        return (list, (list(self),))
+
+# ______________________________________________________________________
+
+def addAccelerators (g, lazy = False):
+    """addAccelerators()
+    Adds accelerator data to a grammar tuple if the grammar does not already
+    contain accelerator information.  Returns a new grammar tuple.  If lazy
+    is true, the DFAs of the new grammar are a LazyAccelerators list, so
+    each DFA is only accelerated once a parse first needs it.
+    """
     dfas, labels, start, accel = g
     if 0 == accel:
-        g = ([handleDFA(dfa) for dfa in dfas], labels, start, 1)
-        #g = (map(handleDFA, dfas), labels, start, 1)
+        if lazy:
+            g = (LazyAccelerators(g), labels, start, 1)
+        else:
+            g = ([accelerateDFA(g, dfa) for dfa in dfas], labels, start, 1)
     return g
 
 # ______________________________________________________________________
 
-def parsetok (tokenizer, grammar, start):
+def parsetok (tokenizer, grammar, start, limits = None):
     """parsetok()
     Mirrors the operation of the C parsetok() in the parsetok.c module of the
     Python distribution.  However, one big difference is its use of a tokenizer
     function.  The function should return a type, a string and a line number.
+    If limits (a ParseLimits instance) is given, the parse raises a
+    ParseLimitExceeded subclass as soon as it goes over one of them.
 
     NOTE: I think I am not going to accept the lexical hack where final
     NEWLINE and DEDENTS are inserted in the lexical stream if needed - this
@@ -273,15 +465,537 @@ def parsetok (tokenizer, grammar, start):
     parseStack = [(dfa[3][dfa[2]], dfa, rootNode)]
     # Parse all of it.
     result = E_OK
-    while result == E_OK:
-        type, tokStr, lineno = next(tokenizer)
-        result, parseStack, errMsg = addToken(grammar, parseStack, type,
-                                              tokStr, lineno)
+    if limits is None:
+        while result == E_OK:
+            type, tokStr, lineno = next(tokenizer)
+            result, parseStack, errMsg = addLabelToken(
+                grammar, parseStack, classify(grammar, type, tokStr), type,
+                tokStr, lineno)
+    else:
+        check = limits.check
+        deadline = limits.deadline()
+        pushes = [0]
+        tokens = 0
+        while result == E_OK:
+            type, tokStr, lineno = next(tokenizer)
+            result, parseStack, errMsg = addLabelToken(
+                grammar, parseStack, classify(grammar, type, tokStr), type,
+                tokStr, lineno, pushes)
+            tokens += 1
+            check(tokens, len(parseStack), 1 + tokens + pushes[0], deadline,
+                  lineno)
+    if result == E_DONE:
+        return rootNode
+    else:
+        raise SyntaxError("Error in line %d%s" % (lineno, errMsg))
+
+# ______________________________________________________________________
+
+def parseLabelTokens (tokenizer, grammar, start, limits = None):
+    """parseLabelTokens()
+    Fused counterpart of parsetok() for tokenizers that emit (label index,
+    type, string, line number) tokens (see Tokenizer.labelStream()), so no
+    token has to be classified.  Builds the same tree, or raises the same
+    SyntaxError.
+    """
+    grammar = addAccelerators(grammar)
+    rootNode = ((start, None, 0), [])
+    dfa = findDFA(grammar, start)
+    parseStack = [(dfa[3][dfa[2]], dfa, rootNode)]
+    result = E_OK
+    if limits is None:
+        while result == E_OK:
+            ilabel, type, tokStr, lineno = next(tokenizer)
+            result, parseStack, errMsg = addLabelToken(
+                grammar, parseStack, ilabel, type, tokStr, lineno)
+    else:
+        check = limits.check
+        deadline = limits.deadline()
+        pushes = [0]
+        tokens = 0
+        while result == E_OK:
+            ilabel, type, tokStr, lineno = next(tokenizer)
+            result, parseStack, errMsg = addLabelToken(
+                grammar, parseStack, ilabel, type, tokStr, lineno, pushes)
+            tokens += 1
+            check(tokens, len(parseStack), 1 + tokens + pushes[0], deadline,
+                  lineno)
     if result == E_DONE:
         return rootNode
     else:
         raise SyntaxError("Error in line %d%s" % (lineno, errMsg))
 
+# ______________________________________________________________________
+
+def labelMaps (grammar):
+    """labelMaps()
+    Returns a pair of dictionaries giving the same label indices as
+    classify(): one mapping keyword strings to NAME labels, and one mapping
+    token types to the first label of that type with no string.
+    """
+    keywords = {}
+    types = {}
+    for index, (labelType, labelName) in enumerate(grammar[1]):
+        if labelName is None:
+            types.setdefault(labelType, index)
+        elif labelType == token.NAME:
+            keywords.setdefault(labelName, index)
+    return keywords, types
+
+# ______________________________________________________________________
+
+def tokenizerError (exc, lineno):
+    """tokenizerError()
+    Returns the (line number, message) pair, in the format of recognize(),
+    for an exception in TOKENIZER_ERRORS raised by a tokenizer.  lineno,
+    the line of the last token read, is used when the exception does not
+    give one.
+    """
+    if isinstance(exc, tokenize.TokenError):
+        # TokenError("EOF in multi-line statement", (row, column))
+        if (len(exc.args) > 1) and isinstance(exc.args[1], tuple):
+            lineno = exc.args[1][0]
+        return (lineno, ", %s" % exc.args[0])
+    if getattr(exc, "lineno", None) is not None:
+        return (exc.lineno, ", %s" % exc.msg)
+    if exc.args and isinstance(exc.args[0], tuple) and \
+            (len(exc.args[0]) > 2):
+        # SyntaxError(token) from pgen2.tokenizer.Tokenizer
+        badToken = exc.args[0]
+        return (badToken[2][0], ", unexpected %s" % repr(badToken[1]))
+    return (lineno, ", %s" % exc)
+
+# ______________________________________________________________________
+
+def recognize (tokenizer, grammar, start, limits = None):
+    """recognize()
+    Recognize-only counterpart of parsetok(): runs the same accelerator
+    logic over the tokens, but keeps only (state, DFA states) pairs on the
+    stack and builds no tree.  Returns None if the input is a sentence of
+    the start symbol, otherwise a (line number, message) pair where the
+    message is the text after "Error in line N" in the SyntaxError
+    parsetok() would raise.  Running out of tokens is reported as
+    ", unexpected end of input", and an error raised by the tokenizer
+    as the pair tokenizerError() gives.  The token, depth and deadline
+    limits in limits are enforced as in parsetok(); as there is no tree,
+    maxNodes is ignored.
+
+    The loop is addLabelToken()'s with the node handling taken out: going
+    through addLabelToken() would allocate the tree recognize() exists to
+    avoid.
+    """
+    grammar = addAccelerators(grammar)
+    keywords, types = labelMaps(grammar)
+    NAME = token.NAME
+    dfa = findDFA(grammar, start)
+    states = dfa[3]
+    state = states[dfa[2]]
+    # stack := [ (state, states) ] of the enclosing DFAs
+    stack = []
+    lineno = 0
+    if limits is not None:
+        check = limits.check
+        deadline = limits.deadline()
+        tokens = 0
+    try:
+        for type, name, lineno in tokenizer:
+            ilabel = -1
+            if type == NAME:
+                ilabel = keywords.get(name, -1)
+            if ilabel == -1:
+                ilabel = types.get(type, -1)
+            while 1:
+                arcs, (accelUpper, accelLower, accelTable), accept = state
+                if (accelLower <= ilabel) and (ilabel < accelUpper):
+                    accelResult = accelTable[ilabel - accelLower]
+                    if -1 != accelResult:
+                        if (accelResult & (1<<7)):
+                            nextDFA = findDFA(grammar, (accelResult >> 8) +
+                                              token.NT_OFFSET)
+                            stack.append((states[accelResult & ((1<<7)-1)],
+                                          states))
+                            states = nextDFA[3]
+                            state = states[nextDFA[2]]
+                            continue
+                        state = states[accelResult]
+                        while state[2] and len(state[0]) == 1:
+                            if not stack:
+                                if limits is not None:
+                                    check(tokens + 1, 1, 0, deadline, lineno)
+                                return None
+                            state, states = stack.pop()
+                        break
+                if accept:
+                    if not stack:
+                        return (lineno, ", (XXX) empty stack!!!")
+                    state, states = stack.pop()
+                    continue
+                if ((accelUpper - 1 <= accelLower) and
+                    (None != grammar[1][accelLower][1])):
+                    return (lineno, ", %s expected (not %s)" %
+                            (grammar[1][accelLower][1], repr(name)))
+                return (lineno, ", unexpected %s" % repr(name))
+            if limits is not None:
+                tokens += 1
+                check(tokens, len(stack) + 1, 0, deadline, lineno)
+    except TOKENIZER_ERRORS as exc:
+        return tokenizerError(exc, lineno)
+    return (lineno, ", unexpected end of input")
+
+# ______________________________________________________________________
+
+def parseBatch (tokenStreams, grammar, start, errors = (SyntaxError,)):
+    """parseBatch()
+    Parses many small inputs with one grammar.  tokenStreams is an
+    iterable of token iterators like the one parsetok() takes; for each of
+    them, in order, a (tree, None) pair is yielded with the tree parsetok()
+    builds, or (None, exception) when parsing it raises an exception of
+    one of the errors types (the SyntaxError parsetok() raises, or an
+    error of the tokenizer).  Running out of tokens is reported as
+    "unexpected end of input".
+
+    The grammar is accelerated, its labels mapped and the start DFA found
+    once for the whole batch; each input only gets a new root node and
+    stack, so the cost per input is close to the cost of its tokens.
+    Tokens are classified with labelMaps() and fed to addLabelToken().
+    """
+    grammar = addAccelerators(grammar)
+    keywords, types = labelMaps(grammar)
+    NAME = token.NAME
+    startDFA = findDFA(grammar, start)
+    startState = startDFA[3][startDFA[2]]
+    for tokens in tokenStreams:
+        rootNode = ((start, None, 0), [])
+        stack = [(startState, startDFA, rootNode)]
+        result = E_OK
+        lineno = 0
+        try:
+            for type, name, lineno in tokens:
+                ilabel = -1
+                if type == NAME:
+                    ilabel = keywords.get(name, -1)
+                if ilabel == -1:
+                    ilabel = types.get(type, -1)
+                result, stack, errMsg = addLabelToken(grammar, stack, ilabel,
+                                                      type, name, lineno)
+                if result != E_OK:
+                    break
+            if result == E_SYNTAX:
+                raise SyntaxError("Error in line %d%s" % (lineno, errMsg))
+            elif result != E_DONE:
+                raise SyntaxError("Error in line %d, unexpected end of input"
+                                  % (lineno,))
+        except errors as exc:
+            yield (None, exc)
+            continue
+        yield (rootNode, None)
+
+# ______________________________________________________________________
+
+def recoverStack (grammar, stack, ilabel):
+    """recoverStack()
+    Returns the longest prefix of a parse stack on which addLabelToken()
+    accepts label ilabel, possibly after popping accepting states, or None
+    if there is none.  Neither the stack nor the tree is changed.
+    """
+    for top in range(len(stack) - 1, -1, -1):
+        for index in range(top, -1, -1):
+            arcs, (accelUpper, accelLower, accelTable), accept = \
+                stack[index][0]
+            if ((accelLower <= ilabel) and (ilabel < accelUpper) and
+                (-1 != accelTable[ilabel - accelLower])):
+                return stack[:top + 1]
+            if not accept:
+                break
+    return None
+
+# ______________________________________________________________________
+
+def parseRecover (tokenizer, grammar, start, syncTypes = SYNC_TYPES,
+                  limits = None):
+    """parseRecover()
+    Error recovering counterpart of parsetok().  At a syntax error the
+    parser records the error, adds an ERROR_NODE node to the node being
+    built and skips tokens into it (panic mode) until a token whose type
+    is in syncTypes fits one of the nodes on the stack (see
+    recoverStack()).  The nodes above that one are left unfinished and
+    parsing goes on from there.  Indented blocks are skipped whole, and an
+    INDENT right after a recovery is taken as the block of the statement
+    that had the error, so it is skipped without reporting another error;
+    parsing then resumes at the first token after the block that fits.
+    The DEDENTs closing blocks whose nodes were left unfinished by a
+    recovery are skipped too.
+
+    Returns (tree, errors): the root node, partial if the input had errors,
+    and a list of (line number, message) pairs in the format of
+    recognize().  The first error is the one parsetok() raises, and with no
+    errors the tree is the one parsetok() builds.  An error raised by the
+    tokenizer ends the parse: it is added as the last error (see
+    tokenizerError()) and the partial tree is returned.  limits are
+    enforced as in parsetok(), skipped tokens counting as tokens and
+    nodes; going over one raises its ParseLimitExceeded subclass.
+    """
+    grammar = addAccelerators(grammar)
+    keywords, types = labelMaps(grammar)
+    NAME = token.NAME
+    INDENT = token.INDENT
+    DEDENT = token.DEDENT
+    rootNode = ((start, None, 0), [])
+    dfa = findDFA(grammar, start)
+    stack = [(dfa[3][dfa[2]], dfa, rootNode)]
+    errors = []
+    # errorNode := node of the error being recovered from, or None
+    errorNode = None
+    # recovered := error node the current token ended, lastRecovered the
+    # one the previous token ended
+    recovered = None
+    # depth := INDENT nesting of the skipped tokens; resume is set after a
+    # skipped block, to try to recover at the next token whatever its type
+    depth = 0
+    resume = False
+    # dedents := DEDENTs of the blocks left unfinished by recoveries
+    dedents = 0
+    lastError = None
+    lineno = 0
+    pushes = None
+    if limits is not None:
+        check = limits.check
+        deadline = limits.deadline()
+        pushes = [0]
+        tokens = 0
+    try:
+        for type, name, lineno in tokenizer:
+            ilabel = -1
+            if type == NAME:
+                ilabel = keywords.get(name, -1)
+            if ilabel == -1:
+                ilabel = types.get(type, -1)
+            lastRecovered, recovered = recovered, None
+            while 1:
+                if errorNode is not None:
+                    newStack = None
+                    if (depth == 0) and (resume or (type in syncTypes)):
+                        newStack = recoverStack(grammar, stack, ilabel)
+                    resume = False
+                    if newStack is None:
+                        errorNode[1].append(((type, name, lineno), []))
+                        if type == INDENT:
+                            depth += 1
+                        elif (type == DEDENT) and (depth > 0):
+                            depth -= 1
+                            resume = (depth == 0)
+                        break
+                    for frame in stack[len(newStack):]:
+                        for child in frame[2][1]:
+                            if child[0][0] == INDENT:
+                                dedents += 1
+                            elif child[0][0] == DEDENT:
+                                dedents -= 1
+                    stack = newStack
+                    recovered, errorNode = errorNode, None
+                result, newStack, errMsg = addLabelToken(
+                    grammar, stack, ilabel, type, name, lineno, pushes)
+                if result == E_DONE:
+                    return rootNode, errors
+                elif result == E_OK:
+                    stack = newStack
+                    break
+                # The failed token only popped states into newStack, so stack
+                # is still the one it was given.
+                if (type == DEDENT) and (dedents > 0):
+                    dedents -= 1
+                    lastError[1].append(((type, name, lineno), []))
+                    break
+                if (type == INDENT) and (lastRecovered is not None):
+                    errorNode = lastRecovered
+                else:
+                    errors.append((lineno, errMsg))
+                    errorNode = lastError = ((ERROR_NODE, None, lineno), [])
+                    stack[-1][2][1].append(errorNode)
+            if limits is not None:
+                tokens += 1
+                check(tokens, len(stack), 1 + tokens + pushes[0], deadline,
+                      lineno)
+    except TOKENIZER_ERRORS as exc:
+        errors.append(tokenizerError(exc, lineno))
+        return rootNode, errors
+    if errorNode is None:
+        errors.append((lineno, ", unexpected end of input"))
+    return rootNode, errors
+
+# ______________________________________________________________________
+
+class PushParser (object):
+    """Class PushParser
+
+    Push-mode counterpart of parsetok().  Instead of pulling tokens from a
+    tokenizer, the caller feeds (type, string, line number) tokens as they
+    arrive; the parse stack is kept between calls.  feed() and feed_many()
+    return E_OK while more input is needed, E_DONE once the start symbol has
+    been accepted, and E_SYNTAX on a syntax error.  Once the result is no
+    longer E_OK further tokens are ignored.  finish() returns the parse tree
+    or raises SyntaxError the same way parsetok() does.
+
+    If limits (a ParseLimits instance) is given, feed() and feed_many()
+    raise a ParseLimitExceeded subclass once the parse goes over one of
+    them.  Counts and the deadline run from the last reset(), and include
+    work undone by restore().  The parse then fails: the result becomes
+    E_SYNTAX and finish() raises the same exception again.
+    """
+    # ____________________________________________________________
+    def __init__ (self, grammar, start, limits = None):
+        """PushParser.__init__
+        """
+        self.grammar = addAccelerators(grammar)
+        self.start = start
+        self.limits = limits
+        self.reset()
+
+    # ____________________________________________________________
+    def reset (self):
+        """PushParser.reset
+        Discards any partial parse and starts over from the start symbol.
+        """
+        self.rootNode = ((self.start, None, 0), [])
+        dfa = findDFA(self.grammar, self.start)
+        self.stack = [(dfa[3][dfa[2]], dfa, self.rootNode)]
+        self.result = E_OK
+        self.errMsg = None
+        self.limitError = None
+        self.lineno = 0
+        self.tokens = 0
+        self.pushes = [0]
+        self.deadline = None
+        if self.limits is not None:
+            self.deadline = self.limits.deadline()
+
+    # ____________________________________________________________
+    def feed (self, type, name, lineno):
+        """PushParser.feed
+        Adds a single token to the parse.  Returns E_OK, E_DONE or E_SYNTAX.
+        """
+        if self.result == E_OK:
+            self.result, self.stack, self.errMsg = addToken(
+                self.grammar, self.stack, type, name, lineno, self.pushes)
+            self.lineno = lineno
+            if self.limits is not None:
+                self.tokens += 1
+                try:
+                    self.limits.check(self.tokens, len(self.stack),
+                                      1 + self.tokens + self.pushes[0],
+                                      self.deadline, lineno)
+                except ParseLimitExceeded as exc:
+                    self.result = E_SYNTAX
+                    self.limitError = exc
+                    raise
+        return self.result
+
+    # ____________________________________________________________
+    def feed_many (self, tokens):
+        """PushParser.feed_many
+        Adds tokens from an iterable of (type, string, line number) tuples,
+        stopping at the first token that ends the parse.  Returns E_OK,
+        E_DONE or E_SYNTAX.  If the iterable raises, the tokens it gave
+        before stay added.
+        """
+        result = self.result
+        if result != E_OK:
+            return result
+        grammar = self.grammar
+        stack = self.stack
+        errMsg = None
+        lineno = self.lineno
+        try:
+            if self.limits is None:
+                for type, name, lineno in tokens:
+                    result, stack, errMsg = addToken(grammar, stack, type,
+                                                     name, lineno)
+                    if result != E_OK:
+                        break
+            else:
+                pushes = self.pushes
+                check = self.limits.check
+                deadline = self.deadline
+                for type, name, lineno in tokens:
+                    result, stack, errMsg = addToken(grammar, stack, type,
+                                                     name, lineno, pushes)
+                    self.tokens += 1
+                    check(self.tokens, len(stack),
+                          1 + self.tokens + pushes[0], deadline, lineno)
+                    if result != E_OK:
+                        break
+        except ParseLimitExceeded as exc:
+            result = E_SYNTAX
+            self.limitError = exc
+            raise
+        finally:
+            self.result = result
+            self.stack = stack
+            self.errMsg = errMsg
+            self.lineno = lineno
+        return result
+
+    # ____________________________________________________________
+    def snapshot (self):
+        """PushParser.snapshot
+        Returns a checkpoint of the parse at the current token boundary.
+
+        The snapshot records, for each level of the parse stack, the DFA
+        state, the node being built and its number of children, so it
+        costs O(stack depth).  Completed subtrees are shared with the live
+        tree rather than copied; they are never modified once they leave
+        the stack.  Snapshots can be pickled (along with the partial tree
+        they refer to) to resume a parse in another process.
+
+        A snapshot stays valid while the parse only moves forward from it.
+        Once the parse is rewound past it, by restoring an older snapshot,
+        it is invalidated, and so is any tree finish() returned after it
+        was taken; branches from one snapshot are explored one at a time.
+        """
+        return (tuple((state, dfa, parent, len(parent[1]))
+                      for state, dfa, parent in self.stack),
+                self.rootNode, len(self.rootNode[1]), self.result,
+                self.errMsg, self.lineno)
+
+    # ____________________________________________________________
+    def restore (self, snapshot):
+        """PushParser.restore
+        Rewinds the parse to a snapshot taken from this parser (or
+        unpickled from one over the same grammar).  The child lists of the
+        nodes on the recorded stack are truncated back to their recorded
+        lengths in place, so restoring costs O(stack depth) plus the number
+        of nodes discarded.  See snapshot() for what this invalidates.
+        """
+        levels, rootNode, rootCount, result, errMsg, lineno = snapshot
+        del rootNode[1][rootCount:]
+        stack = []
+        for state, dfa, parent, childCount in levels:
+            del parent[1][childCount:]
+            stack.append((state, dfa, parent))
+        self.rootNode = rootNode
+        self.stack = stack
+        self.result = result
+        self.errMsg = errMsg
+        self.limitError = None
+        self.lineno = lineno
+
+    # ____________________________________________________________
+    def finish (self):
+        """PushParser.finish
+        Ends the input.  Returns the parse tree if the start symbol was
+        accepted, otherwise raises SyntaxError (or the ParseLimitExceeded
+        the parse failed with).
+        """
+        if self.limitError is not None:
+            raise self.limitError
+        if self.result == E_DONE:
+            return self.rootNode
+        elif self.result == E_OK:
+            errMsg = ", unexpected end of input"
+        else:
+            errMsg = self.errMsg
+        raise SyntaxError("Error in line %d%s" % (self.lineno, errMsg))
+
 # ______________________________________________________________________
 # MAIN ROUTINE - For unit testing.
 
@@ -0,0 +1,441 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.difftest
+
+Differential testing of optimized tokenizers, accelerators and parsing
+engines against the reference implementation (Tokenizer.tokenize() and
+pgen2.dfa.parsetok()).
+
+An engine is any callable taking an input string and returning a result:
+a parse tree for parsers, a list of tokens for tokenizers.  An engine that
+raises an exception produces an error outcome instead, which is compared by
+exception type, message and line number.  DifferentialTest runs a reference
+and a candidate engine over the same inputs, timing both, and returns a
+DiffReport with the first divergence (if any) and the speedup of the
+candidate.  Inputs are (name, string) pairs, from corpusInputs() for files
+on disk or generatedInputs() for pgen2.generate output.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import re
+import timeit
+
+from . import generate, tokenizer
+
+# ______________________________________________________________________
+# Module data
+
+LINE_PATTERN = re.compile(r"line (\d+)")
+
+# ______________________________________________________________________
+# Engine factories
+
+def parseEngine (parser):
+    """parseEngine()
+    Returns an engine that parses strings with a PyPgenParser (without its
+    cache, so both engines always do the work).
+    """
+    def engine (text):
+        return parser.parseTokens(parser.tokenizeString(text))
+    return engine
+
+# ______________________________________________________________________
+
+def pushEngine (parser):
+    """pushEngine()
+    Returns an engine that parses strings by feeding the tokens to the
+    parser's pgen2.dfa.PushParser.
+    """
+    def engine (text):
+        pushParser = parser.pushParser()
+        pushParser.feed_many(parser.tokenizeString(text))
+        return pushParser.finish()
+    return engine
+
+# ______________________________________________________________________
+
+def fusedEngine (parser):
+    """fusedEngine()
+    Returns an engine that parses strings with a copy of the parser built
+    with fused=True, so they go through pgen2.dfa.parseLabelTokens() when
+    the tokenizer class supports it.
+    """
+    from . import pgen
+    fusedParser = pgen.PyPgenParser(parser.grammarObj, parser.tokenizer_cls,
+                                    fused = True)
+    def engine (text):
+        return fusedParser.parseString(text)
+    return engine
+
+# ______________________________________________________________________
+
+def batchEngine (parser):
+    """batchEngine()
+    Returns an engine that parses each string as a batch of one with
+    PyPgenParser.parseBatch(), raising the error it reports.
+    """
+    def engine (text):
+        for tree, error in parser.parseBatch([text]):
+            if error is not None:
+                raise error
+            return tree
+    return engine
+
+# ______________________________________________________________________
+
+def recoverEngine (parser):
+    """recoverEngine()
+    Returns an engine that parses strings with PyPgenParser.
+    parseStringRecover(), raising the SyntaxError parsetok() would raise
+    for the first error.  Errors of the tokenizer become SyntaxErrors.
+    """
+    def engine (text):
+        tree, errors = parser.parseStringRecover(text)
+        if errors:
+            raise SyntaxError("Error in line %d%s" % errors[0])
+        return tree
+    return engine
+
+# ______________________________________________________________________
+
+def recognizeEngine (parser):
+    """recognizeEngine()
+    Returns an engine that checks strings with PyPgenParser.
+    recognizeString().  The result is True for valid input; errors are
+    raised as in recoverEngine().  Compare it with acceptEngine() of a
+    parsing engine, using compareValues().
+    """
+    def engine (text):
+        error = parser.recognizeString(text)
+        if error is not None:
+            raise SyntaxError("Error in line %d%s" % error)
+        return True
+    return engine
+
+# ______________________________________________________________________
+
+def acceptEngine (engine):
+    """acceptEngine()
+    Returns an engine giving True where the given engine gives a result.
+    """
+    def acceptor (text):
+        engine(text)
+        return True
+    return acceptor
+
+# ______________________________________________________________________
+
+def sharedEngine (parser):
+    """sharedEngine()
+    Returns an engine that parses strings with a pgen2.sharedgrammar.
+    SharedGrammar flattened from the parser's grammar.
+    """
+    from . import sharedgrammar
+    shared = sharedgrammar.SharedGrammar(
+        sharedgrammar.flatten(parser.parseGrammar))
+    def engine (text):
+        return shared.parse(parser.tokenizeString(text), parser.start)
+    return engine
+
+# ______________________________________________________________________
+
+def combEngine (parser):
+    """combEngine()
+    Returns an engine that parses strings with a pgen2.combgrammar.
+    CombGrammar built from the parser's grammar.
+    """
+    from . import combgrammar
+    comb = combgrammar.CombGrammar(parser.parseGrammar)
+    def engine (text):
+        return comb.parse(parser.tokenizeString(text), parser.start)
+    return engine
+
+# ______________________________________________________________________
+
+def tokenEngine (tokenizer_cls = None):
+    """tokenEngine()
+    Returns an engine that tokenizes strings into a list of tokens.
+    """
+    if tokenizer_cls is None:
+        tokenizer_cls = tokenizer.Tokenizer
+    def engine (text):
+        return [tuple(tokenData) for tokenData in
+                tokenizer_cls().tokenizeString(text)]
+    return engine
+
+# ______________________________________________________________________
+# Input sources
+
+def corpusInputs (filenames):
+    """corpusInputs()
+    Yields (filename, contents) pairs.
+    """
+    for filename in filenames:
+        with open(filename) as fileObj:
+            yield (filename, fileObj.read())
+
+# ______________________________________________________________________
+
+def generatedInputs (grammar, count, size = None, seed = 0, **kws):
+    """generatedInputs()
+    Yields count ("<generated:seed>", text) pairs of random sentences for a
+    compiled grammar; extra keyword arguments go to
+    pgen2.generate.SentenceGenerator.
+    """
+    for index in range(count):
+        generator = generate.SentenceGenerator(grammar, seed + index, **kws)
+        yield ("<generated:%d>" % (seed + index),
+               "".join(generator.generate(size = size)))
+
+# ______________________________________________________________________
+# Outcomes and comparison
+
+def errorOutcome (exc):
+    """errorOutcome()
+    Returns a comparable (type name, message, line number) triple for an
+    exception raised by an engine.
+    """
+    lineno = getattr(exc, "lineno", None)
+    message = str(exc)
+    if lineno is None:
+        match = LINE_PATTERN.search(message)
+        if match:
+            lineno = int(match.group(1))
+    return (exc.__class__.__name__, message, lineno)
+
+# ______________________________________________________________________
+
+def compareTrees (tree1, tree2):
+    """compareTrees()
+    Returns None if two parse trees are equal, otherwise a (path, node1,
+    node2) triple, where path is the list of child indices leading to the
+    first (preorder) pair of differing nodes, and node1 and node2 are the
+    node headers (or None for a missing child).
+    """
+    # stack := [ (path, node1, node2) ]
+    stack = [([], tree1, tree2)]
+    while stack:
+        path, node1, node2 = stack.pop()
+        if node1[0] != node2[0]:
+            return (path, node1[0], node2[0])
+        children1 = node1[1]
+        children2 = node2[1]
+        if len(children1) != len(children2):
+            common = min(len(children1), len(children2))
+            if children1[:common] == children2[:common]:
+                extra1 = extra2 = None
+                if common < len(children1):
+                    extra1 = children1[common][0]
+                if common < len(children2):
+                    extra2 = children2[common][0]
+                return (path + [common], extra1, extra2)
+        for index in range(min(len(children1), len(children2)) - 1, -1, -1):
+            stack.append((path + [index], children1[index],
+                          children2[index]))
+    return None
+
+# ______________________________________________________________________
+
+def compareSequences (seq1, seq2):
+    """compareSequences()
+    Returns None if two sequences (of tokens, say) are equal, otherwise a
+    ([index], item1, item2) triple for the first difference, with None
+    standing for a missing item.
+    """
+    for index in range(max(len(seq1), len(seq2))):
+        item1 = item2 = None
+        if index < len(seq1):
+            item1 = seq1[index]
+        if index < len(seq2):
+            item2 = seq2[index]
+        if item1 != item2:
+            return ([index], item1, item2)
+    return None
+
+# ______________________________________________________________________
+
+def compareValues (value1, value2):
+    """compareValues()
+    Returns None if two results are equal, otherwise a ([], value1,
+    value2) triple.
+    """
+    if value1 == value2:
+        return None
+    return ([], value1, value2)
+
+# ______________________________________________________________________
+
+class DiffReport (object):
+    """Class DiffReport
+
+    Results of a DifferentialTest run.  first is None when all outcomes
+    matched; otherwise it is an (input name, path, reference detail,
+    candidate detail) tuple describing the first divergence.
+    """
+    # ____________________________________________________________
+    def __init__ (self, name):
+        """DiffReport.__init__
+        """
+        self.name = name
+        self.inputs = 0
+        self.errors = 0
+        self.divergences = 0
+        self.first = None
+        self.referenceTime = 0.0
+        self.candidateTime = 0.0
+
+    # ____________________________________________________________
+    def ok (self):
+        """DiffReport.ok
+        """
+        return 0 == self.divergences
+
+    # ____________________________________________________________
+    def speedup (self):
+        """DiffReport.speedup
+        Returns the reference to candidate time ratio (greater than 1 when
+        the candidate is faster).
+        """
+        if self.candidateTime <= 0:
+            return float("inf")
+        return self.referenceTime / self.candidateTime
+
+    # ____________________________________________________________
+    def __str__ (self):
+        """DiffReport.__str__
+        """
+        lines = ["%s: %d inputs (%d errors), %d divergences, speedup %.2fx"
+                 % (self.name, self.inputs, self.errors, self.divergences,
+                    self.speedup())]
+        if self.first is not None:
+            inputName, path, detail1, detail2 = self.first
+            lines.append("  first divergence in %s at %r:" %
+                         (inputName, path))
+            lines.append("    reference: %r" % (detail1,))
+            lines.append("    candidate: %r" % (detail2,))
+        return "\n".join(lines)
+
+# ______________________________________________________________________
+
+class DifferentialTest (object):
+    """Class DifferentialTest
+
+    Runs a reference and a candidate engine on the same inputs and compares
+    their outcomes with compare (compareTrees() by default; use
+    compareSequences() for tokenizers).  repeat runs each engine several
+    times per input and keeps the best time.
+    """
+    # ____________________________________________________________
+    def __init__ (self, reference, candidate, name = "candidate",
+                  compare = compareTrees, repeat = 1):
+        """DifferentialTest.__init__
+        """
+        self.reference = reference
+        self.candidate = candidate
+        self.name = name
+        self.compare = compare
+        self.repeat = repeat
+
+    # ____________________________________________________________
+    def runEngine (self, engine, text):
+        """DifferentialTest.runEngine
+        Returns ((is error?, result or error outcome), best time).
+        """
+        timer = timeit.default_timer
+        best = None
+        for count in range(self.repeat):
+            start = timer()
+            try:
+                outcome = (False, engine(text))
+            except Exception as exc:
+                outcome = (True, errorOutcome(exc))
+            elapsed = timer() - start
+            if (best is None) or (elapsed < best):
+                best = elapsed
+        return outcome, best
+
+    # ____________________________________________________________
+    def compareOutcomes (self, outcome1, outcome2):
+        """DifferentialTest.compareOutcomes
+        Returns None if two outcomes match, otherwise a (path, detail1,
+        detail2) triple.
+        """
+        isError1, result1 = outcome1
+        isError2, result2 = outcome2
+        if isError1 or isError2:
+            if outcome1 == outcome2:
+                return None
+            return ([], result1 if isError1 else "result",
+                    result2 if isError2 else "result")
+        return self.compare(result1, result2)
+
+    # ____________________________________________________________
+    def run (self, inputs, stopOnDivergence = False):
+        """DifferentialTest.run
+        Runs both engines on (name, string) inputs; returns a DiffReport.
+        """
+        report = DiffReport(self.name)
+        for inputName, text in inputs:
+            outcome1, time1 = self.runEngine(self.reference, text)
+            outcome2, time2 = self.runEngine(self.candidate, text)
+            report.inputs += 1
+            report.referenceTime += time1
+            report.candidateTime += time2
+            if outcome1[0]:
+                report.errors += 1
+            difference = self.compareOutcomes(outcome1, outcome2)
+            if difference is not None:
+                report.divergences += 1
+                if report.first is None:
+                    report.first = (inputName,) + tuple(difference)
+                if stopOnDivergence:
+                    break
+        return report
+
+# ______________________________________________________________________
+
+def engineTests (parser):
+    """engineTests()
+    Returns a DifferentialTest comparing each parsing engine of the
+    package with parsetok() on a PyPgenParser.
+    """
+    reference = parseEngine(parser)
+    tests = [DifferentialTest(reference, engine(parser), name)
+             for name, engine in (("PushParser", pushEngine),
+                                  ("parseLabelTokens", fusedEngine),
+                                  ("parseBatch", batchEngine),
+                                  ("parseRecover", recoverEngine),
+                                  ("SharedGrammar", sharedEngine),
+                                  ("CombGrammar", combEngine))]
+    tests.append(DifferentialTest(acceptEngine(reference),
+                                  recognizeEngine(parser), "recognize",
+                                  compareValues))
+    return tests
+
+# ______________________________________________________________________
+
+def main (*args):
+    """main()
+    Usage: difftest.py <grammar.pgen> [file ...]
+    Compares every parsing engine with parsetok() on the given files and
+    on generated inputs for the grammar, and prints the reports.
+    """
+    from . import parser, pgen
+    grammarParser = pgen.buildParser(parser.parse_file(args[0]))
+    grammar = grammarParser.toTuple()
+    inputs = list(corpusInputs(args[1:]))
+    inputs.extend(generatedInputs(grammar, 10, 10000))
+    for test in engineTests(grammarParser):
+        print(test.run(inputs))
+
+# ______________________________________________________________________
+
+if __name__ == "__main__":
+    import sys
+    main(*(sys.argv[1:]))
+
+# ______________________________________________________________________
+# End of pgen2.difftest
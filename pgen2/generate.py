@@ -0,0 +1,479 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.generate
+
+Grammar-driven random sentence generator, for benchmarking and stress
+testing parsers built by PyPgen.
+
+SentenceGenerator walks the DFAs of a compiled grammar (as returned by
+PyPgen.__call__() or PyPgenParser.toTuple()), choosing arcs at random with
+configurable weights.  Output is produced incrementally, so inputs from a
+few bytes up to gigabytes can be streamed to a file with bounded memory.
+The same seed always produces the same output.
+
+Depth and size are bounded by switching to "finishing" mode: once the
+parse stack is deeper than maxDepth, the current item of the start symbol
+is larger than maxItemSize, or the requested output size has been reached,
+the generator takes the cheapest way out of every open DFA (using
+precomputed minimal completion costs).
+
+tokens() yields (type, string, lineno) tuples that can be fed directly to
+pgen2.dfa.parsetok(); generate() renders them as text, which round-trips
+through pgen2.tokenizer.Tokenizer for grammars whose tokens follow Python's
+lexical rules.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import random
+import token
+
+from . import dfa, tokenizer
+
+# ______________________________________________________________________
+# Module data
+
+INFINITY = float("inf")
+
+# Arc weight multipliers used by the built-in modes.
+MODES = ("balanced", "deep", "wide")
+BIAS = 4.0
+
+# Size of the text chunks yielded by SentenceGenerator.generate().
+CHUNK_SIZE = 1 << 16
+
+# ______________________________________________________________________
+
+class SentenceGenerator (object):
+    """Class SentenceGenerator
+
+    Random sentence generator for a compiled grammar.
+
+    - seed: seed for the private random.Random instance.
+    - maxDepth: parse stack depth after which the generator finishes every
+      open nonterminal as cheaply as possible.
+    - maxItemSize: number of characters after which each nonterminal
+      started directly by the start symbol (a statement, for instance) is
+      finished as cheaply as possible (None for no limit).
+    - weights: optional dictionary mapping label indices, nonterminal names
+      or token names (e.g. "NAME", "'if'") to arc weights (default 1).  A
+      zero weight excludes the arcs altogether.
+    - mode: "balanced" uses the weights as given, "deep" favors arcs into
+      nonterminals to stress nesting, and "wide" favors arcs that loop
+      back (repetitions) and disfavors leaving a DFA.
+    - operatorMap: operator text to token type map, used to render operator
+      tokens (defaults to pgen2.tokenizer.Tokenizer.operatorMap).
+    - tokenText: optional dictionary mapping other token types to their
+      text (e.g. {token.AWAIT : "await"}).
+    """
+    # ____________________________________________________________
+    def __init__ (self, grammar, seed = 0, maxDepth = 64, maxItemSize = 4096,
+                  weights = None, mode = "balanced", operatorMap = None,
+                  tokenText = None):
+        """SentenceGenerator.__init__
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown mode %r (expected one of %s)" %
+                             (mode, ", ".join(MODES)))
+        self.grammar = dfa.addAccelerators(grammar)
+        self.dfas = self.grammar[0]
+        self.labels = self.grammar[1]
+        self.start = self.grammar[2]
+        self.seed = seed
+        self.maxDepth = maxDepth
+        self.maxItemSize = maxItemSize
+        self.mode = mode
+        self.random = random.Random(seed)
+        self.symbols = dict((dfaObj[1], dfaObj[0]) for dfaObj in self.dfas)
+        if operatorMap is None:
+            operatorMap = tokenizer.Tokenizer.operatorMap
+        self.operatorText = {}
+        for text in sorted(operatorMap, key = lambda text: (len(text), text)):
+            self.operatorText.setdefault(operatorMap[text], text)
+        if tokenText:
+            self.operatorText.update(tokenText)
+        self.keywords = set(name for labelType, name in self.labels
+                            if (labelType == token.NAME) and name)
+        self.labelWeights = self.computeLabelWeights(weights or {})
+        self.computeStates()
+        self.computeCosts()
+
+    # ____________________________________________________________
+    def labelName (self, labelIndex):
+        """SentenceGenerator.labelName
+        Returns the name used to refer to a label in the weights dictionary.
+        """
+        labelType, name = self.labels[labelIndex]
+        if labelType >= token.NT_OFFSET:
+            return self.dfas[labelType - token.NT_OFFSET][1]
+        elif name is not None:
+            return "'%s'" % name
+        return token.tok_name.get(labelType, str(labelType))
+
+    # ____________________________________________________________
+    def computeLabelWeights (self, weights):
+        """SentenceGenerator.computeLabelWeights
+        """
+        labelWeights = []
+        for labelIndex in range(len(self.labels)):
+            weight = weights.get(labelIndex)
+            if weight is None:
+                weight = weights.get(self.labelName(labelIndex), 1.0)
+            labelWeights.append(float(weight))
+        return labelWeights
+
+    # ____________________________________________________________
+    def computeStates (self):
+        """SentenceGenerator.computeStates
+        Builds self.states, mapping each DFA index to a list of
+        (arcs, tableMask, accept, acceptOnly) tuples, one per state.  arcs
+        only holds the (label, arrow, mask) arcs the parser can actually
+        take (and that don't have a zero weight), where mask is the bit set
+        of the labels the state's accelerator table sends along that arc.
+        tableMask is the union of the masks of all arcs.  Generating
+        against these masks (rather than the plain DFAs) keeps the output
+        inside what the parser accepts, even where the grammar is not
+        strictly LL(1).
+        """
+        labels = self.labels
+        self.states = []
+        for dfaObj in self.grammar[0]:
+            dfaStates = []
+            for arcs, accel, accept in dfaObj[3]:
+                accelUpper, accelLower, accelTable = accel
+                arcMasks = {}
+                for offset, accelResult in enumerate(accelTable):
+                    if -1 == accelResult:
+                        continue
+                    if accelResult & (1 << 7):
+                        key = ((accelResult >> 8) + token.NT_OFFSET,
+                               accelResult & ((1 << 7) - 1))
+                    else:
+                        key = (accelLower + offset, accelResult)
+                    arcMasks[key] = (arcMasks.get(key, 0) |
+                                     (1 << (accelLower + offset)))
+                stateArcs = []
+                tableMask = 0
+                for label, arrow in arcs:
+                    if 0 == label:
+                        continue
+                    labelType = labels[label][0]
+                    if labelType >= token.NT_OFFSET:
+                        mask = arcMasks.get((labelType, arrow), 0)
+                    else:
+                        mask = arcMasks.get((label, arrow), 0)
+                    tableMask |= mask
+                    if mask and self.labelWeights[label] > 0:
+                        stateArcs.append((label, arrow, mask))
+                dfaStates.append((stateArcs, tableMask, accept,
+                                  accept and (len(arcs) == 1)))
+            self.states.append(dfaStates)
+
+    # ____________________________________________________________
+    def computeCosts (self):
+        """SentenceGenerator.computeCosts
+        Computes, by fixed point iteration, the minimal number of tokens
+        needed to derive each nonterminal (self.minCosts) and to get from
+        each DFA state to acceptance (self.distances).
+        """
+        labels = self.labels
+        minCosts = [INFINITY] * len(self.states)
+        distances = [[INFINITY] * len(dfaStates)
+                     for dfaStates in self.states]
+        changes = True
+        while changes:
+            changes = False
+            for dfaIndex, dfaStates in enumerate(self.states):
+                stateDistances = distances[dfaIndex]
+                for stateIndex, state in enumerate(dfaStates):
+                    best = stateDistances[stateIndex]
+                    if state[2]:
+                        best = 0
+                    for label, arrow, mask in state[0]:
+                        labelType = labels[label][0]
+                        if labelType >= token.NT_OFFSET:
+                            cost = minCosts[labelType - token.NT_OFFSET]
+                        else:
+                            cost = 1
+                        cost += stateDistances[arrow]
+                        if cost < best:
+                            best = cost
+                    if best < stateDistances[stateIndex]:
+                        stateDistances[stateIndex] = best
+                        changes = True
+                initialDistance = stateDistances[self.dfas[dfaIndex][2]]
+                if initialDistance < minCosts[dfaIndex]:
+                    minCosts[dfaIndex] = initialDistance
+                    changes = True
+        self.minCosts = minCosts
+        self.distances = distances
+
+    # ____________________________________________________________
+    def arcCost (self, dfaIndex, label, arrow):
+        """SentenceGenerator.arcCost
+        Minimal number of tokens to accept dfaIndex when taking an arc.
+        """
+        labelType = self.labels[label][0]
+        if labelType >= token.NT_OFFSET:
+            cost = self.minCosts[labelType - token.NT_OFFSET]
+        else:
+            cost = 1
+        return cost + self.distances[dfaIndex][arrow]
+
+    # ____________________________________________________________
+    def choose (self, dfaIndex, stateIndex, allowed, canAccept, finishing,
+                growing):
+        """SentenceGenerator.choose
+        Returns the (label, arrow, mask) arc to take from a state, or None
+        to accept (pop the DFA).  Only arcs whose mask intersects allowed
+        are considered.
+        """
+        stateArcs = self.states[dfaIndex][stateIndex][0]
+        if finishing:
+            best = None
+            bestCost = INFINITY
+            if canAccept:
+                return None
+            for arc in stateArcs:
+                if arc[2] & allowed:
+                    cost = self.arcCost(dfaIndex, arc[0], arc[1])
+                    if cost < bestCost:
+                        best = arc
+                        bestCost = cost
+            return best
+        states = self.states[dfaIndex]
+        labels = self.labels
+        mode = self.mode
+        choices = []
+        weights = []
+        if canAccept and not growing:
+            choices.append(None)
+            if "wide" == mode:
+                weights.append(1.0 / BIAS)
+            else:
+                weights.append(1.0)
+        for arc in stateArcs:
+            label, arrow, mask = arc
+            if not (mask & allowed):
+                continue
+            if self.arcCost(dfaIndex, label, arrow) == INFINITY:
+                continue
+            if growing and states[arrow][3]:
+                # Don't walk into a dead end final state while the output
+                # is still below its target size.
+                continue
+            weight = self.labelWeights[label]
+            if ("deep" == mode) and (labels[label][0] >= token.NT_OFFSET):
+                weight *= BIAS
+            elif ("wide" == mode) and (arrow <= stateIndex):
+                weight *= BIAS
+            if weight > 0:
+                choices.append(arc)
+                weights.append(weight)
+        if not choices:
+            return self.choose(dfaIndex, stateIndex, allowed, canAccept,
+                               True, False)
+        pick = self.random.random() * sum(weights)
+        for choice, weight in zip(choices, weights):
+            pick -= weight
+            if pick < 0:
+                return choice
+        return choices[-1]
+
+    # ____________________________________________________________
+    def terminalText (self, label):
+        """SentenceGenerator.terminalText
+        Returns the text for a terminal label.
+        """
+        labelType, name = self.labels[label]
+        if name is not None:
+            return name
+        elif labelType == token.NAME:
+            text = "x%d" % self.random.randint(0, 999)
+            while text in self.keywords:
+                text = "x%d" % self.random.randint(0, 999)
+            return text
+        elif labelType == token.NUMBER:
+            return str(self.random.randint(0, 9999))
+        elif labelType == token.STRING:
+            return '"s%d"' % self.random.randint(0, 999)
+        elif labelType == token.NEWLINE:
+            return "\n"
+        elif labelType in (token.INDENT, token.DEDENT, token.ENDMARKER):
+            return ""
+        elif labelType in self.operatorText:
+            return self.operatorText[labelType]
+        raise ValueError("Don't know how to generate text for token %s." %
+                         (token.tok_name.get(labelType, labelType),))
+
+    # ____________________________________________________________
+    def tokens (self, start = None, size = None):
+        """SentenceGenerator.tokens
+        Yields the (type, string, lineno) tokens of one sentence derived
+        from start (a nonterminal type or name; defaults to the grammar's
+        start symbol).  If size is given, the start symbol's repetitions
+        keep going until about size characters of text were generated.
+        """
+        if start is None:
+            start = self.start
+        elif not isinstance(start, int):
+            start = self.symbols[start]
+        dfas = self.dfas
+        states = self.states
+        labels = self.labels
+        maxDepth = self.maxDepth
+        maxItemSize = self.maxItemSize
+        everything = (1 << len(labels)) - 1
+        lineno = 1
+        generated = 0
+        itemStart = 0
+        # stack := [ [dfa index, state index, viable label mask] ], where
+        # the viable mask holds the labels the parser could shift next.
+        startIndex = start - token.NT_OFFSET
+        stack = [[startIndex, dfas[startIndex][2], 0]]
+        self.updateViable(stack, 0)
+        while stack:
+            # Walk down from the top of the stack to pick the next
+            # terminal, narrowing the set of labels the choice allows.
+            allowed = everything
+            full = (size is not None) and (generated >= size)
+            while True:
+                level = len(stack) - 1
+                if 0 == level:
+                    itemStart = generated
+                finishing = full or (level >= maxDepth) or (
+                    (maxItemSize is not None) and
+                    (generated - itemStart >= maxItemSize))
+                dfaIndex, stateIndex, viable = stack[-1]
+                tableMask, accept = states[dfaIndex][stateIndex][1:3]
+                if level > 0:
+                    canAccept = accept and (allowed & ~tableMask &
+                                            stack[-2][2])
+                else:
+                    canAccept = accept
+                growing = (0 == level) and (size is not None) and not full
+                arc = self.choose(dfaIndex, stateIndex, allowed, canAccept,
+                                  finishing, growing)
+                if arc is None:
+                    stack.pop()
+                    if not stack:
+                        break
+                    allowed &= ~tableMask
+                    continue
+                label, arrow, mask = arc
+                allowed &= mask
+                stack[-1][1] = arrow
+                self.updateViable(stack, level)
+                labelType = labels[label][0]
+                if labelType < token.NT_OFFSET:
+                    break
+                dfaIndex = labelType - token.NT_OFFSET
+                stack.append([dfaIndex, dfas[dfaIndex][2], 0])
+                self.updateViable(stack, level + 1)
+            if not stack:
+                break
+            text = self.terminalText(label)
+            yield (labelType, text, lineno)
+            generated += len(text) + 1
+            if labelType == token.NEWLINE:
+                lineno += 1
+            # Pop accept-only states, as the parser does after a shift.
+            while stack and states[stack[-1][0]][stack[-1][1]][3]:
+                stack.pop()
+
+    # ____________________________________________________________
+    def updateViable (self, stack, level):
+        """SentenceGenerator.updateViable
+        Recomputes the viable label mask of a stack entry from its state
+        and the entry below it.
+        """
+        entry = stack[level]
+        tableMask, accept = self.states[entry[0]][entry[1]][1:3]
+        if accept and level > 0:
+            entry[2] = tableMask | stack[level - 1][2]
+        else:
+            entry[2] = tableMask
+
+    # ____________________________________________________________
+    def generate (self, start = None, size = None):
+        """SentenceGenerator.generate
+        Yields the text of one sentence (see tokens()) in chunks of about
+        CHUNK_SIZE characters.  Tokens are separated by spaces; NEWLINE,
+        INDENT and DEDENT tokens control line breaks and indentation.
+        """
+        chunk = []
+        chunkSize = 0
+        indent = 0
+        atLineStart = True
+        for labelType, text, lineno in self.tokens(start, size):
+            if labelType == token.INDENT:
+                indent += 1
+                continue
+            elif labelType == token.DEDENT:
+                indent -= 1
+                continue
+            elif labelType == token.NEWLINE:
+                if atLineStart:
+                    # A blank line would be an NL token, not a NEWLINE.
+                    continue
+                atLineStart = True
+            elif not text:
+                continue
+            elif atLineStart:
+                text = "    " * indent + text
+                atLineStart = False
+            else:
+                text = " " + text
+            chunk.append(text)
+            chunkSize += len(text)
+            if chunkSize >= CHUNK_SIZE:
+                yield "".join(chunk)
+                chunk = []
+                chunkSize = 0
+        if chunk:
+            yield "".join(chunk)
+
+    # ____________________________________________________________
+    def write (self, fileObj, start = None, size = None):
+        """SentenceGenerator.write
+        Writes the text of one sentence to a file object; returns the
+        number of characters written.
+        """
+        written = 0
+        for chunk in self.generate(start, size):
+            fileObj.write(chunk)
+            written += len(chunk)
+        return written
+
+# ______________________________________________________________________
+
+def main (*args):
+    """main()
+    Usage: generate.py <grammar.pgen> [size [seed [mode]]]
+    Writes a random sentence for the grammar's first rule to stdout.
+    """
+    import sys
+    from . import parser, pgen
+    grammar = pgen.buildParser(parser.parse_file(args[0])).toTuple()
+    size = None
+    seed = 0
+    mode = "balanced"
+    if len(args) > 1:
+        size = int(args[1])
+    if len(args) > 2:
+        seed = int(args[2])
+    if len(args) > 3:
+        mode = args[3]
+    SentenceGenerator(grammar, seed, mode = mode).write(sys.stdout, None,
+                                                        size)
+
+# ______________________________________________________________________
+
+if __name__ == "__main__":
+    import sys
+    main(*(sys.argv[1:]))
+
+# ______________________________________________________________________
+# End of pgen2.generate
@@ -0,0 +1,231 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.incremental
+
+Incremental grammar builds for PyPgen.
+
+IncrementalPgen keeps the DFA of every rule it has compiled, keyed by a hash
+of the rule's parse subtree (line numbers excluded), and only runs NFA and
+DFA construction for rules whose subtree changed since the previous build.
+First sets and accelerators are reused for nonterminals whose rule and
+dependencies are unchanged.  The grammar tuples it returns are identical to
+what a fresh PyPgen would build from the same parse tree.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import hashlib
+import token
+
+from . import dfa, parser, pgen
+
+# ______________________________________________________________________
+
+class IncrementalPgen (pgen.PyPgen):
+    """Class IncrementalPgen
+
+    PyPgen subclass that can be called repeatedly on successive versions of
+    a grammar parse tree.  After each build, self.stats holds the number of
+    rules, first sets and accelerated DFAs that had to be recomputed.
+    """
+    # ____________________________________________________________
+    def __init__ (self, opMap = None, **kws):
+        """IncrementalPgen.__init__
+        """
+        pgen.PyPgen.__init__(self, opMap, **kws)
+        # ruleCache := { key : ( name, [ Label ], [ [ Arc ] ] ) }
+        self.ruleCache = {}
+        self.previous = None
+        self.previousAccel = None
+        self.stats = {}
+
+    # ____________________________________________________________
+    def ruleKey (self, ast):
+        """IncrementalPgen.ruleKey()
+        Returns a hash of a RULE subtree that ignores line numbers, so moving
+        a rule around in the grammar file does not invalidate it.
+        """
+        parts = []
+        stack = [ast]
+        while stack:
+            nodeType, children = stack.pop()
+            if type(nodeType) == type(()):
+                nodeType = nodeType[:2]
+            parts.append("%r/%d" % (nodeType, len(children)))
+            stack.extend(reversed(children))
+        return hashlib.sha1(" ".join(parts).encode("utf-8")).hexdigest()
+
+    # ____________________________________________________________
+    def compileRules (self, rules):
+        """IncrementalPgen.compileRules()
+        Builds the DFAs for a list of RULE subtrees, each against its own
+        local label list.  Returns a list of (name, labels, arcLists)
+        entries, where arcLists holds the arcs of each DFA state using
+        indices into the local label list.
+        """
+        nfas = []
+        labelLists = []
+        for rule in rules:
+            self.nfaGrammar = [[], [(token.ENDMARKER, "EMPTY")]]
+            self.labelMap = None
+            self.crntType = token.NT_OFFSET
+            self.handleRule(rule)
+            nfas.append(self.nfaGrammar[0][0])
+            labelLists.append(tuple(self.nfaGrammar[1]))
+        self.nfaGrammar = None
+        self.labelMap = None
+        entries = []
+        for localDfa, localLabels in zip(self.nfasToDfas(nfas), labelLists):
+            arcLists = tuple(tuple(state[0]) for state in localDfa[3])
+            entries.append((localDfa[1], localLabels, arcLists))
+        return entries
+
+    # ____________________________________________________________
+    def generateDfas (self, ast):
+        """IncrementalPgen.generateDfas()
+        Returns the list of DFAs and the (untranslated) label list for the
+        grammar parse tree, compiling only the rules missing from the rule
+        cache.
+        """
+        nodeType, children = ast
+        assert nodeType == parser.MSTART
+        rules = [child for child in children if child[0] == parser.RULE]
+        keys = [self.ruleKey(rule) for rule in rules]
+        missing = {}
+        for key, rule in zip(keys, rules):
+            if (key not in self.ruleCache) and (key not in missing):
+                missing[key] = rule
+        missingKeys = list(missing.keys())
+        compiled = self.compileRules([missing[key] for key in missingKeys])
+        self.ruleCache.update(zip(missingKeys, compiled))
+        self.ruleCache = dict((key, self.ruleCache[key]) for key in keys)
+        self.stats["rules"] = len(missingKeys)
+        # Merge the local label lists in rule order, which adds labels in
+        # the same order as PyPgen.handleStart().
+        labels = [(token.ENDMARKER, "EMPTY")]
+        dfas = []
+        for position, key in enumerate(keys):
+            name, localLabels, arcLists = self.ruleCache[key]
+            remap = [self.addLabel(labels, tokType, tokName)
+                     for tokType, tokName in localLabels]
+            states = [([(remap[label], arrow) for label, arrow in arcs],
+                       (0, 0, ()), 0) for arcs in arcLists]
+            dfas.append([token.NT_OFFSET + position, name, 0, states, None])
+        self.labelMap = None
+        return keys, dfas, labels
+
+    # ____________________________________________________________
+    def generateFirstSets (self, grammar, keys = None):
+        """IncrementalPgen.generateFirstSets()
+        Like PyPgen.generateFirstSets(), but reuses the first set of every
+        DFA whose rule, and the rules its first set depends on, are
+        unchanged from the previous build.
+        """
+        dfas, labels = grammar[:2]
+        previous = self.previous
+        reused = set()
+        if ((keys is not None) and (previous is not None) and
+            (previous[1] == labels)):
+            prevKeys = previous[0]
+            reused = set(index for index, key in enumerate(keys)
+                         if (index < len(prevKeys)) and
+                         (prevKeys[index] == key))
+            changes = True
+            while changes:
+                changes = False
+                for index in list(reused):
+                    dfaObj = dfas[index]
+                    for label, arrow in dfaObj[3][dfaObj[2]][0]:
+                        depType = labels[label][0]
+                        if ((depType >= token.NT_OFFSET) and
+                            ((depType - token.NT_OFFSET) not in reused)):
+                            reused.discard(index)
+                            changes = True
+                            break
+            for index in reused:
+                dfas[index][4] = previous[2][index]
+        for dfaObj in dfas:
+            if None == dfaObj[4]:
+                self.calcFirstSet(grammar, dfaObj)
+        self.stats["firstSets"] = len(dfas) - len(reused)
+        if keys is not None:
+            self.previous = (keys, labels[:], [dfaObj[4] for dfaObj in dfas])
+        for dfaObj in dfas:
+            dfaObj[4] = self.firstSetToString(dfaObj[4], len(labels))
+        return grammar
+
+    # ____________________________________________________________
+    def __call__ (self, ast):
+        """IncrementalPgen.__call__()
+        Honors the same constructor keywords as PyPgen.__call__():
+        additional_tokens, start_symbol (the grammar is pruned after the
+        incremental build) and processes (see PyPgen.nfasToDfas()).
+        """
+        keys, dfas, labels = self.generateDfas(ast)
+        grammar = [dfas, labels[:], dfas[0][0], 0]
+        self.translateLabels(grammar, self.kws.get("additional_tokens"))
+        self.generateFirstSets(grammar, keys)
+        grammar[0] = [tuple(elem) for elem in grammar[0]]
+        start = self.kws.get("start_symbol")
+        if start is not None:
+            return self.pruneGrammar(tuple(grammar), start)
+        return tuple(grammar)
+
+    # ____________________________________________________________
+    def accelerate (self, grammar):
+        """IncrementalPgen.accelerate()
+        Returns the accelerated form of a grammar built by this object (see
+        pgen2.dfa.addAccelerators()).  A DFA keeps its accelerated form
+        from the previous call if neither it nor the first sets of the
+        nonterminals it refers to changed.
+        """
+        dfas, labels, start, accel = grammar
+        if 0 != accel:
+            return grammar
+        previous = self.previousAccel
+        if (previous is not None) and (previous[0][1] != labels):
+            previous = None
+        accelDfas = []
+        for index, dfaObj in enumerate(dfas):
+            if ((previous is not None) and (index < len(previous[0][0])) and
+                (previous[0][0][index] == dfaObj) and
+                self.sameTargets(grammar, previous[0], dfaObj)):
+                accelDfas.append(previous[1][index])
+            else:
+                accelDfas.append(dfa.accelerateDFA(grammar, dfaObj))
+        self.stats["accelerators"] = len(dfas) - sum(
+            1 for index, accelDfa in enumerate(accelDfas)
+            if (previous is not None) and (index < len(previous[1])) and
+            (accelDfa is previous[1][index]))
+        self.previousAccel = (grammar, accelDfas)
+        return (accelDfas, labels, start, 1)
+
+    # ____________________________________________________________
+    def sameTargets (self, grammar, prevGrammar, dfaObj):
+        """IncrementalPgen.sameTargets()
+        Returns True if every nonterminal referred to by the arcs of dfaObj
+        has the same first set in grammar and prevGrammar.
+        """
+        labels = grammar[1]
+        for state in dfaObj[3]:
+            for label, arrow in state[0]:
+                index = labels[label][0] - token.NT_OFFSET
+                if index >= 0:
+                    if ((index >= len(prevGrammar[0])) or
+                        (grammar[0][index][4] != prevGrammar[0][index][4])):
+                        return False
+        return True
+
+    # ____________________________________________________________
+    def buildParser (self, grammarST, tokenizer_cls=None):
+        """IncrementalPgen.buildParser()
+        Rebuilds the grammar and returns a PyPgenParser over its
+        accelerated form.
+        """
+        return pgen.PyPgenParser(self.accelerate(self(grammarST)),
+                                 tokenizer_cls)
+
+# ______________________________________________________________________
+# End of pgen2.incremental
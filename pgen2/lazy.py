@@ -0,0 +1,303 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.lazy
+
+Lazy subtree parsing.
+
+Some nonterminals can be marked as lazy, for example "suite" (an indented
+block) or "trailer" (a bracketed argument list or subscript).  When the
+parser would push one of them at an opening bracket, or at a NEWLINE
+followed by an INDENT, it skips to the matching closing bracket or DEDENT
+at token level instead.  It records a placeholder node whose children are
+a LazyChildren sequence holding that token range.  The range is parsed
+with pgen2.dfa.addToken() the first time the children are accessed
+(iterated, indexed, measured or compared); lazy nonterminals nested in it
+become placeholders in turn.  An outline parse that never looks inside the
+skipped regions costs little more than tokenizing.
+
+Once every placeholder is parsed the tree equals the one parsetok() builds.
+Syntax errors inside a skipped region are only raised (as SyntaxError)
+when that region is parsed.  A nonterminal can only be lazy if, once it
+starts with an opening bracket or NEWLINE, it ends exactly at its closing
+bracket or DEDENT; LazyParse checks this and raises ValueError otherwise.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import token
+
+from . import dfa
+
+# ______________________________________________________________________
+# Module data
+
+BRACKETS = {token.LPAR : token.RPAR, token.LSQB : token.RSQB,
+            token.LBRACE : token.RBRACE}
+CLOSERS = (token.RPAR, token.RSQB, token.RBRACE, token.DEDENT)
+OPENERS = (token.LPAR, token.LSQB, token.LBRACE, token.NEWLINE,
+           token.INDENT)
+
+# ______________________________________________________________________
+# Function definitions
+
+def matchRanges (tokens):
+    """matchRanges()
+    Returns a dictionary mapping the index of every opening bracket or
+    INDENT token (and every NEWLINE followed by an INDENT) to the index of
+    its matching closing bracket or DEDENT.  Unbalanced brackets are left
+    out.
+    """
+    matches = {}
+    # openers := [ (index, closing bracket type or None for DEDENT) ]
+    openers = []
+    for index, (type, name, lineno) in enumerate(tokens):
+        if type == token.INDENT:
+            openers.append((index, None))
+        elif type == token.DEDENT:
+            if openers and (openers[-1][1] is None):
+                matches[openers.pop()[0]] = index
+        elif type in BRACKETS:
+            openers.append((index, BRACKETS[type]))
+        elif openers and (openers[-1][1] == type):
+            matches[openers.pop()[0]] = index
+    for index in range(len(tokens) - 1):
+        if ((tokens[index][0] == token.NEWLINE) and
+            (index + 1 in matches) and
+            (tokens[index + 1][0] == token.INDENT)):
+            matches[index] = matches[index + 1]
+    return matches
+
+# ______________________________________________________________________
+
+def expand (tree):
+    """expand()
+    Parses every placeholder in a tree and returns an equal tree built from
+    plain lists.
+    """
+    root = (tree[0], [])
+    stack = [(tree, root)]
+    while stack:
+        node, copy = stack.pop()
+        for child in node[1]:
+            childCopy = (child[0], [])
+            copy[1].append(childCopy)
+            stack.append((child, childCopy))
+    return root
+
+# ______________________________________________________________________
+# Class definitions
+
+class LazyChildren (object):
+    """Class LazyChildren
+
+    Read-only sequence standing in for the child list of a placeholder
+    node.  The token range [begin, end) is parsed as the given nonterminal
+    on first access.
+    """
+    __hash__ = None
+
+    # ____________________________________________________________
+    def __init__ (self, lazyParse, symbol, begin, end):
+        """LazyChildren.__init__
+        """
+        self.lazyParse = lazyParse
+        self.symbol = symbol
+        self.begin = begin
+        self.end = end
+        self.items = None
+
+    # ____________________________________________________________
+    def isParsed (self):
+        """LazyChildren.isParsed
+        """
+        return self.items is not None
+
+    # ____________________________________________________________
+    def materialize (self):
+        """LazyChildren.materialize
+        Parses the token range if needed; returns the list of children.
+        """
+        if self.items is None:
+            self.items = self.lazyParse.parseRange(self.symbol, self.begin,
+                                                   self.end)
+        return self.items
+
+    # ____________________________________________________________
+    def __len__ (self):
+        """LazyChildren.__len__
+        """
+        return len(self.materialize())
+
+    # ____________________________________________________________
+    def __iter__ (self):
+        """LazyChildren.__iter__
+        """
+        return iter(self.materialize())
+
+    # ____________________________________________________________
+    def __reversed__ (self):
+        """LazyChildren.__reversed__
+        """
+        return reversed(self.materialize())
+
+    # ____________________________________________________________
+    def __getitem__ (self, index):
+        """LazyChildren.__getitem__
+        """
+        return self.materialize()[index]
+
+    # ____________________________________________________________
+    def __contains__ (self, item):
+        """LazyChildren.__contains__
+        """
+        return item in self.materialize()
+
+    # ____________________________________________________________
+    def __eq__ (self, other):
+        """LazyChildren.__eq__
+        Compares the parsed children with a list (or another LazyChildren).
+        """
+        if isinstance(other, LazyChildren):
+            other = other.materialize()
+        return self.materialize() == other
+
+    # ____________________________________________________________
+    def __ne__ (self, other):
+        """LazyChildren.__ne__
+        """
+        return not self.__eq__(other)
+
+    # ____________________________________________________________
+    def __repr__ (self):
+        """LazyChildren.__repr__
+        """
+        if self.items is None:
+            return "<unparsed tokens %d:%d>" % (self.begin, self.end)
+        return repr(self.items)
+
+# ______________________________________________________________________
+
+class LazyParse (object):
+    """Class LazyParse
+
+    Lazy parse of a token list with an accelerated grammar.  lazySymbols
+    is an iterable of nonterminal types to skip.  parse() returns the root
+    node; placeholders keep a reference to the LazyParse (and so to the
+    token list) until they are parsed.
+    """
+    # ____________________________________________________________
+    def __init__ (self, grammar, tokens, lazySymbols):
+        """LazyParse.__init__
+        """
+        self.grammar = dfa.addAccelerators(grammar)
+        self.tokens = list(tokens)
+        self.matches = matchRanges(self.tokens)
+        # openers := { label index : set of lazy nonterminals it starts }
+        self.openers = {}
+        for symbol in lazySymbols:
+            for ilabel in self.checkSymbol(symbol):
+                self.openers.setdefault(ilabel, set()).add(symbol)
+
+    # ____________________________________________________________
+    def checkSymbol (self, symbol):
+        """LazyParse.checkSymbol
+        Returns the labels of the opening tokens the initial state of a
+        lazy nonterminal shifts directly.  Raises ValueError unless every
+        closing token arc reachable after them ends the nonterminal and no
+        other arc does.
+        """
+        labels = self.grammar[1]
+        symbolDFA = dfa.findDFA(self.grammar, symbol)
+        states = symbolDFA[3]
+        openLabels = []
+        pending = []
+        for ilabel, arrow in states[symbolDFA[2]][0]:
+            if labels[ilabel][0] in OPENERS:
+                openLabels.append(ilabel)
+                pending.append(arrow)
+        if not openLabels:
+            raise ValueError("lazy nonterminal %s does not start with an "
+                             "opening bracket or NEWLINE" % symbolDFA[1])
+        seen = set()
+        while pending:
+            stateIndex = pending.pop()
+            if stateIndex in seen:
+                continue
+            seen.add(stateIndex)
+            for ilabel, arrow in states[stateIndex][0]:
+                if 0 == ilabel:
+                    continue
+                target = states[arrow]
+                acceptOnly = bool(target[2]) and (len(target[0]) == 1)
+                if (labels[ilabel][0] in CLOSERS) != acceptOnly:
+                    raise ValueError("lazy nonterminal %s does not end at "
+                                     "its closing bracket or DEDENT" %
+                                     symbolDFA[1])
+                pending.append(arrow)
+        return openLabels
+
+    # ____________________________________________________________
+    def parse (self, start = None):
+        """LazyParse.parse
+        Parses the token list from the start symbol (the grammar's by
+        default) and returns the root node.  As with parsetok(), any tokens
+        after the end of the start symbol are ignored.
+        """
+        if start is None:
+            start = self.grammar[2]
+        return ((start, None, 0), self.parseRange(start, 0, len(self.tokens),
+                                                  False))
+
+    # ____________________________________________________________
+    def parseRange (self, symbol, begin, end, exact = True):
+        """LazyParse.parseRange
+        Parses the tokens in [begin, end) as a nonterminal, which must end
+        exactly at the last token unless exact is false.  Returns the list
+        of child nodes.
+        """
+        grammar = self.grammar
+        tokens = self.tokens
+        matches = self.matches
+        openers = self.openers
+        rootNode = ((symbol, None, 0), [])
+        symbolDFA = dfa.findDFA(grammar, symbol)
+        stack = [(symbolDFA[3][symbolDFA[2]], symbolDFA, rootNode)]
+        result = dfa.E_OK
+        lineno = 0
+        index = begin
+        while (index < end) and (result == dfa.E_OK):
+            type, name, lineno = tokens[index]
+            lazy = None
+            if index in matches:
+                lazy = openers.get(dfa.classify(grammar, type, name))
+            result, stack, errMsg = dfa.addToken(grammar, stack, type, name,
+                                                 lineno, None, lazy)
+            index += 1
+            if result == dfa.E_LAZY:
+                last = matches[index - 1]
+                stack[-1][2][1].append(((errMsg, None, lineno),
+                                        LazyChildren(self, errMsg,
+                                                     index - 1, last + 1)))
+                index = last + 1
+                result = dfa.E_OK
+                state = stack[-1][0]
+                while state[2] and len(state[0]) == 1:
+                    stack = stack[:-1]
+                    if 0 == len(stack):
+                        result = dfa.E_DONE
+                        break
+                    state = stack[-1][0]
+        if result == dfa.E_SYNTAX:
+            raise SyntaxError("Error in line %d%s" % (lineno, errMsg))
+        elif result != dfa.E_DONE:
+            raise SyntaxError("Error in line %d, unexpected end of input" %
+                              lineno)
+        elif exact and (index < end):
+            raise SyntaxError("Error in line %d, unexpected %s" %
+                              (tokens[index][2], repr(tokens[index][1])))
+        return rootNode[1]
+
+# ______________________________________________________________________
+# End of pgen2.lazy
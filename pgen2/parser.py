@@ -3,13 +3,16 @@
 """Module pypgen.parser
 
 Implements a recursive descent parser for the Python pgen parser generator
-input language.
+input language.  The handlers for nested right hand sides run as generators
+on an explicit stack (see trampoline()), so deeply nested grammars are not
+limited by the Python recursion limit.
 """
 # ______________________________________________________________________
 
 from __future__ import absolute_import
 
 import token
+import types
 from . import tokenizer
 import pprint
 
@@ -88,25 +91,57 @@ def handleRule (tokenizer_obj, crntToken = None):
 
 # ______________________________________________________________________
 
+def trampoline (generator):
+    """trampoline()
+    Runs a generator that stands for a recursive function, with an explicit
+    stack instead of the Python call stack.  The generator yields another
+    such generator to call it, and is sent back its result; any other value
+    it yields is its own result.  Returns the result of the outermost
+    generator.
+    """
+    stack = [generator]
+    value = None
+    while stack:
+        request = stack[-1].send(value)
+        if isinstance(request, types.GeneratorType):
+            stack.append(request)
+            value = None
+        else:
+            stack.pop()
+            value = request
+    return value
+
+# ______________________________________________________________________
+
 def handleRhs (tokenizer_obj, crntToken = None):
     """handleRhs()
     RHS := ALT ( VBAR ALT )*
     """
+    return trampoline(rhsSteps(tokenizer_obj, crntToken))
+
+# ______________________________________________________________________
+
+def rhsSteps (tokenizer_obj, crntToken = None):
+    """rhsSteps()
+    Generator form of handleRhs(), run by trampoline().  The RHS, ALT, ITEM
+    and ATOM handlers nest as deeply as the grammar's brackets, so they
+    never call each other directly.
+    """
     children = []
-    altResult, crntToken = handleAlt(tokenizer_obj, crntToken)
+    altResult, crntToken = yield altSteps(tokenizer_obj, crntToken)
     children.append(altResult)
     if None == crntToken:
         crntToken = next(tokenizer_obj)
     while crntToken[0] == token.VBAR:
         children.append((crntToken, []))
-        altResult, crntToken = handleAlt(tokenizer_obj)
+        altResult, crntToken = yield altSteps(tokenizer_obj)
         children.append(altResult)
         if None == crntToken:
             crntToken = next(tokenizer_obj)
     result = (RHS, children)
     if __DEBUG__:
         pprint.pprint(result)
-    return result, crntToken
+    yield result, crntToken
 
 # ______________________________________________________________________
 
@@ -114,17 +149,25 @@ def handleAlt (tokenizer_obj, crntToken = None):
     """handleAlt()
     ALT := ITEM+
     """
+    return trampoline(altSteps(tokenizer_obj, crntToken))
+
+# ______________________________________________________________________
+
+def altSteps (tokenizer_obj, crntToken = None):
+    """altSteps()
+    Generator form of handleAlt(), run by trampoline().
+    """
     children = []
-    itemResult, crntToken = handleItem(tokenizer_obj, crntToken)
+    itemResult, crntToken = yield itemSteps(tokenizer_obj, crntToken)
     children.append(itemResult)
     if None == crntToken:
         crntToken = next(tokenizer_obj)
     while crntToken[0] in (token.LSQB, token.LPAR, token.NAME, token.STRING):
-        itemResult, crntToken = handleItem(tokenizer_obj, crntToken)
+        itemResult, crntToken = yield itemSteps(tokenizer_obj, crntToken)
         children.append(itemResult)
         if None == crntToken:
             crntToken = next(tokenizer_obj)
-    return (ALT, children), crntToken
+    yield (ALT, children), crntToken
 
 # ______________________________________________________________________
 
@@ -133,12 +176,20 @@ def handleItem (tokenizer_obj, crntToken = None):
     ITEM := LSQB RHS RSQB
          | ATOM ( STAR | PLUS )?
     """
+    return trampoline(itemSteps(tokenizer_obj, crntToken))
+
+# ______________________________________________________________________
+
+def itemSteps (tokenizer_obj, crntToken = None):
+    """itemSteps()
+    Generator form of handleItem(), run by trampoline().
+    """
     children = []
     if None == crntToken:
         crntToken = next(tokenizer_obj)
     if crntToken[0] == token.LSQB:
         children.append((crntToken, []))
-        rhsResult, crntToken = handleRhs(tokenizer_obj)
+        rhsResult, crntToken = yield rhsSteps(tokenizer_obj)
         children.append(rhsResult)
         if None == crntToken:
             crntToken = next(tokenizer_obj)
@@ -146,14 +197,14 @@ def handleItem (tokenizer_obj, crntToken = None):
         children.append((crntToken, []))
         crntToken = None
     else:
-        atomResult, crntToken = handleAtom(tokenizer_obj,crntToken)
+        atomResult, crntToken = yield atomSteps(tokenizer_obj, crntToken)
         children.append(atomResult)
         if None == crntToken:
             crntToken = next(tokenizer_obj)
         if crntToken[0] in (token.STAR, token.PLUS):
             children.append((crntToken, []))
             crntToken = None
-    return (ITEM, children), crntToken
+    yield (ITEM, children), crntToken
 
 # ______________________________________________________________________
 
@@ -163,13 +214,21 @@ def handleAtom (tokenizer_obj, crntToken = None):
           | NAME
           | STRING
     """
+    return trampoline(atomSteps(tokenizer_obj, crntToken))
+
+# ______________________________________________________________________
+
+def atomSteps (tokenizer_obj, crntToken = None):
+    """atomSteps()
+    Generator form of handleAtom(), run by trampoline().
+    """
     children = []
     if None == crntToken:
         crntToken = next(tokenizer_obj)
     tokType = crntToken[0]
     if tokType == token.LPAR:
         children.append((crntToken, []))
-        rhsResult, crntToken = handleRhs(tokenizer_obj)
+        rhsResult, crntToken = yield rhsSteps(tokenizer_obj)
         children.append(rhsResult)
         if None == crntToken:
             crntToken = next(tokenizer_obj)
@@ -183,13 +242,15 @@ def handleAtom (tokenizer_obj, crntToken = None):
         expect(token.NAME, crntToken)
         children.append((crntToken, []))
         # crntToken = None
-    return (ATOM, children), None
+    yield (ATOM, children), None
 
 # ______________________________________________________________________
 
 def parse_string(in_string, tokenizer_obj=None):
     if tokenizer_obj == None:
         tokenizer_obj = tokenizer.Tokenizer()
+    if hasattr(tokenizer_obj, "tokenStreamString"):
+        return handleStart(tokenizer_obj.tokenStreamString(in_string))
     return handleStart(tokenizer_obj.tokenizeString(in_string))
 
 # ______________________________________________________________________
@@ -198,7 +259,10 @@ def parse_file(filename, tokenizer_obj=None):
     with open(filename) as fileobj:
         if tokenizer_obj == None:
             tokenizer_obj = tokenizer.Tokenizer()
-        ret_val = handleStart(tokenizer_obj.tokenize(fileobj))
+        if hasattr(tokenizer_obj, "tokenStream"):
+            ret_val = handleStart(tokenizer_obj.tokenStream(fileobj))
+        else:
+            ret_val = handleStart(tokenizer_obj.tokenize(fileobj))
     return ret_val
 
 # ______________________________________________________________________
@@ -9,7 +9,7 @@ Python implementation of the CPython distribution parser generator, pgen.
 from __future__ import absolute_import
 
 from . import tokenizer, parser, dfa
-import sys, token, string, pprint
+import sys, token, tokenize, string, pprint, hashlib, binascii
 
 # ______________________________________________________________________
 # Module data
@@ -18,6 +18,22 @@ EMPTY = token.ENDMARKER
 
 __DEBUG__ = False
 
+# Grammars with fewer rules than this are always converted serially; for
+# small grammars the cost of starting worker processes dominates.
+PARALLEL_THRESHOLD = 64
+
+# PyPgen methods behind nfaToDfa(); rules are only converted in worker
+# processes, by the module-level functions, when none is overridden.
+DFA_HOOKS = ("addClosure", "nfaToDfa", "sameState", "simplifyTempDfa",
+             "tempDfaToDfa")
+
+# Exceptions PyPgenParser.parseBatch() reports per input instead of raising.
+BATCH_ERRORS = (SyntaxError, tokenize.TokenError, dfa.ParseLimitExceeded)
+
+# Keyword arguments buildParser() passes on to PyPgenParser; the others go to
+# PyPgen.
+PARSER_KEYWORDS = ("cache", "limits", "lazy", "fused")
+
 try:
     long(0)
     ascii_letters = string.letters
@@ -37,35 +53,73 @@ class PyPgen (object):
         """
         self.nfaGrammar = self.dfaGrammar = None
         self.nfa = None
+        self.labelMap = None
         self.crntType = token.NT_OFFSET
         if None == opMap:
             self.operatorMap = tokenizer.Tokenizer.operatorMap
         else:
             self.operatorMap = opMap
         self.kws = kws
+        self.processes = kws.get("processes", None)
+        self.pool = kws.get("pool", None)
+        self.parallelThreshold = kws.get("parallel_threshold",
+                                         PARALLEL_THRESHOLD)
 
     # ____________________________________________________________
     def addLabel (self, labelList, tokType, tokName):
         """PyPgen.addLabel
+        Returns the index of the (tokType, tokName) label in labelList,
+        appending it if it is not already present.  Lookups go through a
+        dictionary index kept alongside the list, so this is constant time
+        instead of a scan of the label list.
         """
-        # XXX
-        #labelIndex = 0
-        #for labelType, labelName in labelList:
-        #    if (labelType == tokType) and (labelName == tokName):
-        #        return labelIndex
-        #    labelIndex += 1
         labelTup = (tokType, tokName)
-        if labelTup in labelList:
-            return labelList.index(labelTup)
-        labelIndex = len(labelList)
-        labelList.append(labelTup)
+        labelMap = self.getLabelMap(labelList)
+        labelIndex = labelMap.get(labelTup)
+        if labelIndex is None:
+            labelIndex = len(labelList)
+            labelList.append(labelTup)
+            labelMap[labelTup] = labelIndex
+            self.labelMap = (labelList, len(labelList), labelMap)
         return labelIndex
 
+    # ____________________________________________________________
+    def getLabelMap (self, labelList):
+        """PyPgen.getLabelMap
+        Returns the label -> index dictionary for labelList.  The index
+        is cached for the last list seen, keyed on the list and its length,
+        and rebuilt from scratch for any other list or when the list was
+        resized behind addLabel()'s back (first occurrence wins, like
+        list.index()).
+        """
+        labelMap = self.labelMap
+        if ((labelMap is None) or (labelMap[0] is not labelList) or
+            (labelMap[1] != len(labelList))):
+            index = {}
+            for labelIndex in range(len(labelList) - 1, -1, -1):
+                index[labelList[labelIndex]] = labelIndex
+            labelMap = self.labelMap = (labelList, len(labelList), index)
+        return labelMap[2]
+
+    # ____________________________________________________________
+    def getSymbolMap (self, dfas):
+        """PyPgen.getSymbolMap
+        Returns a dictionary mapping nonterminal names to their types for
+        the given list of NFAs or DFAs (the first rule with a given name
+        wins, matching the order of a linear search).
+        """
+        symbolMap = {}
+        for dfa in dfas:
+            if dfa[1] not in symbolMap:
+                symbolMap[dfa[1]] = dfa[0]
+        return symbolMap
+
     # ____________________________________________________________
     def handleStart (self, ast):
         """PyPgen.handleStart()
         """
         self.nfaGrammar = [[],[(token.ENDMARKER, "EMPTY")]]
+        self.labelMap = None
         self.crntType = token.NT_OFFSET
         type, children = ast
         assert type == parser.MSTART
@@ -92,8 +146,7 @@ class PyPgen (object):
         name, colon, rhs, newline = children
         assert name[0][0] == token.NAME, "Malformed pgen parse tree"
         self.nfa[1] = name[0][1]
-        if (token.NAME, name[0][1]) not in self.nfaGrammar[1]:
-            self.nfaGrammar[1].append((token.NAME, name[0][1]))
+        self.addLabel(self.nfaGrammar[1], token.NAME, self.nfa[1])
         assert colon[0][0] == token.COLON, "Malformed pgen parse tree"
         start, finish = self.handleRhs(rhs)
         self.nfa[3] = start
@@ -105,10 +158,21 @@ class PyPgen (object):
     # ____________________________________________________________
     def handleRhs (self, ast):
         """PyPgen.handleRhs()
+        Returns the (start, finish) NFA states built for an RHS node.  The
+        RHS, ALT, ITEM and ATOM builders are generators run by
+        parser.trampoline(), so they never recurse on the Python stack;
+        nodes are visited (and states and labels allocated) in the same
+        order as a recursive walk.
+        """
+        return parser.trampoline(self.rhsSteps(ast))
+
+    # ____________________________________________________________
+    def rhsSteps (self, ast):
+        """PyPgen.rhsSteps()
         """
         type, children = ast
         assert type == parser.RHS
-        start, finish = self.handleAlt(children[0])
+        start, finish = yield self.altSteps(children[0])
         if len(children) > 1:
             cStart = start
             cFinish = finish
@@ -119,33 +183,45 @@ class PyPgen (object):
             self.nfa[2][cFinish].append((EMPTY, finish))
             for child in children[2:]:
                 if child[0] == parser.ALT:
-                    cStart, cFinish = self.handleAlt(child)
+                    cStart, cFinish = yield self.altSteps(child)
                     self.nfa[2][start].append((EMPTY, cStart))
                     self.nfa[2][cFinish].append((EMPTY, finish))
-        return start, finish
+        yield start, finish
 
     # ____________________________________________________________
     def handleAlt (self, ast):
         """PyPgen.handleAlt()
         """
+        return parser.trampoline(self.altSteps(ast))
+
+    # ____________________________________________________________
+    def altSteps (self, ast):
+        """PyPgen.altSteps()
+        """
         type, children = ast
         assert type == parser.ALT
-        start, finish = self.handleItem(children[0])
+        start, finish = yield self.itemSteps(children[0])
         if len(children) > 1:
             for child in children[1:]:
-                cStart, cFinish = self.handleItem(child)
+                cStart, cFinish = yield self.itemSteps(child)
                 self.nfa[2][finish].append((EMPTY, cStart))
                 finish = cFinish
-        return start, finish
+        yield start, finish
 
     # ____________________________________________________________
     def handleItem (self, ast):
         """PyPgen.handleItem()
         """
+        return parser.trampoline(self.itemSteps(ast))
+
+    # ____________________________________________________________
+    def itemSteps (self, ast):
+        """PyPgen.itemSteps()
+        """
         nodeType, children = ast
         assert nodeType == parser.ITEM
         if children[0][0] == parser.ATOM:
-            start, finish = self.handleAtom(children[0])
+            start, finish = yield self.atomSteps(children[0])
             if len(children) > 1:
                 # Short out the child NFA
                 self.nfa[2][finish].append((EMPTY, start))
@@ -159,22 +235,28 @@ class PyPgen (object):
             finish = start + 1
             self.nfa[2].append([(EMPTY, finish)])
             self.nfa[2].append([])
-            cStart, cFinish = self.handleRhs(children[1])
+            cStart, cFinish = yield self.rhsSteps(children[1])
             self.nfa[2][start].append((EMPTY, cStart))
             self.nfa[2][cFinish].append((EMPTY, finish))
             assert (len(children) == 3) and (children[2][0][0] == token.RSQB)
-        return start, finish
+        yield start, finish
 
     # ____________________________________________________________
     def handleAtom (self, ast):
         """PyPgen.handleAtom()
         """
+        return parser.trampoline(self.atomSteps(ast))
+
+    # ____________________________________________________________
+    def atomSteps (self, ast):
+        """PyPgen.atomSteps()
+        """
         nodeType, children = ast
         assert nodeType == parser.ATOM
         assert type(children[0][0]) == type(())
         tokType, tokName, lineno = children[0][0]
         if tokType == token.LPAR:
-            start, finish = self.handleRhs(children[1])
+            start, finish = yield self.rhsSteps(children[1])
             assert (len(children) == 3) and (children[2][0][0] == token.RPAR)
         elif tokType in (token.STRING, token.NAME):
             start = len(self.nfa[2])
@@ -184,184 +266,117 @@ class PyPgen (object):
             self.nfa[2].append([])
         else:
             assert 1 == 0, "Malformed pgen parse tree."
-        return start, finish
+        yield start, finish
 
     # ____________________________________________________________
     def generateDfaGrammar (self, nfaGrammar, start_symbol = None):
         """PyPgen.makeDfaGrammar()
         See notes in pypgen.dfa for output schema.
         """
-        dfas = []
-        for nfa in nfaGrammar[0]:
-            dfas.append(self.nfaToDfa(nfa))
+        dfas = self.nfasToDfas(nfaGrammar[0])
         start_symbol_type = dfas[0][0]
         if start_symbol is not None:
-            found = False
-            for dfa in dfas:
-                if dfa[1] == start_symbol:
-                    start_symbol_type = dfa[0]
-                    found = True
-                    break
-            if not found:
+            symbolMap = self.getSymbolMap(dfas)
+            if start_symbol in symbolMap:
+                start_symbol_type = symbolMap[start_symbol]
+            else:
                 print("PyPgen: Warning, couldn't find nonterminal '%s', "
                       "using '%s' instead." % (start_symbol, dfas[0][1]))
         return [dfas, nfaGrammar[1][:], start_symbol_type, 0]
 
+    # ____________________________________________________________
+    def nfasToDfas (self, nfas):
+        """PyPgen.nfasToDfas()
+        Converts a list of NFAs to a list of DFAs, in the same order.
+
+        Each rule is converted independently, so when the "processes"
+        keyword was passed to the constructor the rules are distributed
+        across a multiprocessing pool (processes=0 uses every CPU).  A pool
+        passed as the "pool" keyword is used instead of starting one for
+        the call, and left open, so it can serve many builds.  The workers
+        run the module-level nfaToDfa(), so the class is never instantiated
+        in them.  The serial loop is used when neither processes (other
+        than None or 1) nor a pool was given, when there are fewer than
+        parallel_threshold rules, when the class overrides one of the
+        DFA_HOOKS methods, or when multiprocessing is unavailable.
+        """
+        processes = self.processes
+        pool = self.pool
+        if ((len(nfas) < self.parallelThreshold) or
+            ((pool is None) and ((processes is None) or (processes == 1))) or
+            [name for name in DFA_HOOKS
+             if _method(self.__class__, name) is not _method(PyPgen, name)]):
+            return [self.nfaToDfa(nfa) for nfa in nfas]
+        try:
+            import multiprocessing
+        except ImportError:
+            return [self.nfaToDfa(nfa) for nfa in nfas]
+        if not processes:
+            processes = multiprocessing.cpu_count()
+        chunksize = max(1, len(nfas) // (processes * 4))
+        if pool is not None:
+            return pool.map(nfaToDfa, nfas, chunksize)
+        pool = multiprocessing.Pool(processes)
+        try:
+            dfas = pool.map(nfaToDfa, nfas, chunksize)
+        finally:
+            pool.close()
+            pool.join()
+        return dfas
+
     # ____________________________________________________________
     def addClosure (self, stateList, nfa, istate):
-        stateList[istate] = True
-        arcs = nfa[2][istate]
-        for label, arrow in arcs:
-            if label == EMPTY:
-                self.addClosure(stateList, nfa, arrow)
+        """PyPgen.addClosure()
+        See the module-level addClosure().
+        """
+        addClosure(stateList, nfa, istate)
 
     # ____________________________________________________________
     def nfaToDfa (self, nfa):
         """PyPgen.nfaToDfa()
+        See the module-level nfaToDfa(); the steps are this object's
+        addClosure(), simplifyTempDfa() (which compares states with
+        sameState()) and tempDfaToDfa(), so subclasses can override them.
         """
-        tempStates = []
-        # tempState := [ stateList : List of Boolean,
-        #                arcList : List of tempArc ]
-        crntTempState = [[False] * len(nfa[2]), [], False]
-        self.addClosure(crntTempState[0], nfa, nfa[3])
-        crntTempState[2] = crntTempState[0][nfa[4]]
-        if crntTempState[2]:
-            print("PyPgen: Warning, nonterminal '%s' may produce empty." %
-                  (nfa[1]))
-        tempStates.append(crntTempState)
-        index = 0
-        while index < len(tempStates):
-            crntTempState = tempStates[index]
-            for componentState in range(0, len(nfa[2])):
-                if not crntTempState[0][componentState]:
-                    continue
-                nfaArcs = nfa[2][componentState]
-                for label, nfaArrow in nfaArcs:
-                    if label == EMPTY:
-                        continue
-                    foundTempArc = False
-                    for tempArc in crntTempState[1]:
-                        if tempArc[0] == label:
-                            foundTempArc = True
-                            break
-                    if not foundTempArc:
-                        tempArc = [label, -1, [False] * len(nfa[2])]
-                        crntTempState[1].append(tempArc)
-                    self.addClosure(tempArc[2], nfa, nfaArrow)
-            for arcIndex in range(0, len(crntTempState[1])):
-                label, arrow, targetStateList = crntTempState[1][arcIndex]
-                targetFound = False
-                arrow = 0
-                for destTempState in tempStates:
-                    if targetStateList == destTempState[0]:
-                        targetFound = True
-                        break
-                    arrow += 1
-                if not targetFound:
-                    assert arrow == len(tempStates)
-                    tempState = [targetStateList[:], [],
-                                 targetStateList[nfa[4]]]
-                    tempStates.append(tempState)
-                # Write arrow value back to the arc
-                crntTempState[1][arcIndex][1] = arrow
-            index += 1
-        tempStates = self.simplifyTempDfa(nfa, tempStates)
-        return self.tempDfaToDfa(nfa, tempStates)
+        return nfaToDfa(nfa, self.addClosure, self.simplifyTempDfa,
+                        self.tempDfaToDfa)
 
     # ____________________________________________________________
     def sameState (self, s1, s2):
         """PyPgen.sameState()
         """
-        if (len(s1[1]) != len(s2[1])) or (s1[2] != s2[2]):
-            return False
-        for arcIndex in range(0, len(s1[1])):
-            arc1 = s1[1][arcIndex]
-            arc2 = s2[1][arcIndex]
-            if arc1[:-1] != arc2[:-1]:
-                return False
-        return True
+        return sameState(s1, s2)
 
     # ____________________________________________________________
     def simplifyTempDfa (self, nfa, tempStates):
         """PyPgen.simplifyDfa()
         """
-        if __DEBUG__:
-            print("_" * 70)
-            pprint.pprint(nfa)
-            pprint.pprint(tempStates)
-        changes = True
-        deletedStates = []
-        while changes:
-            changes = False
-            for i in range(1, len(tempStates)):
-                if i in deletedStates:
-                    continue
-                for j in range(0, i):
-                    if j in deletedStates:
-                        continue
-                    if self.sameState(tempStates[i], tempStates[j]):
-                        deletedStates.append(i)
-                        for k in range(0, len(tempStates)):
-                            if k in deletedStates:
-                                continue
-                            for arc in tempStates[k][1]:
-                                if arc[1] == i:
-                                    arc[1] = j
-                        changes = True
-                        break
-        for stateIndex in deletedStates:
-            tempStates[stateIndex] = None
-        if __DEBUG__:
-            pprint.pprint(tempStates)
-        return tempStates
+        return simplifyTempDfa(nfa, tempStates, self.sameState)
 
     # ____________________________________________________________
     def tempDfaToDfa (self, nfa, tempStates):
         """PyPgen.tempDfaToDfa()
         """
-        dfaStates = []
-        dfa = [nfa[0], nfa[1], 0, dfaStates, None]
-        stateMap = {}
-        tempIndex = 0
-        for tempState in tempStates:
-            if None != tempState:
-                stateMap[tempIndex] = len(dfaStates)
-                dfaStates.append(([], (0,0,()), 0))
-            tempIndex += 1
-        for tempIndex in stateMap.keys():
-            stateList, tempArcs, accepting = tempStates[tempIndex]
-            dfaStateIndex = stateMap[tempIndex]
-            dfaState = dfaStates[dfaStateIndex]
-            for tempArc in tempArcs:
-                dfaState[0].append((tempArc[0], stateMap[tempArc[1]]))
-            if accepting:
-                dfaState[0].append((EMPTY, dfaStateIndex))
-        return dfa
+        return tempDfaToDfa(nfa, tempStates)
 
     # ____________________________________________________________
     def translateLabels (self, grammar, additional_tokens = None):
         """PyPgen.translateLabels()
         """
-        tokenNames = list(token.tok_name.values())
-        # Recipe 252143 (remixed for laziness)
         tokenValues = dict(([v, k] for k, v in token.tok_name.items()))
         if additional_tokens:
-            tokenNames.extend(additional_tokens.keys())
             tokenValues.update(additional_tokens)
+        symbolMap = self.getSymbolMap(grammar[0])
         labelList = grammar[1]
         for labelIndex in range(0, len(labelList)):
             type, name = labelList[labelIndex]
             if type == token.NAME:
-                isNonTerminal = False
-                for dfa in grammar[0]:
-                    if dfa[1] == name:
-                        labelList[labelIndex] = (dfa[0], None)
-                        isNonTerminal = True
-                        break
-                if not isNonTerminal:
+                if name in symbolMap:
+                    labelList[labelIndex] = (symbolMap[name], None)
+                else:
                     if __DEBUG__:
-                        print(tokenNames)
-                    if name in tokenNames:
+                        print(list(tokenValues.keys()))
+                    if name in tokenValues:
                         labelList[labelIndex] = (tokenValues[name], None)
                     else:
                         print("Can't translate NAME label '%s'" % name)
@@ -375,11 +390,17 @@ class PyPgen (object):
                                              None)
                 else:
                     print("Can't translate STRING label %s" % name)
+        if self.labelMap is not None and self.labelMap[0] is labelList:
+            self.labelMap = None
         return grammar
 
     # ____________________________________________________________
     def calcFirstSet (self, grammar, dfa):
         """PyPgen.calcFirstSet()
+        Computes the first set of dfa, and of the nonterminals it starts
+        with that have none yet.  The nonterminals being computed are kept
+        on an explicit stack rather than visited recursively; -1 marks them
+        for left recursion detection.
         """
         if dfa[4] == long(-1):
             print("Left-recursion for '%s'" % dfa[1])
@@ -387,26 +408,36 @@ class PyPgen (object):
         if dfa[4] != None:
             print("Re-calculating FIRST set for '%s' ???" % dfa[1])
         dfa[4] = long(-1)
-        symbols = []
-        result = long(0)
-        state = dfa[3][dfa[2]]
-        for arc in state[0]:
-            sym = arc[0]
-            if sym not in symbols:
-                symbols.append(sym)
-                type = grammar[1][sym][0]
-                if (type >= token.NT_OFFSET):
-                    # Nonterminal
-                    ddfa = grammar[0][type - token.NT_OFFSET]
-                    if ddfa[4] == long(-1):
-                        print("Left recursion below '%s'" % dfa[1])
-                    else:
-                        if ddfa[4] == None:
-                            self.calcFirstSet(grammar, ddfa)
-                        result |= ddfa[4]
+        # stack := [ [ DFA, initial arcs, next arc index, symbols, result ] ]
+        stack = [[dfa, dfa[3][dfa[2]][0], 0, set(), long(0)]]
+        while stack:
+            frame = stack[-1]
+            crntDfa, arcs, arcIndex, symbols, result = frame
+            if arcIndex >= len(arcs):
+                crntDfa[4] = result
+                stack.pop()
+                if stack:
+                    stack[-1][4] |= result
+                continue
+            frame[2] = arcIndex + 1
+            sym = arcs[arcIndex][0]
+            if sym in symbols:
+                continue
+            symbols.add(sym)
+            type = grammar[1][sym][0]
+            if (type >= token.NT_OFFSET):
+                # Nonterminal
+                ddfa = grammar[0][type - token.NT_OFFSET]
+                if ddfa[4] == long(-1):
+                    print("Left recursion below '%s'" % crntDfa[1])
+                elif ddfa[4] == None:
+                    ddfa[4] = long(-1)
+                    stack.append([ddfa, ddfa[3][ddfa[2]][0], 0, set(),
+                                  long(0)])
                 else:
-                    result |= (long(1) << sym)
-        dfa[4] = result
+                    frame[4] |= ddfa[4]
+            else:
+                frame[4] |= (long(1) << sym)
 
     # ____________________________________________________________
     def generateFirstSets (self, grammar):
@@ -420,32 +451,303 @@ class PyPgen (object):
                 self.calcFirstSet(grammar, dfa)
             index += 1
         for dfa in dfas:
-            set = dfa[4]
-            resultStr = ''
-            while set > long(0):
-                crntBits = set & 0xff
-                resultStr += chr(crntBits)
-                set >>= 8
-            properSize = ((len(grammar[1]) // 8) + 1)
-            if len(resultStr) < properSize:
-                resultStr += ('\x00' * (properSize - len(resultStr)))
-            dfa[4] = resultStr
+            dfa[4] = self.firstSetToString(dfa[4], len(grammar[1]))
         return grammar
 
+    # ____________________________________________________________
+    def firstSetToString (self, set, labelCount):
+        """PyPgen.firstSetToString()
+        Converts a first set (a long with one bit per label) into the
+        bitset string stored in the DFA tuple.  Goes through the hex form
+        of the set, which is linear in its size, where shifting the long a
+        byte at a time is quadratic.
+        """
+        resultStr = ''
+        if set > long(0):
+            hexStr = "%x" % set
+            if len(hexStr) % 2:
+                hexStr = "0" + hexStr
+            resultStr = binascii.unhexlify(hexStr)[::-1]
+            if not isinstance(resultStr, str):
+                # Python 3
+                resultStr = resultStr.decode("latin-1")
+        properSize = ((labelCount // 8) + 1)
+        if len(resultStr) < properSize:
+            resultStr += ('\x00' * (properSize - len(resultStr)))
+        return resultStr
+
+    # ____________________________________________________________
+    def pruneGrammar (self, grammar, start):
+        """PyPgen.pruneGrammar()
+        Returns a copy of a (translated, unaccelerated) grammar tuple that
+        only keeps the nonterminals reachable from start (a nonterminal
+        name or type) and the labels they use, renumbered densely in their
+        original order, with start as its start symbol.  Keyword labels
+        are all kept, so keywords of the full grammar are still reserved
+        words and not NAMEs.  Raises ValueError if start is not in the
+        grammar.
+
+        Nonterminal types change, so trees built from the result must be
+        read with its own symbol maps.
+        """
+        dfas, labels, oldStart, accel = grammar
+        if accel != 0:
+            raise ValueError("can't prune an accelerated grammar")
+        symbolMap = self.getSymbolMap(dfas)
+        start = symbolMap.get(start, start)
+        if start not in [dfaObj[0] for dfaObj in dfas]:
+            raise ValueError("unknown start symbol %r" % (start,))
+        # Find the reachable nonterminals and the labels they use.
+        reached = set([start])
+        pending = [start]
+        usedLabels = set([EMPTY])
+        while pending:
+            dfaObj = dfas[pending.pop() - token.NT_OFFSET]
+            for arcs, stateAccel, accept in dfaObj[3]:
+                for labelIndex, arrow in arcs:
+                    usedLabels.add(labelIndex)
+                    labelType = labels[labelIndex][0]
+                    if ((labelType >= token.NT_OFFSET) and
+                        (labelType not in reached)):
+                        reached.add(labelType)
+                        pending.append(labelType)
+        for labelIndex, (labelType, labelName) in enumerate(labels):
+            if (labelType == token.NAME) and (labelName is not None):
+                usedLabels.add(labelIndex)
+        # Renumber them.
+        typeMap = {}
+        for dfaObj in dfas:
+            if dfaObj[0] in reached:
+                typeMap[dfaObj[0]] = token.NT_OFFSET + len(typeMap)
+        labelMap = {}
+        newLabels = []
+        for labelIndex, (labelType, labelName) in enumerate(labels):
+            if labelIndex in usedLabels:
+                labelMap[labelIndex] = len(newLabels)
+                newLabels.append((typeMap.get(labelType, labelType),
+                                  labelName))
+        newDfas = []
+        for dfaObj in dfas:
+            if dfaObj[0] not in reached:
+                continue
+            dfaType, name, initial, states, first = dfaObj
+            newStates = [([(labelMap[labelIndex], arrow)
+                           for labelIndex, arrow in arcs],
+                          stateAccel, accept)
+                         for arcs, stateAccel, accept in states]
+            newFirst = long(0)
+            for labelIndex in range(len(labels)):
+                if (labelIndex in labelMap) and dfa.testbit(first,
+                                                            labelIndex):
+                    newFirst |= long(1) << labelMap[labelIndex]
+            newDfas.append((typeMap[dfaType], name, initial, newStates,
+                            self.firstSetToString(newFirst,
+                                                  len(newLabels))))
+        return (newDfas, newLabels, typeMap[start], 0)
+
     # ____________________________________________________________
     def __call__ (self, ast):
         """PyPgen.__call__()
+        If the start_symbol keyword was passed to the constructor, returns
+        the grammar pruned to that start symbol (see pruneGrammar()).
         """
         nfaGrammar = self.handleStart(ast)
         grammar = self.generateDfaGrammar(nfaGrammar)
-        self.translateLabels(grammar)
+        self.translateLabels(grammar, self.kws.get("additional_tokens"))
         self.generateFirstSets(grammar)
         grammar[0] = [tuple(elem) for elem in grammar[0]]
         #grammar[0] = map(tuple, grammar[0])
+        start = self.kws.get("start_symbol")
+        if start is not None:
+            return self.pruneGrammar(tuple(grammar), start)
         return tuple(grammar)
 
 # ______________________________________________________________________
 
+def addClosure (stateList, nfa, istate):
+    """addClosure()
+    Marks istate and every state reachable from it by EMPTY arcs in
+    stateList.  Walks the arcs with an explicit stack, so long EMPTY
+    chains (and EMPTY cycles) are fine.
+    """
+    states = nfa[2]
+    pending = [istate]
+    stateList[istate] = True
+    while pending:
+        for label, arrow in states[pending.pop()]:
+            if (label == EMPTY) and not stateList[arrow]:
+                stateList[arrow] = True
+                pending.append(arrow)
+
+# ______________________________________________________________________
+
+def nfaToDfa (nfa, closure = None, simplify = None, convert = None):
+    """nfaToDfa()
+    Subset construction: converts an NFA into a DFA.  The steps default
+    to the module-level addClosure(), simplifyTempDfa() and
+    tempDfaToDfa(); PyPgen.nfaToDfa() passes its own methods instead.
+    Uses no PyPgen state, so PyPgen.nfasToDfas() can run it in worker
+    processes.
+    """
+    if closure is None:
+        closure = addClosure
+    if simplify is None:
+        simplify = simplifyTempDfa
+    if convert is None:
+        convert = tempDfaToDfa
+    tempStates = []
+    # tempState := [ stateList : List of Boolean,
+    #                arcList : List of tempArc ]
+    crntTempState = [[False] * len(nfa[2]), [], False]
+    closure(crntTempState[0], nfa, nfa[3])
+    crntTempState[2] = crntTempState[0][nfa[4]]
+    if crntTempState[2]:
+        print("PyPgen: Warning, nonterminal '%s' may produce empty." %
+              (nfa[1]))
+    tempStates.append(crntTempState)
+    index = 0
+    while index < len(tempStates):
+        crntTempState = tempStates[index]
+        for componentState in range(0, len(nfa[2])):
+            if not crntTempState[0][componentState]:
+                continue
+            nfaArcs = nfa[2][componentState]
+            for label, nfaArrow in nfaArcs:
+                if label == EMPTY:
+                    continue
+                foundTempArc = False
+                for tempArc in crntTempState[1]:
+                    if tempArc[0] == label:
+                        foundTempArc = True
+                        break
+                if not foundTempArc:
+                    tempArc = [label, -1, [False] * len(nfa[2])]
+                    crntTempState[1].append(tempArc)
+                closure(tempArc[2], nfa, nfaArrow)
+        for arcIndex in range(0, len(crntTempState[1])):
+            label, arrow, targetStateList = crntTempState[1][arcIndex]
+            targetFound = False
+            arrow = 0
+            for destTempState in tempStates:
+                if targetStateList == destTempState[0]:
+                    targetFound = True
+                    break
+                arrow += 1
+            if not targetFound:
+                assert arrow == len(tempStates)
+                tempState = [targetStateList[:], [],
+                             targetStateList[nfa[4]]]
+                tempStates.append(tempState)
+            # Write arrow value back to the arc
+            crntTempState[1][arcIndex][1] = arrow
+        index += 1
+    tempStates = simplify(nfa, tempStates)
+    return convert(nfa, tempStates)
+
+# ______________________________________________________________________
+
+def sameState (s1, s2):
+    """sameState()
+    """
+    if (len(s1[1]) != len(s2[1])) or (s1[2] != s2[2]):
+        return False
+    for arcIndex in range(0, len(s1[1])):
+        arc1 = s1[1][arcIndex]
+        arc2 = s2[1][arcIndex]
+        if arc1[:-1] != arc2[:-1]:
+            return False
+    return True
+
+# ______________________________________________________________________
+
+def simplifyTempDfa (nfa, tempStates, compare = None):
+    """simplifyTempDfa()
+    Merges equivalent temporary DFA states, as told by compare (defaults
+    to sameState()).
+    """
+    if compare is None:
+        compare = sameState
+    if __DEBUG__:
+        print("_" * 70)
+        pprint.pprint(nfa)
+        pprint.pprint(tempStates)
+    changes = True
+    deletedStates = []
+    while changes:
+        changes = False
+        for i in range(1, len(tempStates)):
+            if i in deletedStates:
+                continue
+            for j in range(0, i):
+                if j in deletedStates:
+                    continue
+                if compare(tempStates[i], tempStates[j]):
+                    deletedStates.append(i)
+                    for k in range(0, len(tempStates)):
+                        if k in deletedStates:
+                            continue
+                        for arc in tempStates[k][1]:
+                            if arc[1] == i:
+                                arc[1] = j
+                    changes = True
+                    break
+    for stateIndex in deletedStates:
+        tempStates[stateIndex] = None
+    if __DEBUG__:
+        pprint.pprint(tempStates)
+    return tempStates
+
+# ______________________________________________________________________
+
+def tempDfaToDfa (nfa, tempStates):
+    """tempDfaToDfa()
+    """
+    dfaStates = []
+    dfa = [nfa[0], nfa[1], 0, dfaStates, None]
+    stateMap = {}
+    tempIndex = 0
+    for tempState in tempStates:
+        if None != tempState:
+            stateMap[tempIndex] = len(dfaStates)
+            dfaStates.append(([], (0,0,()), 0))
+        tempIndex += 1
+    for tempIndex in stateMap.keys():
+        stateList, tempArcs, accepting = tempStates[tempIndex]
+        dfaStateIndex = stateMap[tempIndex]
+        dfaState = dfaStates[dfaStateIndex]
+        for tempArc in tempArcs:
+            dfaState[0].append((tempArc[0], stateMap[tempArc[1]]))
+        if accepting:
+            dfaState[0].append((EMPTY, dfaStateIndex))
+    return dfa
+
+# ______________________________________________________________________
+
+def _method (cls, name):
+    """_method()
+    Returns the function behind a method of a class, on Python 2 and 3.
+    """
+    method = getattr(cls, name)
+    return getattr(method, "__func__", method)
+
+def _sharedTokenizer (tokenizer_cls):
+    """_sharedTokenizer()
+    Returns True if PyPgenParser can tokenize every input through the
+    tokenStream() methods of one shared tokenizer_cls instance.  These
+    bypass tokenize() and tokenizeString(), so a Tokenizer subclass that
+    overrides either is instantiated and called for each parse instead.
+    """
+    if not hasattr(tokenizer_cls, "tokenStream"):
+        return False
+    if issubclass(tokenizer_cls, tokenizer.Tokenizer):
+        for name in ("tokenize", "tokenizeString"):
+            if (_method(tokenizer_cls, name) is not
+                _method(tokenizer.Tokenizer, name)):
+                return False
+    return True
+
+# ______________________________________________________________________
+
 class PyPgenParser (object):
     """Class PyPgenParser
 
@@ -453,18 +755,46 @@ class PyPgenParser (object):
     type of the pgen extension module.
     """
     # ____________________________________________________________
-    def __init__ (self, grammarObj, tokenizer_cls=None):
+    def __init__ (self, grammarObj, tokenizer_cls=None, cache=None,
+                  limits=None, lazy=False, fused=False):
         """PyPgenParser.__init__
         Constructor; accepts a DFA tuple (currently documented in
-        pypgen.dfa.__doc__).
+        pypgen.dfa.__doc__).  If cache is given (a pgen2.cache.ParseCache),
+        parseFile() and parseString() look trees up there before parsing.
+        If limits is given (a pgen2.dfa.ParseLimits), every parse raises a
+        pgen2.dfa.ParseLimitExceeded subclass when it goes over them.
+
+        The accelerated grammar and a single tokenizer instance are built
+        here once, so a parser can be shared between threads (unless the
+        tokenizer class overrides tokenize() or tokenizeString(), see
+        _sharedTokenizer()).  If lazy is
+        true, each DFA is only accelerated when a parse first enters it
+        (see pgen2.dfa.LazyAccelerators), so start up time depends on the
+        rules actually used rather than on the grammar size.
+
+        If fused is true and the tokenizer class supports it, parseFile()
+        and parseString() use a tokenizer specialized to the grammar that
+        emits label indices, and skip classifying each token (see
+        Tokenizer.labelStream() and pgen2.dfa.parseLabelTokens()).
         """
         self.grammarObj = grammarObj
+        self.parseGrammar = dfa.addAccelerators(grammarObj, lazy)
         self.start = grammarObj[2]
         self.stringMap = None
         self.symbolMap = None
+        self.grammarFingerprint = None
         if None == tokenizer_cls:
             tokenizer_cls = tokenizer.Tokenizer
         self.tokenizer_cls = tokenizer_cls
+        self.tokenizerObj = None
+        if _sharedTokenizer(tokenizer_cls):
+            self.tokenizerObj = tokenizer_cls()
+        self.cache = cache
+        self.limits = limits
+        self.labelTable = None
+        if (fused and (self.tokenizerObj is not None) and
+            hasattr(tokenizer_cls, "labelStream")):
+            self.labelTable = self.tokenizerObj.labelTable(grammarObj)
 
     # ____________________________________________________________
     def getStart (self):
@@ -485,7 +815,83 @@ class PyPgenParser (object):
         Method that takes a tokenizer and the current DFA and returns a parse
         tree.
         """
-        return dfa.parsetok(tokenizer, self.grammarObj, self.start)
+        return dfa.parsetok(tokenizer, self.parseGrammar, self.start,
+                            self.limits)
+
+    # ____________________________________________________________
+    def parseLabelTokens (self, tokenizer):
+        """PyPgenParser.parseLabelTokens
+        Like parseTokens(), for a tokenizer emitting (label index, type,
+        string, line number) tokens.
+        """
+        return dfa.parseLabelTokens(tokenizer, self.parseGrammar, self.start,
+                                    self.limits)
+
+    # ____________________________________________________________
+    def recognizeTokens (self, tokenizer):
+        """PyPgenParser.recognizeTokens
+        Checks the tokens against the grammar without building a tree.
+        Returns None for valid input, otherwise the (line number, message)
+        pair of the first error (see pgen2.dfa.recognize()).  The
+        parser's limits apply, except for maxNodes.
+        """
+        return dfa.recognize(tokenizer, self.parseGrammar, self.start,
+                             self.limits)
+
+    # ____________________________________________________________
+    def recognizeString (self, in_string):
+        """PyPgenParser.recognizeString
+        Accepts input string, returns None if it is valid, otherwise the
+        (line number, message) pair of the first error.
+        """
+        return self.recognizeTokens(self.tokenizeString(in_string))
+
+    # ____________________________________________________________
+    def recognizeFile (self, filename):
+        """PyPgenParser.recognizeFile
+        Accepts filename, returns None if the file is valid, otherwise the
+        (line number, message) pair of the first error.
+        """
+        with open(filename) as fileobj:
+            return self.recognizeTokens(self.tokenizeStream(fileobj))
+
+    # ____________________________________________________________
+    def parseTokensRecover (self, tokenizer, syncTypes = None):
+        """PyPgenParser.parseTokensRecover
+        Parses the tokens, recovering from syntax errors.  Returns a (tree,
+        errors) pair, errors being the (line number, message) pairs of
+        every error found (see pgen2.dfa.parseRecover()).  syncTypes
+        defaults to pgen2.dfa.SYNC_TYPES.  The parser's limits apply.
+        """
+        if syncTypes is None:
+            syncTypes = dfa.SYNC_TYPES
+        return dfa.parseRecover(tokenizer, self.parseGrammar, self.start,
+                                syncTypes, self.limits)
+
+    # ____________________________________________________________
+    def parseStringRecover (self, in_string, syncTypes = None):
+        """PyPgenParser.parseStringRecover
+        Accepts input string, returns a (tree, errors) pair.
+        """
+        return self.parseTokensRecover(self.tokenizeString(in_string),
+                                       syncTypes)
+
+    # ____________________________________________________________
+    def parseFileRecover (self, filename, syncTypes = None):
+        """PyPgenParser.parseFileRecover
+        Accepts filename, returns a (tree, errors) pair.
+        """
+        with open(filename) as fileobj:
+            return self.parseTokensRecover(self.tokenizeStream(fileobj),
+                                           syncTypes)
+
+    # ____________________________________________________________
+    def pushParser (self):
+        """PyPgenParser.pushParser
+        Returns a new pgen2.dfa.PushParser for the current start symbol, for
+        callers that receive tokens incrementally.
+        """
+        return dfa.PushParser(self.parseGrammar, self.start, self.limits)
 
     # ____________________________________________________________
     def parseFile (self, filename):
@@ -493,17 +899,147 @@ class PyPgenParser (object):
         Accepts filename, returns parse tree.
         """
         with open(filename) as fileobj:
-            tokenizer = self.tokenizer_cls().tokenize(fileobj)
-            ret_val = self.parseTokens(tokenizer)
+            if self.cache is not None:
+                return self.parseString(fileobj.read())
+            if self.labelTable is not None:
+                ret_val = self.parseLabelTokens(
+                    self.tokenizerObj.labelStream(fileobj, self.labelTable))
+            else:
+                ret_val = self.parseTokens(self.tokenizeStream(fileobj))
         return ret_val
 
+    # ____________________________________________________________
+    def tokenizeStream (self, fileobj):
+        """PyPgenParser.tokenizeStream
+        Returns a token iterator over a file-like object, using the shared
+        tokenizer instance when the tokenizer class supports it.
+        """
+        if self.tokenizerObj is not None:
+            return self.tokenizerObj.tokenStream(fileobj)
+        return self.tokenizer_cls().tokenize(fileobj)
+
+    # ____________________________________________________________
+    def tokenizeString (self, in_string):
+        """PyPgenParser.tokenizeString
+        Returns a token iterator over a string (see tokenizeStream()).
+        """
+        if self.tokenizerObj is not None:
+            return self.tokenizerObj.tokenStreamString(in_string)
+        return self.tokenizer_cls().tokenizeString(in_string)
+
     # ____________________________________________________________
     def parseString (self, in_string):
         """PyPgenParser.parseString
         Accepts input string, return parse tree.
         """
-        tokenizer = self.tokenizer_cls().tokenizeString(in_string)
-        return self.parseTokens(tokenizer)
+        cache = self.cache
+        if cache is not None:
+            ret_val = cache.get(in_string, self.fingerprint(), self.start)
+            if ret_val is not None:
+                return ret_val
+        if self.labelTable is not None:
+            ret_val = self.parseLabelTokens(
+                self.tokenizerObj.labelStreamString(in_string,
+                                                    self.labelTable))
+        else:
+            ret_val = self.parseTokens(self.tokenizeString(in_string))
+        if cache is not None:
+            cache.put(in_string, self.fingerprint(), self.start, ret_val)
+        return ret_val
+
+    # ____________________________________________________________
+    def parseBatch (self, in_strings):
+        """PyPgenParser.parseBatch
+        Accepts an iterable of input strings, yields a (tree, None) pair
+        for each valid one and (None, exception) for each one that raises
+        one of BATCH_ERRORS, in order.  The accelerated grammar, label maps
+        and tokenizer are set up once for the whole batch (see
+        pgen2.dfa.parseBatch()).  With a cache or limits, each string goes
+        through parseString() instead.
+        """
+        if (self.cache is not None) or (self.limits is not None):
+            return self.parseEach(in_strings)
+        return dfa.parseBatch((self.tokenizeString(in_string)
+                               for in_string in in_strings),
+                              self.parseGrammar, self.start, BATCH_ERRORS)
+
+    parse_batch = parseBatch
+
+    # ____________________________________________________________
+    def parseEach (self, in_strings):
+        """PyPgenParser.parseEach
+        Unbatched counterpart of parseBatch(), calling parseString() on
+        each string.
+        """
+        for in_string in in_strings:
+            try:
+                ret_val = self.parseString(in_string)
+            except BATCH_ERRORS as exc:
+                yield (None, exc)
+                continue
+            yield (ret_val, None)
+
+    # ____________________________________________________________
+    def parseStringChunked (self, in_string, processes = 0,
+                            chunkSize = None):
+        """PyPgenParser.parseStringChunked
+        Accepts input string, returns the same parse tree as parseString(),
+        parsing top-level chunks of the input in parallel worker processes
+        when the start symbol is a repetition (see pgen2.chunked).  Parses
+        serially when the parser has limits.
+        """
+        from . import chunked
+        if self.limits is not None:
+            return self.parseString(in_string)
+        if chunkSize is None:
+            chunkSize = chunked.CHUNK_TOKENS
+        return chunked.parseChunked(self.tokenizeString(in_string),
+                                    self.parseGrammar, self.start,
+                                    processes, chunkSize)
+
+    # ____________________________________________________________
+    def parseStringLazy (self, in_string, lazySymbols):
+        """PyPgenParser.parseStringLazy
+        Accepts input string and an iterable of nonterminal names or types,
+        returns a parse tree in which those nonterminals are unparsed
+        placeholders until their children are accessed (see pgen2.lazy).
+        Parses eagerly, returning the tree of parseString(), when the
+        parser has limits.
+        """
+        from . import lazy
+        if self.limits is not None:
+            return self.parseString(in_string)
+        symbolMap = self.stringToSymbolMap()
+        lazySymbols = [symbolMap.get(symbol, symbol)
+                       for symbol in lazySymbols]
+        lazyParse = lazy.LazyParse(self.parseGrammar,
+                                   self.tokenizeString(in_string),
+                                   lazySymbols)
+        return lazyParse.parse(self.start)
+
+    # ____________________________________________________________
+    def queryIndex (self, tree):
+        """PyPgenParser.queryIndex
+        Returns a pgen2.query.TreeIndex over a tree built by this parser,
+        with symbol names resolved through this parser's grammar.
+        """
+        from . import query
+        return query.TreeIndex(tree, self)
+
+    # ____________________________________________________________
+    def fingerprint (self):
+        """PyPgenParser.fingerprint
+        Returns a hex digest identifying the grammar and tokenizer class, so
+        trees built by one parser can be reused by any parser built from
+        the same grammar.
+        """
+        if None == self.grammarFingerprint:
+            tokenizerName = "%s.%s" % (self.tokenizer_cls.__module__,
+                                       self.tokenizer_cls.__name__)
+            digest = hashlib.sha1(tokenizerName.encode("utf-8"))
+            digest.update(repr(self.grammarObj).encode("utf-8"))
+            self.grammarFingerprint = digest.hexdigest()
+        return self.grammarFingerprint
 
     # ____________________________________________________________
     def stringToSymbolMap (self):
@@ -533,42 +1069,75 @@ class PyPgenParser (object):
         """
         return self.grammarObj
 
+    # ____________________________________________________________
+    def specialize (self, start):
+        """PyPgenParser.specialize
+        Returns a new parser for the part of the grammar reachable from
+        start (a nonterminal name or type), built with PyPgen.pruneGrammar().
+        Its nonterminal types are renumbered; use its own symbol maps.
+        """
+        return PyPgenParser(PyPgen().pruneGrammar(self.grammarObj, start),
+                            self.tokenizer_cls, limits = self.limits,
+                            fused = self.labelTable is not None)
+
 # ______________________________________________________________________
 
 def buildParser (grammarST, tokenizer_cls=None, **kws):
     """buildParser
+    Builds a PyPgenParser for a grammar syntax tree.  The keyword arguments
+    named in PARSER_KEYWORDS are passed to PyPgenParser, the rest to PyPgen.
     """
     global __DEBUG__
     if "DEBUG" in kws:
         __DEBUG__ = True
     if None == tokenizer_cls:
         tokenizer_cls = tokenizer.Tokenizer
+    if hasattr(tokenizer_cls, "tokenKinds"):
+        # Token names defined by a pgen2.scanner tokenizer.
+        kws.setdefault("additional_tokens", tokenizer_cls.tokenKinds)
+    parserKws = {}
+    for keyword in PARSER_KEYWORDS:
+        if keyword in kws:
+            parserKws[keyword] = kws.pop(keyword)
     pgenObj = PyPgen(tokenizer_cls.operatorMap, **kws)
-    return PyPgenParser(pgenObj(grammarST), tokenizer_cls)
+    return PyPgenParser(pgenObj(grammarST), tokenizer_cls, **parserKws)
 
 # ______________________________________________________________________
 
 def parserMain (gObj):
     """parserMain()
-    Main routine for the default CLI for PyPgen generated parsers.
+    Main routine for the default CLI for PyPgen generated parsers.  The -b
+    flag writes the tree in the pgen2.treecodec binary format instead of
+    pretty-printing it.
     """
     import getopt
     inputFile = None
     outputFile = None
     graphicalOutput = False
+    binaryOutput = False
     # ____________________________________________________________
-    opts, args = getopt.getopt(sys.argv[1:], "gi:o:")
+    opts, args = getopt.getopt(sys.argv[1:], "bgi:o:")
     for (opt_flag, opt_arg) in opts:
         if opt_flag == "-i":
             inputFile = opt_arg
         elif opt_flag == "-o":
             outputFile = opt_arg
+        elif opt_flag == "-b":
+            binaryOutput = True
     # ____________________________________________________________
     parser = PyPgenParser(gObj)
     if inputFile != None:
-        st = parser.parse_file(inputFile)
+        st = parser.parseFile(inputFile)
     else:
-        st = parser.parse_string(sys.stdin.read())
+        st = parser.parseString(sys.stdin.read())
+    if binaryOutput:
+        from . import treecodec
+        if outputFile == None:
+            treecodec.dump(st, getattr(sys.stdout, "buffer", sys.stdout))
+        else:
+            with open(outputFile, "wb") as outputFileObj:
+                treecodec.dump(st, outputFileObj)
+        return
     if outputFile == None:
         outputFileObj = sys.stdout
     else:
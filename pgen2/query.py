@@ -0,0 +1,200 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.query
+
+Node-type index and queries over parse trees built by pgen2.dfa.parsetok().
+
+TreeIndex numbers the nodes of a tree in preorder and postorder once, and
+keeps a sorted list of preorder positions per node type.  Afterwards:
+
+* find()/positions() of a node type are a dictionary lookup,
+* descendants of a node with a given type are a bisect into that list,
+  since a subtree occupies a contiguous preorder range,
+* ancestor tests compare preorder and postorder numbers in O(1).
+
+Node types may be given as integers or as names; names resolve through the
+parser's stringToSymbolMap() for nonterminals and token.tok_name for
+tokens.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import bisect
+import token
+
+# ______________________________________________________________________
+
+class TreeIndex (object):
+    """Class TreeIndex
+
+    Index over a single parse tree.  Positions are preorder numbers, with
+    the root at position 0.  The index holds a reference to the tree and
+    assumes it is not modified afterwards.
+    """
+    # ____________________________________________________________
+    def __init__ (self, tree, parser = None):
+        """TreeIndex.__init__
+        Builds the index.  parser is an optional pgen2.pgen.PyPgenParser
+        used to resolve nonterminal names.
+        """
+        self.tree = tree
+        self.parser = parser
+        self.nodes = []
+        self.parents = []
+        self.ends = []
+        self.post = []
+        self.byType = {}
+        self.nodeMap = {}
+        nodes = self.nodes
+        parents = self.parents
+        ends = self.ends
+        byType = self.byType
+        postCount = 0
+        post = self.post
+        # stack := [ (node, parent position, children visited?) ]
+        stack = [(tree, -1, False)]
+        while stack:
+            node, parentPos, visited = stack.pop()
+            if visited:
+                # parentPos holds the node's own position here.
+                ends[parentPos] = len(nodes) - 1
+                post[parentPos] = postCount
+                postCount += 1
+                continue
+            pos = len(nodes)
+            nodes.append(node)
+            parents.append(parentPos)
+            ends.append(pos)
+            post.append(-1)
+            self.nodeMap[id(node)] = pos
+            nodeType = node[0][0]
+            if nodeType in byType:
+                byType[nodeType].append(pos)
+            else:
+                byType[nodeType] = [pos]
+            stack.append((node, pos, True))
+            for child in reversed(node[1]):
+                stack.append((child, pos, False))
+
+    # ____________________________________________________________
+    def resolve (self, kind):
+        """TreeIndex.resolve
+        Returns the integer node type for an integer or a symbol/token name.
+        """
+        if isinstance(kind, int):
+            return kind
+        if self.parser is not None:
+            symbols = self.parser.stringToSymbolMap()
+            if kind in symbols:
+                return symbols[kind]
+        for tokType, tokName in token.tok_name.items():
+            if tokName == kind:
+                return tokType
+        raise KeyError("Unknown node type %r" % (kind,))
+
+    # ____________________________________________________________
+    def typeName (self, pos):
+        """TreeIndex.typeName
+        Returns the symbol or token name of the node at pos.
+        """
+        nodeType = self.nodes[pos][0][0]
+        if nodeType >= token.NT_OFFSET and self.parser is not None:
+            return self.parser.symbolToStringMap().get(nodeType,
+                                                       str(nodeType))
+        return token.tok_name.get(nodeType, str(nodeType))
+
+    # ____________________________________________________________
+    def position (self, node):
+        """TreeIndex.position
+        Returns the preorder position of a node of the indexed tree.
+        """
+        return self.nodeMap[id(node)]
+
+    # ____________________________________________________________
+    def node (self, pos):
+        """TreeIndex.node
+        """
+        return self.nodes[pos]
+
+    # ____________________________________________________________
+    def parent (self, pos):
+        """TreeIndex.parent
+        Returns the position of the parent of pos, or -1 for the root.
+        """
+        return self.parents[pos]
+
+    # ____________________________________________________________
+    def positions (self, kind, within = None):
+        """TreeIndex.positions
+        Returns the sorted preorder positions of all nodes of the given
+        type, restricted to the strict descendants of position within when
+        it is given.
+        """
+        found = self.byType.get(self.resolve(kind), [])
+        if within is None:
+            return found[:]
+        lower = bisect.bisect_right(found, within)
+        upper = bisect.bisect_right(found, self.ends[within], lower)
+        return found[lower:upper]
+
+    # ____________________________________________________________
+    def count (self, kind, within = None):
+        """TreeIndex.count
+        Like len(positions(kind, within)) without building the list.
+        """
+        found = self.byType.get(self.resolve(kind), [])
+        if within is None:
+            return len(found)
+        lower = bisect.bisect_right(found, within)
+        return bisect.bisect_right(found, self.ends[within], lower) - lower
+
+    # ____________________________________________________________
+    def find (self, kind, within = None):
+        """TreeIndex.find
+        Returns the nodes for positions(kind, within).
+        """
+        nodes = self.nodes
+        return [nodes[pos] for pos in self.positions(kind, within)]
+
+    # ____________________________________________________________
+    def isAncestor (self, ancestor, descendant):
+        """TreeIndex.isAncestor
+        Returns True if position ancestor is a proper ancestor of position
+        descendant.
+        """
+        return ((ancestor < descendant) and
+                (self.post[ancestor] > self.post[descendant]))
+
+    # ____________________________________________________________
+    def ancestors (self, pos, kind = None):
+        """TreeIndex.ancestors
+        Returns the positions of the proper ancestors of pos, nearest
+        first, optionally only those of the given type.
+        """
+        parents = self.parents
+        nodes = self.nodes
+        nodeType = None
+        if kind is not None:
+            nodeType = self.resolve(kind)
+        result = []
+        pos = parents[pos]
+        while pos >= 0:
+            if (nodeType is None) or (nodes[pos][0][0] == nodeType):
+                result.append(pos)
+            pos = parents[pos]
+        return result
+
+    # ____________________________________________________________
+    def descendants (self, pos, kind = None):
+        """TreeIndex.descendants
+        Returns the positions of the proper descendants of pos in preorder,
+        optionally only those of the given type.
+        """
+        if kind is None:
+            return list(range(pos + 1, self.ends[pos] + 1))
+        return self.positions(kind, pos)
+
+# ______________________________________________________________________
+# End of pgen2.query
@@ -0,0 +1,309 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.registry
+
+Registry of compiled parsers for many grammars, with bounded memory.
+
+Parsers are keyed by a fingerprint of the grammar source text and the
+tokenizer class (see sourceFingerprint()).  ParserRegistry.getParser()
+builds the parser for a grammar at most once: concurrent requests for a
+grammar that is being built wait for that build instead of starting their
+own.  Built parsers are kept in an LRU order and evicted, least recently
+used first, once the registry holds more than maxEntries parsers or more
+than maxBytes of estimated memory (see footprint()).  A parser larger than
+the whole budget is still returned to its caller, but not kept.
+
+Evicting a parser only drops the registry's reference; callers that still
+hold the parser can keep using it.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import collections
+import hashlib
+import sys
+import threading
+
+from . import parser, pgen, tokenizer
+
+# ______________________________________________________________________
+# Function definitions
+
+def tokenizerName (tokenizer_cls = None):
+    """tokenizerName()
+    """
+    if tokenizer_cls is None:
+        tokenizer_cls = tokenizer.Tokenizer
+    return "%s.%s" % (tokenizer_cls.__module__, tokenizer_cls.__name__)
+
+# ______________________________________________________________________
+
+def sourceFingerprint (source, tokenizer_cls = None):
+    """sourceFingerprint()
+    Returns the hex SHA-1 digest identifying a grammar source string and
+    the tokenizer class it is built with.
+    """
+    if not isinstance(source, bytes):
+        source = source.encode("utf-8")
+    digest = hashlib.sha1(tokenizerName(tokenizer_cls).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(source)
+    return digest.hexdigest()
+
+# ______________________________________________________________________
+
+def footprint (obj):
+    """footprint()
+    Returns an estimate in bytes of the memory held by an object graph of
+    tuples, lists, dictionaries, sets, strings and numbers (such as a
+    grammar tuple), counting every shared object once.  Objects of other
+    types are counted by their own size, along with their __dict__.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        crnt = stack.pop()
+        if id(crnt) in seen:
+            continue
+        seen.add(id(crnt))
+        total += sys.getsizeof(crnt)
+        if isinstance(crnt, dict):
+            stack.extend(crnt.keys())
+            stack.extend(crnt.values())
+        elif isinstance(crnt, (tuple, list, set, frozenset)):
+            stack.extend(crnt)
+        elif hasattr(crnt, "__dict__") and not isinstance(crnt, type):
+            stack.append(crnt.__dict__)
+    return total
+
+# ______________________________________________________________________
+
+def parserFootprint (parserObj):
+    """parserFootprint()
+    Returns the estimated memory held by a PyPgenParser's grammar tables:
+    the compiled grammar, the accelerated grammar used for parsing and the
+    symbol maps.  Lazily accelerated grammars grow as they are used.
+    """
+    return footprint((parserObj.grammarObj, parserObj.parseGrammar,
+                      parserObj.stringMap, parserObj.symbolMap))
+
+# ______________________________________________________________________
+
+def buildParser (source, tokenizer_cls = None):
+    """buildParser()
+    Default registry builder: compiles a grammar source string with
+    pgen2.pgen.buildParser().
+    """
+    return pgen.buildParser(parser.parse_string(source), tokenizer_cls)
+
+# ______________________________________________________________________
+# Class definitions
+
+class PendingBuild (object):
+    """Class PendingBuild
+    A build in progress, shared by every thread requesting the grammar.
+    """
+    # ____________________________________________________________
+    def __init__ (self):
+        """PendingBuild.__init__
+        """
+        self.done = threading.Event()
+        self.parser = None
+        self.error = None
+
+    # ____________________________________________________________
+    def wait (self):
+        """PendingBuild.wait
+        Blocks until the build finishes; returns the parser or re-raises the
+        build error.
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.parser
+
+# ______________________________________________________________________
+
+class ParserRegistry (object):
+    """Class ParserRegistry
+
+    Maps grammar fingerprints to compiled parsers, keeping at most
+    maxEntries parsers and maxBytes of estimated grammar memory (either
+    may be None for no bound).  builder(source, tokenizer_cls) compiles a
+    grammar source string into a parser; it defaults to buildParser().
+    """
+    # ____________________________________________________________
+    def __init__ (self, maxBytes = None, maxEntries = None, builder = None):
+        """ParserRegistry.__init__
+        """
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries
+        if builder is None:
+            builder = buildParser
+        self.builder = builder
+        # entries := { fingerprint : (parser, footprint) }, in LRU order
+        self.entries = collections.OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.waits = 0
+        self.evictions = 0
+
+    # ____________________________________________________________
+    def __len__ (self):
+        """ParserRegistry.__len__
+        """
+        return len(self.entries)
+
+    # ____________________________________________________________
+    def __contains__ (self, fingerprint):
+        """ParserRegistry.__contains__
+        """
+        return fingerprint in self.entries
+
+    # ____________________________________________________________
+    def get (self, fingerprint):
+        """ParserRegistry.get
+        Returns the registered parser for a fingerprint, or None.
+        """
+        with self.lock:
+            entry = self.entries.pop(fingerprint, None)
+            if entry is None:
+                return None
+            self.entries[fingerprint] = entry
+            self.hits += 1
+            return entry[0]
+
+    # ____________________________________________________________
+    def getParser (self, source, tokenizer_cls = None):
+        """ParserRegistry.getParser
+        Returns the parser for a grammar source string, building and
+        registering it on first use.  Only one thread builds a given
+        grammar; the others wait for its result (or its exception).
+        """
+        fingerprint = sourceFingerprint(source, tokenizer_cls)
+        with self.lock:
+            entry = self.entries.pop(fingerprint, None)
+            if entry is not None:
+                self.entries[fingerprint] = entry
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            build = self.pending.get(fingerprint)
+            isBuilder = build is None
+            if isBuilder:
+                build = self.pending[fingerprint] = PendingBuild()
+                self.builds += 1
+            else:
+                self.waits += 1
+        if not isBuilder:
+            return build.wait()
+        try:
+            parserObj = self.builder(source, tokenizer_cls)
+            self.add(fingerprint, parserObj)
+            build.parser = parserObj
+        except Exception as exc:
+            build.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.pending[fingerprint]
+            build.done.set()
+        return parserObj
+
+    # ____________________________________________________________
+    def add (self, fingerprint, parserObj):
+        """ParserRegistry.add
+        Registers a parser under a fingerprint, measuring its footprint and
+        evicting least recently used parsers past the bounds.
+        """
+        size = parserFootprint(parserObj)
+        with self.lock:
+            self.discard(fingerprint)
+            self.entries[fingerprint] = (parserObj, size)
+            self.totalBytes += size
+            while self.entries and self.overBudget():
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    # ____________________________________________________________
+    def overBudget (self):
+        """ParserRegistry.overBudget
+        The caller holds the lock.
+        """
+        if (self.maxEntries is not None and
+            len(self.entries) > self.maxEntries):
+            return True
+        return (self.maxBytes is not None and
+                self.totalBytes > self.maxBytes)
+
+    # ____________________________________________________________
+    def discard (self, fingerprint):
+        """ParserRegistry.discard
+        Drops an entry if present.  The caller holds the lock.
+        """
+        entry = self.entries.pop(fingerprint, None)
+        if entry is not None:
+            self.totalBytes -= entry[1]
+        return entry
+
+    # ____________________________________________________________
+    def evict (self, fingerprint):
+        """ParserRegistry.evict
+        Removes a parser from the registry; returns True if it was there.
+        """
+        with self.lock:
+            return self.discard(fingerprint) is not None
+
+    # ____________________________________________________________
+    def clear (self):
+        """ParserRegistry.clear
+        """
+        with self.lock:
+            self.entries.clear()
+            self.totalBytes = 0
+
+    # ____________________________________________________________
+    def footprint (self, fingerprint):
+        """ParserRegistry.footprint
+        Returns the estimated size in bytes of a registered parser's
+        grammar (as measured when it was registered), or None.
+        """
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+        if entry is None:
+            return None
+        return entry[1]
+
+    # ____________________________________________________________
+    def footprints (self):
+        """ParserRegistry.footprints
+        Returns a list of (fingerprint, bytes) pairs, least recently used
+        first.
+        """
+        with self.lock:
+            return [(fingerprint, entry[1])
+                    for fingerprint, entry in self.entries.items()]
+
+    # ____________________________________________________________
+    def stats (self):
+        """ParserRegistry.stats
+        Returns a dictionary of registry counters.
+        """
+        with self.lock:
+            return {"entries" : len(self.entries),
+                    "bytes" : self.totalBytes,
+                    "hits" : self.hits,
+                    "misses" : self.misses,
+                    "builds" : self.builds,
+                    "waits" : self.waits,
+                    "evictions" : self.evictions}
+
+# ______________________________________________________________________
+# End of pgen2.registry
@@ -0,0 +1,641 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.scanner
+
+Scanner generator: compiles regular expression token definitions into a
+DFA lexer with longest-match semantics, for languages that Python's
+tokenize rules do not fit.
+
+Token definitions are (name, pattern) rules, tried in order: the scanner
+takes the longest match at each position and, on a tie, the earliest rule.
+Literals (operator strings like "+" or "->") come before all rules.  Rules
+named in skip (white space, comments) are matched but not emitted.  A
+rule named after a standard token (NAME, NUMBER, STRING, NEWLINE...) gets
+that token type, so grammar keywords like 'if' are classified as usual
+when they are scanned as NAME; other names get new token types, which
+pgen2.pgen.buildParser() resolves through the scanner's tokenKinds.  An
+ENDMARKER token is emitted at the end of the input.
+
+Patterns support literal characters, ".", escapes (\\n, \\t, \\d, \\w,
+\\s and their negations, or any escaped character), character classes
+with ranges and negation ([a-z_], [^"\\n]), grouping, "|" and the "*",
+"+" and "?" operators.
+
+The definitions can also live in a companion section of a .pgen file, as
+comment lines the grammar parser ignores:
+
+    #%token NAME [A-Za-z_][A-Za-z_0-9]*
+    #%token NEWLINE \\n
+    #%skip SPACE [ \\t]+
+    #%literal + - ( )
+
+ScannerPgen reuses PyPgen's NFA to DFA conversion and state merging: every
+rule's NFA ends with an arc on its own pseudo-label, so DFA states record
+which rules accept in them.  The tables are kept as arrays: a character
+class for each code point below 256 (and interval boundaries for the
+rest), a transition table indexed by state * classes + class, and the
+accepted token type of each state.  makeScanner() returns a tokenizer
+class to pass to PyPgenParser (or buildParser()) as tokenizer_cls.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import array
+import bisect
+import hashlib
+import sys
+import token
+
+from . import parser, pgen
+
+try:
+    unichr
+except NameError:
+    # Python 3
+    unichr = chr
+
+# ______________________________________________________________________
+# Module data
+
+EMPTY = pgen.EMPTY
+
+MAX_CHAR = sys.maxunicode
+
+DIRECTIVE = "#%"
+
+ESCAPES = {"n" : "\n", "t" : "\t", "r" : "\r", "f" : "\f", "v" : "\v",
+           "0" : "\0"}
+
+DIGITS = [(ord("0"), ord("9"))]
+WORD = [(ord("0"), ord("9")), (ord("A"), ord("Z")), (ord("_"), ord("_")),
+        (ord("a"), ord("z"))]
+SPACE = [(ord("\t"), ord("\r")), (ord(" "), ord(" "))]
+
+CLASS_ESCAPES = {"d" : DIGITS, "w" : WORD, "s" : SPACE}
+
+# ______________________________________________________________________
+# Function definitions
+
+def normalizeRanges (ranges):
+    """normalizeRanges()
+    Returns a sorted list of disjoint, non-adjacent (low, high) code point
+    ranges covering the same characters.
+    """
+    result = []
+    for low, high in sorted(ranges):
+        if result and (low <= result[-1][1] + 1):
+            if high > result[-1][1]:
+                result[-1] = (result[-1][0], high)
+        else:
+            result.append((low, high))
+    return result
+
+# ______________________________________________________________________
+
+def complementRanges (ranges):
+    """complementRanges()
+    """
+    result = []
+    low = 0
+    for rangeLow, rangeHigh in normalizeRanges(ranges):
+        if rangeLow > low:
+            result.append((low, rangeLow - 1))
+        low = rangeHigh + 1
+    if low <= MAX_CHAR:
+        result.append((low, MAX_CHAR))
+    return result
+
+# ______________________________________________________________________
+
+def readDefinitions (text):
+    """readDefinitions()
+    Reads the "#%" directive lines of a .pgen file.  Returns (rules,
+    literals, skip) for makeScanner().
+    """
+    rules = []
+    literals = []
+    skip = []
+    for lineno, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line.startswith(DIRECTIVE):
+            continue
+        parts = line[len(DIRECTIVE):].split(None, 2)
+        if parts and (parts[0] == "literal"):
+            literals.extend(line[len(DIRECTIVE):].split()[1:])
+        elif (len(parts) == 3) and (parts[0] in ("token", "skip")):
+            rules.append((parts[1], parts[2]))
+            if parts[0] == "skip":
+                skip.append(parts[1])
+        else:
+            raise SyntaxError("line %d: malformed scanner directive %r" %
+                              (lineno + 1, line))
+    return rules, literals, skip
+
+# ______________________________________________________________________
+
+def makeScanner (rules, literals = (), skip = (), name = None):
+    """makeScanner()
+    Compiles token definitions into a Scanner subclass usable as a
+    tokenizer_cls.  rules is a list of (token name, pattern) pairs,
+    literals a list of operator strings (literals starting with a letter
+    or underscore are keywords and are left to the NAME rule) and skip the
+    names of the rules whose matches are dropped.
+    """
+    tokNames = dict(token.tok_name)
+    standard = dict((tokName, kind) for kind, tokName in tokNames.items()
+                    if kind < token.NT_OFFSET)
+    operatorMap = {}
+    tokenKinds = {}
+    nextKind = [max(standard.values()) + 1]
+    def newKind (tokName):
+        kind = nextKind[0]
+        if kind >= token.NT_OFFSET:
+            raise ValueError("too many new tokens")
+        nextKind[0] += 1
+        tokNames[kind] = tokName
+        return kind
+    kindRules = []
+    for literal in literals:
+        if (literal[0] in pgen.ascii_letters) or (literal[0] == "_"):
+            continue
+        if literal not in operatorMap:
+            kind = pgen.tokenizer.Tokenizer.operatorMap.get(literal)
+            if (kind is None) or (kind == token.ERRORTOKEN):
+                kind = newKind(repr(literal))
+            operatorMap[literal] = kind
+        kindRules.append((operatorMap[literal], literal, True))
+    for tokName, pattern in rules:
+        if tokName not in tokenKinds:
+            tokenKinds[tokName] = standard.get(tokName)
+            if tokenKinds[tokName] is None:
+                tokenKinds[tokName] = newKind(tokName)
+        kindRules.append((tokenKinds[tokName], pattern, False))
+    tables = ScannerPgen().compile(kindRules)
+    if name is None:
+        digest = hashlib.sha1(repr((rules, list(literals), list(skip))
+                                   ).encode("utf-8"))
+        name = "Scanner_%s" % digest.hexdigest()[:12]
+    return type(name, (Scanner,), {
+        "operatorMap" : operatorMap,
+        "tokenKinds" : tokenKinds,
+        "tok_name" : tokNames,
+        "tables" : tables,
+        "skipKinds" : frozenset(tokenKinds[tokName] for tokName in skip),
+        })
+
+# ______________________________________________________________________
+
+def buildParser (grammarText, **kws):
+    """buildParser()
+    Builds a PyPgenParser from the text of a .pgen file whose scanner
+    directives define its tokenizer.
+    """
+    scannerClass = makeScanner(*readDefinitions(grammarText))
+    return pgen.buildParser(parser.parse_string(grammarText), scannerClass,
+                            **kws)
+
+# ______________________________________________________________________
+# Class definitions
+
+class ScannerPgen (pgen.PyPgen):
+    """Class ScannerPgen
+
+    Builds scanner tables from token definitions, using PyPgen's subset
+    construction and state merging on a single NFA for all the rules.
+    """
+    # ____________________________________________________________
+    def __init__ (self, **kws):
+        """ScannerPgen.__init__
+        """
+        pgen.PyPgen.__init__(self, None, **kws)
+        self.sets = []
+        self.pattern = None
+        self.pos = 0
+
+    # ____________________________________________________________
+    def newState (self):
+        """ScannerPgen.newState
+        """
+        self.nfa[2].append([])
+        return len(self.nfa[2]) - 1
+
+    # ____________________________________________________________
+    def addSet (self, ranges):
+        """ScannerPgen.addSet
+        Returns an NFA fragment matching one character out of ranges.  Arcs
+        on character sets use negative labels until compile() splits the
+        sets into disjoint character classes.
+        """
+        self.sets.append(normalizeRanges(ranges))
+        start = self.newState()
+        finish = self.newState()
+        self.nfa[2][start].append((-len(self.sets), finish))
+        return start, finish
+
+    # ____________________________________________________________
+    def handleLiteral (self, text):
+        """ScannerPgen.handleLiteral
+        Returns an NFA fragment matching a literal string.
+        """
+        start = finish = self.newState()
+        for char in text:
+            charStart, charFinish = self.addSet([(ord(char), ord(char))])
+            self.nfa[2][finish].append((EMPTY, charStart))
+            finish = charFinish
+        return start, finish
+
+    # ____________________________________________________________
+    def handlePattern (self, pattern):
+        """ScannerPgen.handlePattern
+        Returns an NFA fragment matching a pattern.  The alternatives,
+        sequence, repeat and atom parsers are generators run by
+        pgen2.parser.trampoline(), so nested groups never recurse on the
+        Python stack.
+        """
+        self.pattern = pattern
+        self.pos = 0
+        start, finish = parser.trampoline(self.parseRegexAlternatives())
+        if self.pos < len(pattern):
+            self.error("unbalanced ')'")
+        return start, finish
+
+    # ____________________________________________________________
+    def error (self, message):
+        """ScannerPgen.error
+        """
+        raise SyntaxError("%s at offset %d in pattern %r" %
+                          (message, self.pos, self.pattern))
+
+    # ____________________________________________________________
+    def peek (self):
+        """ScannerPgen.peek
+        """
+        if self.pos < len(self.pattern):
+            return self.pattern[self.pos]
+        return None
+
+    # ____________________________________________________________
+    def parseRegexAlternatives (self):
+        """ScannerPgen.parseRegexAlternatives
+        alternatives := sequence ( '|' sequence )*
+        """
+        start, finish = yield self.parseRegexSequence()
+        if self.peek() == "|":
+            altStart = self.newState()
+            altFinish = self.newState()
+            self.nfa[2][altStart].append((EMPTY, start))
+            self.nfa[2][finish].append((EMPTY, altFinish))
+            while self.peek() == "|":
+                self.pos += 1
+                start, finish = yield self.parseRegexSequence()
+                self.nfa[2][altStart].append((EMPTY, start))
+                self.nfa[2][finish].append((EMPTY, altFinish))
+            start, finish = altStart, altFinish
+        yield start, finish
+
+    # ____________________________________________________________
+    def parseRegexSequence (self):
+        """ScannerPgen.parseRegexSequence
+        sequence := repeat*
+        """
+        start = finish = self.newState()
+        while self.peek() not in (None, "|", ")"):
+            itemStart, itemFinish = yield self.parseRegexRepeat()
+            self.nfa[2][finish].append((EMPTY, itemStart))
+            finish = itemFinish
+        yield start, finish
+
+    # ____________________________________________________________
+    def parseRegexRepeat (self):
+        """ScannerPgen.parseRegexRepeat
+        repeat := atom ( '*' | '+' | '?' )*
+        """
+        start, finish = yield self.parseRegexAtom()
+        while self.peek() in ("*", "+", "?"):
+            operator = self.pattern[self.pos]
+            self.pos += 1
+            newStart = self.newState()
+            newFinish = self.newState()
+            self.nfa[2][newStart].append((EMPTY, start))
+            self.nfa[2][finish].append((EMPTY, newFinish))
+            if operator != "+":
+                self.nfa[2][newStart].append((EMPTY, newFinish))
+            if operator != "?":
+                self.nfa[2][finish].append((EMPTY, start))
+            start, finish = newStart, newFinish
+        yield start, finish
+
+    # ____________________________________________________________
+    def parseRegexAtom (self):
+        """ScannerPgen.parseRegexAtom
+        atom := '(' alternatives ')' | '[' class ']' | '.' | escape | char
+        """
+        char = self.peek()
+        self.pos += 1
+        if char == "(":
+            start, finish = yield self.parseRegexAlternatives()
+            if self.peek() != ")":
+                self.error("missing ')'")
+            self.pos += 1
+            yield start, finish
+        elif char == "[":
+            yield self.addSet(self.parseRegexClass())
+        elif char == ".":
+            yield self.addSet(complementRanges([(ord("\n"), ord("\n"))]))
+        elif char == "\\":
+            yield self.addSet(self.parseRegexEscape())
+        elif char in ("*", "+", "?"):
+            self.pos -= 1
+            self.error("nothing to repeat")
+        yield self.addSet([(ord(char), ord(char))])
+
+    # ____________________________________________________________
+    def parseRegexEscape (self):
+        """ScannerPgen.parseRegexEscape
+        Returns the ranges of the escape sequence after a backslash.
+        """
+        char = self.peek()
+        if char is None:
+            self.error("trailing backslash")
+        self.pos += 1
+        if char.lower() in CLASS_ESCAPES:
+            ranges = CLASS_ESCAPES[char.lower()]
+            if char.isupper():
+                ranges = complementRanges(ranges)
+            return ranges
+        char = ESCAPES.get(char, char)
+        return [(ord(char), ord(char))]
+
+    # ____________________________________________________________
+    def parseRegexClass (self):
+        """ScannerPgen.parseRegexClass
+        Returns the ranges of a character class, after its '['.
+        """
+        negate = self.peek() == "^"
+        if negate:
+            self.pos += 1
+        ranges = []
+        first = True
+        while (self.peek() != "]") or first:
+            first = False
+            char = self.peek()
+            if char is None:
+                self.error("missing ']'")
+            self.pos += 1
+            if char == "\\":
+                escaped = self.parseRegexEscape()
+                if len(escaped) != 1 or escaped[0][0] != escaped[0][1]:
+                    ranges.extend(escaped)
+                    continue
+                low = escaped[0][0]
+            else:
+                low = ord(char)
+            high = low
+            if ((self.peek() == "-") and (self.pos + 1 < len(self.pattern))
+                and (self.pattern[self.pos + 1] != "]")):
+                self.pos += 1
+                char = self.pattern[self.pos]
+                self.pos += 1
+                if char == "\\":
+                    high = self.parseRegexEscape()[0][0]
+                else:
+                    high = ord(char)
+                if high < low:
+                    self.error("bad character range")
+            ranges.append((low, high))
+        self.pos += 1
+        if negate:
+            ranges = complementRanges(ranges)
+        return ranges
+
+    # ____________________________________________________________
+    def partition (self):
+        """ScannerPgen.partition
+        Splits the code points into classes of characters that belong to
+        the same character sets.  Returns (boundaries, boundaryClasses,
+        setClasses, classCount): the start of every interval of code
+        points, the class of each interval, and the classes of each set.
+        """
+        points = set([0])
+        for ranges in self.sets:
+            for low, high in ranges:
+                points.add(low)
+                if high < MAX_CHAR:
+                    points.add(high + 1)
+        boundaries = sorted(points)
+        signatures = {}
+        boundaryClasses = []
+        setClasses = [set() for ranges in self.sets]
+        # Walk the intervals and each set's ranges in step.
+        positions = [0] * len(self.sets)
+        for low in boundaries:
+            members = []
+            for setIndex, ranges in enumerate(self.sets):
+                position = positions[setIndex]
+                while (position < len(ranges)) and (ranges[position][1] <
+                                                    low):
+                    position += 1
+                positions[setIndex] = position
+                if (position < len(ranges)) and (ranges[position][0] <=
+                                                 low):
+                    members.append(setIndex)
+            signature = tuple(members)
+            if signature not in signatures:
+                signatures[signature] = len(signatures)
+            charClass = signatures[signature]
+            boundaryClasses.append(charClass)
+            for setIndex in members:
+                setClasses[setIndex].add(charClass)
+        return boundaries, boundaryClasses, setClasses, len(signatures)
+
+    # ____________________________________________________________
+    def sameState (self, s1, s2):
+        """ScannerPgen.sameState()
+        Like PyPgen.sameState(), but ignores the order of the arcs, which
+        depends on the order the subset construction met the characters.
+        """
+        return ((s1[2] == s2[2]) and
+                (sorted(arc[:-1] for arc in s1[1]) ==
+                 sorted(arc[:-1] for arc in s2[1])))
+
+    # ____________________________________________________________
+    def compile (self, kindRules):
+        """ScannerPgen.compile
+        Compiles (token type, pattern or literal, is literal?) rules, in
+        priority order, into scanner tables: (classMap, boundaries,
+        boundaryClasses, transitions, accept, classCount).
+        """
+        self.nfa = [0, "<scanner>", [], -1, -1]
+        self.sets = []
+        start = self.newState()
+        final = self.newState()
+        finishes = []
+        for kind, pattern, isLiteral in kindRules:
+            if isLiteral:
+                ruleStart, ruleFinish = self.handleLiteral(pattern)
+            else:
+                ruleStart, ruleFinish = self.handlePattern(pattern)
+            reached = [False] * len(self.nfa[2])
+            self.addClosure(reached, self.nfa, ruleStart)
+            if reached[ruleFinish]:
+                raise ValueError("pattern %r matches the empty string" %
+                                 pattern)
+            self.nfa[2][start].append((EMPTY, ruleStart))
+            finishes.append(ruleFinish)
+        boundaries, boundaryClasses, setClasses, classCount = \
+            self.partition()
+        # Replace the character set arcs by arcs on their classes (labels
+        # 1 to classCount), and end each rule with an arc on its own
+        # pseudo-label.
+        for stateArcs in self.nfa[2]:
+            for arcIndex in range(len(stateArcs) - 1, -1, -1):
+                label, arrow = stateArcs[arcIndex]
+                if label < 0:
+                    stateArcs[arcIndex:arcIndex + 1] = [
+                        (charClass + 1, arrow)
+                        for charClass in sorted(setClasses[-label - 1])]
+        for ruleIndex, ruleFinish in enumerate(finishes):
+            self.nfa[2][ruleFinish].append((classCount + 1 + ruleIndex,
+                                            final))
+        self.nfa[3] = start
+        self.nfa[4] = final
+        dfa = self.nfaToDfa(self.nfa)
+        return self.makeTables(dfa, kindRules, boundaries, boundaryClasses,
+                               classCount)
+
+    # ____________________________________________________________
+    def makeTables (self, dfa, kindRules, boundaries, boundaryClasses,
+                    classCount):
+        """ScannerPgen.makeTables
+        Renumbers the DFA states reachable on characters and packs them
+        into arrays.
+        """
+        states = dfa[3]
+        stateMap = {dfa[2] : 0}
+        order = [dfa[2]]
+        for stateIndex in order:
+            for label, arrow in states[stateIndex][0]:
+                if (0 < label <= classCount) and (arrow not in stateMap):
+                    stateMap[arrow] = len(order)
+                    order.append(arrow)
+        transitions = array.array("i", [-1] * (len(order) * classCount))
+        accept = array.array("i", [-1] * len(order))
+        for newIndex, stateIndex in enumerate(order):
+            rules = []
+            for label, arrow in states[stateIndex][0]:
+                if 0 < label <= classCount:
+                    transitions[newIndex * classCount + label - 1] = \
+                        stateMap[arrow]
+                elif label > classCount:
+                    rules.append(label - classCount - 1)
+            if rules:
+                accept[newIndex] = kindRules[min(rules)][0]
+        classMap = array.array("i", [
+            boundaryClasses[bisect.bisect_right(boundaries, char) - 1]
+            for char in range(256)])
+        return (classMap, array.array("i", boundaries),
+                array.array("i", boundaryClasses), transitions, accept,
+                classCount)
+
+# ______________________________________________________________________
+
+class Scanner (object):
+    """Class Scanner
+
+    Base class of the tokenizer classes made by makeScanner(), which fill
+    in the class attributes.  It follows the pgen2.tokenizer.Tokenizer
+    interface: tokens are (type, string, line number) tuples, and
+    instances hold no per-input state, so they can be shared between
+    threads.
+    """
+    operatorMap = {}
+    tokenKinds = {}
+    tok_name = token.tok_name
+    tables = None
+    skipKinds = frozenset()
+
+    # ____________________________________________________________
+    def generateTokens (self, text):
+        """Scanner.generateTokens
+        Yields the tokens of a string, raising SyntaxError at a character
+        no rule matches.
+        """
+        (classMap, boundaries, boundaryClasses, transitions, accept,
+         classCount) = self.tables
+        skipKinds = self.skipKinds
+        bisect_right = bisect.bisect_right
+        length = len(text)
+        lineno = 1
+        pos = 0
+        while pos < length:
+            state = 0
+            kind = -1
+            end = index = pos
+            while index < length:
+                char = ord(text[index])
+                if char < 256:
+                    charClass = classMap[char]
+                else:
+                    charClass = boundaryClasses[
+                        bisect_right(boundaries, char) - 1]
+                state = transitions[state * classCount + charClass]
+                if state < 0:
+                    break
+                index += 1
+                if accept[state] >= 0:
+                    kind = accept[state]
+                    end = index
+            if kind < 0:
+                raise SyntaxError("line %d: unexpected character %r" %
+                                  (lineno, text[pos]))
+            tokenText = text[pos:end]
+            if kind not in skipKinds:
+                yield (kind, tokenText, lineno)
+            lineno += tokenText.count("\n")
+            pos = end
+        yield (token.ENDMARKER, "ENDMARKER", lineno)
+
+    # ____________________________________________________________
+    def tokenize (self, stream):
+        """Scanner.tokenize
+        Returns a token generator over a file-like object.
+        """
+        return self.generateTokens(stream.read())
+
+    # ____________________________________________________________
+    def tokenizeString (self, inString):
+        """Scanner.tokenizeString
+        """
+        return self.generateTokens(inString)
+
+    # ____________________________________________________________
+    def tokenizeFile (self, filename):
+        """Scanner.tokenizeFile
+        """
+        with open(filename) as fileObj:
+            text = fileObj.read()
+        return self.generateTokens(text)
+
+    # ____________________________________________________________
+    def tokenStream (self, stream, filename = None):
+        """Scanner.tokenStream
+        Same as tokenize(); scanners keep no per-input state.
+        """
+        return self.tokenize(stream)
+
+    # ____________________________________________________________
+    def tokenStreamString (self, inString):
+        """Scanner.tokenStreamString
+        """
+        return self.generateTokens(inString)
+
+    # ____________________________________________________________
+    def getOperatorMap (self):
+        """Scanner.getOperatorMap
+        """
+        return self.operatorMap
+
+# ______________________________________________________________________
+# End of pgen2.scanner
@@ -0,0 +1,378 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.sharedgrammar
+
+Compiled grammars as flat, read-only tables, for sharing one grammar
+between worker processes.
+
+The grammar tuples built by PyPgen (and their accelerators) are made of
+many small Python objects; in a pre-fork pool, reference counting writes to
+the pages holding them, so every worker ends up with a private copy.
+flatten() packs an accelerated grammar into a single buffer of native int
+tables plus a UTF-8 string blob.  The buffer can be published in
+multiprocessing.shared_memory (publish()/attach(), Python 3.8+) or written
+to a file that workers mmap (writeFile()/openFile()).  SharedGrammar parses
+directly from the buffer, with the same trees and errors as
+pgen2.dfa.parsetok(); only the keyword table is copied into each worker.
+
+Buffer layout (native byte order, 4 byte ints):
+
+    header      MAGIC, VERSION, #dfas, #labels, start, #states, #accel,
+                blob size
+    typeLabel   NT_OFFSET entries: label of (type, None), or -1
+    dfaInitial  #dfas entries: initial state (DFA relative)
+    dfaBase     #dfas entries: index of the DFA's first state
+    dfaName     #dfas (offset, length) pairs into the blob
+    labelType   #labels entries
+    labelName   #labels (offset, length) pairs, offset -1 for None
+    stateFlags  #states entries: 1 = accepting, 2 = accept-only
+    stateLower  #states entries: accelerator lower bound
+    stateUpper  #states entries: accelerator upper bound
+    stateAccel  #states entries: index of the state's first accelerator
+    accel       #accel entries, encoded as in pgen2.dfa.accelerateDFA()
+    blob        UTF-8 strings
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import array
+import mmap
+import token
+
+from . import dfa
+
+# ______________________________________________________________________
+# Module data
+
+MAGIC = 0x50474701
+VERSION = 1
+HEADER_SIZE = 8
+INT_SIZE = array.array("i").itemsize
+
+# ______________________________________________________________________
+
+def toBytes (table):
+    """toBytes()
+    """
+    if hasattr(table, "tobytes"):
+        return table.tobytes()
+    return table.tostring()
+
+# ______________________________________________________________________
+
+def byteView (buffer, offset, size):
+    """byteView()
+    Returns a memoryview over size bytes of buffer starting at offset.
+    """
+    try:
+        return memoryview(buffer)[offset:offset + size]
+    except TypeError:
+        # Python 2 mmap objects only have the old buffer interface.
+        return memoryview(buffer[offset:offset + size])
+
+# ______________________________________________________________________
+
+def intView (buffer, offset, count):
+    """intView()
+    Returns an int sequence over count ints of buffer starting at byte
+    offset, without copying where memoryview.cast() is available.
+    """
+    view = byteView(buffer, offset, count * INT_SIZE)
+    if hasattr(view, "cast"):
+        return view.cast("i")
+    table = array.array("i")
+    table.fromstring(view.tobytes())
+    return table
+
+# ______________________________________________________________________
+
+def flatten (grammar):
+    """flatten()
+    Returns the flat table form (a byte string) of a grammar tuple.
+    Unaccelerated grammars are accelerated first.
+    """
+    grammar = dfa.addAccelerators(grammar)
+    dfas, labels, start, accel = grammar
+    blob = bytearray()
+    def addString (string):
+        if string is None:
+            return (-1, 0)
+        data = string.encode("utf-8")
+        offset = len(blob)
+        blob.extend(data)
+        return (offset, len(data))
+    typeLabel = array.array("i", [-1] * token.NT_OFFSET)
+    labelType = array.array("i")
+    labelName = array.array("i")
+    for index, (labelTypeValue, name) in enumerate(labels):
+        labelType.append(labelTypeValue)
+        labelName.extend(addString(name))
+        if ((name is None) and (0 <= labelTypeValue < token.NT_OFFSET) and
+            (typeLabel[labelTypeValue] == -1)):
+            typeLabel[labelTypeValue] = index
+    dfaInitial = array.array("i")
+    dfaBase = array.array("i")
+    dfaName = array.array("i")
+    stateFlags = array.array("i")
+    stateLower = array.array("i")
+    stateUpper = array.array("i")
+    stateAccel = array.array("i")
+    accelTables = array.array("i")
+    for index, dfaObj in enumerate(dfas):
+        if dfaObj[0] != index + token.NT_OFFSET:
+            raise ValueError("DFA %d has type %d" % (index, dfaObj[0]))
+        dfaInitial.append(dfaObj[2])
+        dfaBase.append(len(stateFlags))
+        dfaName.extend(addString(dfaObj[1]))
+        for arcs, (accelUpper, accelLower, accelTable), accept in dfaObj[3]:
+            flags = 0
+            if accept:
+                flags = 1
+                if len(arcs) == 1:
+                    flags |= 2
+            stateFlags.append(flags)
+            stateLower.append(accelLower)
+            stateUpper.append(accelUpper)
+            stateAccel.append(len(accelTables))
+            accelTables.extend(accelTable)
+    header = array.array("i", [MAGIC, VERSION, len(dfas), len(labels),
+                               start, len(stateFlags), len(accelTables),
+                               len(blob)])
+    return b"".join([toBytes(table) for table in (
+        header, typeLabel, dfaInitial, dfaBase, dfaName, labelType,
+        labelName, stateFlags, stateLower, stateUpper, stateAccel,
+        accelTables)] + [bytes(blob)])
+
+# ______________________________________________________________________
+
+class SharedGrammar (object):
+    """Class SharedGrammar
+
+    Read-only view of a flattened grammar, and a parser running directly
+    off of it.  buffer is any object supporting the buffer protocol: the
+    result of flatten(), a SharedMemory.buf or an mmap.  The view holds no
+    other per-grammar state than a keyword map, so it is safe to share
+    between threads.
+    """
+    # ____________________________________________________________
+    def __init__ (self, buffer):
+        """SharedGrammar.__init__
+        """
+        self.buffer = buffer
+        header = intView(buffer, 0, HEADER_SIZE)
+        if (len(header) < HEADER_SIZE) or (header[0] != MAGIC):
+            raise ValueError("Not a flattened pgen2 grammar")
+        if header[1] != VERSION:
+            raise ValueError("Unsupported flattened grammar version %d" %
+                             (header[1],))
+        (self.dfaCount, self.labelCount, self.start, self.stateCount,
+         self.accelCount, blobSize) = tuple(header[2:])
+        if hasattr(header, "release"):
+            header.release()
+        offset = [HEADER_SIZE * INT_SIZE]
+        def table (count):
+            view = intView(buffer, offset[0], count)
+            offset[0] += count * INT_SIZE
+            return view
+        self.typeLabel = table(token.NT_OFFSET)
+        self.dfaInitial = table(self.dfaCount)
+        self.dfaBase = table(self.dfaCount)
+        self.dfaName = table(2 * self.dfaCount)
+        self.labelType = table(self.labelCount)
+        self.labelName = table(2 * self.labelCount)
+        self.stateFlags = table(self.stateCount)
+        self.stateLower = table(self.stateCount)
+        self.stateUpper = table(self.stateCount)
+        self.stateAccel = table(self.stateCount)
+        self.accel = table(self.accelCount)
+        self.blob = byteView(buffer, offset[0], blobSize)
+        self.keywords = {}
+        for index in range(self.labelCount):
+            if self.labelType[index] == token.NAME:
+                name = self.string(self.labelName, index)
+                if (name is not None) and (name not in self.keywords):
+                    self.keywords[name] = index
+
+    # ____________________________________________________________
+    def string (self, pairs, index):
+        """SharedGrammar.string
+        Decodes the index-th (offset, length) string of a table.
+        """
+        offset = pairs[2 * index]
+        if offset < 0:
+            return None
+        return self.blob[offset:offset + pairs[2 * index + 1]].tobytes(
+            ).decode("utf-8")
+
+    # ____________________________________________________________
+    def release (self):
+        """SharedGrammar.release
+        Drops the views on the buffer, so a SharedMemory or mmap can be
+        closed.  The instance is unusable afterwards.
+        """
+        for name in ("typeLabel", "dfaInitial", "dfaBase", "dfaName",
+                     "labelType", "labelName", "stateFlags", "stateLower",
+                     "stateUpper", "stateAccel", "accel", "blob"):
+            view = getattr(self, name)
+            if hasattr(view, "release"):
+                view.release()
+            setattr(self, name, None)
+        self.buffer = None
+
+    # ____________________________________________________________
+    def classify (self, type, name):
+        """SharedGrammar.classify
+        Same as pgen2.dfa.classify(), using the flat tables.
+        """
+        if type == token.NAME:
+            ilabel = self.keywords.get(name)
+            if ilabel is not None:
+                return ilabel
+        if 0 <= type < token.NT_OFFSET:
+            return self.typeLabel[type]
+        return -1
+
+    # ____________________________________________________________
+    def labelString (self, ilabel):
+        """SharedGrammar.labelString
+        """
+        return self.string(self.labelName, ilabel)
+
+    # ____________________________________________________________
+    def parse (self, tokens, start = None):
+        """SharedGrammar.parse
+        Parses an iterable of (type, string, line number) tokens from start
+        (defaults to the grammar's start symbol).  Returns the same tree as
+        pgen2.dfa.parsetok(), and raises the same SyntaxError on errors.
+        """
+        if start is None:
+            start = self.start
+        dfaBase = self.dfaBase
+        dfaInitial = self.dfaInitial
+        stateFlags = self.stateFlags
+        stateLower = self.stateLower
+        stateUpper = self.stateUpper
+        stateAccel = self.stateAccel
+        accel = self.accel
+        classify = self.classify
+        NT_OFFSET = token.NT_OFFSET
+        rootNode = ((start, None, 0), [])
+        dfaIndex = start - NT_OFFSET
+        base = dfaBase[dfaIndex]
+        # stack := [ (global state index, DFA base, node) ]
+        stack = [(base + dfaInitial[dfaIndex], base, rootNode)]
+        lineno = 0
+        for type, name, lineno in tokens:
+            ilabel = classify(type, name)
+            while True:
+                state, base, parent = stack[-1]
+                lower = stateLower[state]
+                upper = stateUpper[state]
+                if (lower <= ilabel) and (ilabel < upper):
+                    accelResult = accel[stateAccel[state] + ilabel - lower]
+                    if -1 != accelResult:
+                        if accelResult & (1 << 7):
+                            # Push non-terminal
+                            dfaIndex = accelResult >> 8
+                            newAstNode = ((dfaIndex + NT_OFFSET, None,
+                                           lineno), [])
+                            parent[1].append(newAstNode)
+                            stack[-1] = (base + (accelResult & 0x7f), base,
+                                         parent)
+                            newBase = dfaBase[dfaIndex]
+                            stack.append((newBase + dfaInitial[dfaIndex],
+                                          newBase, newAstNode))
+                            continue
+                        # Shift
+                        parent[1].append(((type, name, lineno), []))
+                        state = base + accelResult
+                        stack[-1] = (state, base, parent)
+                        while stateFlags[state] & 2:
+                            stack.pop()
+                            if not stack:
+                                return rootNode
+                            state = stack[-1][0]
+                        break
+                if stateFlags[state] & 1:
+                    stack.pop()
+                    if not stack:
+                        raise SyntaxError("Error in line %d%s" % (
+                            lineno, ", (XXX) empty stack!!!"))
+                    continue
+                if ((upper - 1 <= lower) and
+                    (self.labelString(lower) is not None)):
+                    errMsg = ", %s expected (not %s)" % (
+                        self.labelString(lower), repr(name))
+                else:
+                    errMsg = ", unexpected %s" % repr(name)
+                raise SyntaxError("Error in line %d%s" % (lineno, errMsg))
+        raise SyntaxError("Error in line %d, unexpected end of input" %
+                          (lineno,))
+
+    # ____________________________________________________________
+    def symbolToStringMap (self):
+        """SharedGrammar.symbolToStringMap
+        """
+        return dict((index + token.NT_OFFSET,
+                     self.string(self.dfaName, index))
+                    for index in range(self.dfaCount))
+
+    # ____________________________________________________________
+    def stringToSymbolMap (self):
+        """SharedGrammar.stringToSymbolMap
+        """
+        return dict((name, symbol) for symbol, name in
+                    self.symbolToStringMap().items())
+
+# ______________________________________________________________________
+
+def writeFile (grammar, filename):
+    """writeFile()
+    Writes the flat form of a grammar to a file, for openFile().
+    """
+    with open(filename, "wb") as fileObj:
+        fileObj.write(flatten(grammar))
+
+# ______________________________________________________________________
+
+def openFile (filename):
+    """openFile()
+    Maps a file written by writeFile() read-only; returns a SharedGrammar.
+    The mapping stays open as long as the SharedGrammar is referenced.
+    """
+    with open(filename, "rb") as fileObj:
+        mapping = mmap.mmap(fileObj.fileno(), 0, access = mmap.ACCESS_READ)
+    return SharedGrammar(mapping)
+
+# ______________________________________________________________________
+
+def publish (grammar, name = None):
+    """publish()
+    Copies the flat form of a grammar into a new shared memory block and
+    returns the multiprocessing.shared_memory.SharedMemory object; workers
+    attach() to it by its name.  The caller owns the block and should
+    close() and unlink() it once the workers are done.
+    """
+    from multiprocessing import shared_memory
+    data = flatten(grammar)
+    block = shared_memory.SharedMemory(name = name, create = True,
+                                       size = len(data))
+    block.buf[:len(data)] = data
+    return block
+
+# ______________________________________________________________________
+
+def attach (name):
+    """attach()
+    Attaches to a grammar published under name; returns a (SharedMemory,
+    SharedGrammar) pair.  Call release() on the grammar before closing the
+    block.
+    """
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(name = name)
+    return block, SharedGrammar(block.buf)
+
+# ______________________________________________________________________
+# End of pgen2.sharedgrammar
@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import unittest
+
+import pgen2.benchmark
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+
+    def test_benchmark(self):
+        results, count = pgen2.benchmark.benchmark(self.parser, META_GRAMMAR,
+                                                   1)
+        self.assertEqual([stage for stage, seconds in results],
+                         ["tokenize", "recognize", "parse"])
+        self.assertEqual(count,
+                         len(list(self.parser.tokenizeString(META_GRAMMAR))))
+        lines = pgen2.benchmark.report(results, count).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[3].endswith("1.00x"))
+        self.assertRaises(SyntaxError, pgen2.benchmark.benchmark,
+                          self.parser, "a: : b\n", 1)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_benchmark
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import shutil
+import tempfile
+import unittest
+
+import pgen2.cache
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR, META_GRAMMAR_PATH
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.grammar = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR)).toTuple()
+        self.expected = pgen2.pgen.PyPgenParser(self.grammar).parseString(
+            META_GRAMMAR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_memory_tier(self):
+        cache = pgen2.cache.ParseCache(maxsize=1)
+        grammar_parser = pgen2.pgen.PyPgenParser(self.grammar, cache=cache)
+        tree = grammar_parser.parseString(META_GRAMMAR)
+        self.assertEqual(tree, self.expected)
+        self.assertTrue(grammar_parser.parseString(META_GRAMMAR) is tree)
+        self.assertTrue(grammar_parser.parseFile(META_GRAMMAR_PATH) is tree)
+        self.assertEqual(cache.stats(), {"hits": 2, "diskHits": 0,
+                                         "misses": 1, "size": 1})
+        # A second input evicts the first.
+        grammar_parser.parseString("a: b\n")
+        self.assertFalse(grammar_parser.parseString(META_GRAMMAR) is tree)
+        self.assertEqual(cache.stats()["misses"], 3)
+
+    def test_disk_tier(self):
+        grammar_parser = pgen2.pgen.PyPgenParser(
+            self.grammar, cache=pgen2.cache.ParseCache(
+                directory=self.directory))
+        grammar_parser.parseString(META_GRAMMAR)
+        cache = pgen2.cache.ParseCache(directory=self.directory)
+        grammar_parser = pgen2.pgen.PyPgenParser(self.grammar, cache=cache)
+        self.assertEqual(grammar_parser.parseString(META_GRAMMAR),
+                         self.expected)
+        self.assertEqual(cache.stats()["diskHits"], 1)
+        cache.invalidate(fingerprint=grammar_parser.fingerprint())
+        self.assertEqual(cache.get(META_GRAMMAR,
+                                   grammar_parser.fingerprint(),
+                                   grammar_parser.getStart()), None)
+
+    def test_invalidate(self):
+        cache = pgen2.cache.ParseCache(directory=self.directory)
+        tree_a, tree_b = ((256, None, 0), []), ((1, "b", 1), [])
+        cache.put("a", "f0", 256, tree_a)
+        cache.put("b", "f0", 256, tree_b)
+        cache.put("a", "f1", 256, tree_a)
+        cache.invalidate(content="a", fingerprint="f0")
+        self.assertEqual(cache.get("a", "f0", 256), None)
+        self.assertEqual(cache.get("b", "f0", 256), tree_b)
+        self.assertEqual(cache.get("a", "f1", 256), tree_a)
+        cache.clear()
+        self.assertEqual(cache.get("a", "f1", 256), None)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_cache
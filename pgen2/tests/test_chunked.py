@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import token
+import unittest
+
+import pgen2.chunked
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+import pgen2.tokenizer
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Module data
+
+# The optional second line of an item starts like a new item, so not every
+# top-level NEWLINE is a boundary of the serial parse.
+ITEMS_GRAMMAR = ("start: (item | NUMBER NEWLINE | NEWLINE)* ENDMARKER\n"
+                 "item: NAME NEWLINE [NAME '=' NEWLINE]\n")
+
+# ______________________________________________________________________
+# Function definitions
+
+def tokens(text):
+    return list(pgen2.tokenizer.Tokenizer().tokenizeString(text))
+
+def serial_outcome(grammar_parser, text):
+    try:
+        return grammar_parser.parseString(text)
+    except SyntaxError as exc:
+        return str(exc)
+
+def chunked_outcome(grammar_parser, text, **kws):
+    try:
+        return pgen2.chunked.parseChunked(tokens(text),
+                                          grammar_parser.parseGrammar,
+                                          grammar_parser.start, **kws)
+    except SyntaxError as exc:
+        return str(exc)
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestChunkedParsing(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+
+    def test_meta_grammar(self):
+        text = META_GRAMMAR * 3
+        points = pgen2.chunked.splitPoints(tokens(text),
+                                           self.parser.parseGrammar,
+                                           self.parser.start, 20)
+        self.assertTrue(len(points) > 3)
+        expected = self.parser.parseString(text)
+        for chunkSize in (1, 20, 10 ** 6):
+            self.assertEqual(chunked_outcome(self.parser, text, processes=1,
+                                             chunkSize=chunkSize), expected)
+        self.assertEqual(self.parser.parseStringChunked(text, 2, 20),
+                         expected)
+
+    def test_errors(self):
+        for text in (META_GRAMMAR + "a: : b\n" + META_GRAMMAR,
+                     META_GRAMMAR + "a: b\n: c\n"):
+            self.assertEqual(chunked_outcome(self.parser, text, processes=1,
+                                             chunkSize=10),
+                             serial_outcome(self.parser, text))
+
+    def test_false_boundaries(self):
+        grammar_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(ITEMS_GRAMMAR))
+        text = "a\nb=\n1\n" * 5
+        toks = tokens(text)
+        points = pgen2.chunked.splitPoints(toks, grammar_parser.parseGrammar,
+                                           grammar_parser.start, 1)
+        # The cut before "b" is lexically valid but inside an item.
+        self.assertTrue(toks.index((token.NAME, "b", 5)) in points)
+        expected = grammar_parser.parseString(text)
+        self.assertEqual(len(expected[1]), 5 * 3 + 1)
+        self.assertEqual(chunked_outcome(grammar_parser, text, processes=1,
+                                         chunkSize=1), expected)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_chunked
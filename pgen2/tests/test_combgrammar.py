@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import unittest
+
+import pgen2.combgrammar
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+import pgen2.tokenizer
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Function definitions
+
+def meta_tokens(text=META_GRAMMAR):
+    return list(pgen2.tokenizer.Tokenizer().tokenizeString(text))
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestCombGrammar(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.comb = pgen2.combgrammar.CombGrammar(self.parser.toTuple())
+
+    def test_lookup(self):
+        labelCount = len(self.parser.parseGrammar[1])
+        state = 0
+        for dfaObj in self.parser.parseGrammar[0]:
+            for arcs, (upper, lower, table), accept in dfaObj[3]:
+                for ilabel in range(-1, labelCount):
+                    expected = -1
+                    if lower <= ilabel < upper:
+                        expected = table[ilabel - lower]
+                    self.assertEqual(self.comb.lookup(state, ilabel),
+                                     expected)
+                state += 1
+        stats = self.comb.stats()
+        self.assertTrue(stats["rows"] < stats["states"])
+        self.assertTrue(stats["ratio"] > 1.0)
+
+    def test_parse(self):
+        self.assertEqual(self.comb.parse(meta_tokens()),
+                         self.parser.parseString(META_GRAMMAR))
+        self.assertEqual(self.comb.stringToSymbolMap(),
+                         self.parser.stringToSymbolMap())
+        for text in ("a: : b\n", "a: b\n: c\n", "a: b\nc\n", "a b\n"):
+            try:
+                self.parser.parseString(text)
+            except SyntaxError as exc:
+                expected = str(exc)
+            try:
+                self.comb.parse(meta_tokens(text))
+            except SyntaxError as exc:
+                self.assertEqual(str(exc), expected)
+            else:
+                self.fail("SyntaxError not raised for %r" % (text,))
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_combgrammar
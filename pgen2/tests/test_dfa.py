@@ -0,0 +1,359 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import pickle
+import token
+import unittest
+
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+import pgen2.tokenizer
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Module data
+
+BLOCK_GRAMMAR = ("start: (stmt | NEWLINE)* ENDMARKER\n"
+                 "stmt: NAME ':' suite | NAME NEWLINE\n"
+                 "suite: NAME NEWLINE | NEWLINE INDENT stmt+ DEDENT\n")
+
+# ______________________________________________________________________
+# Function definitions
+
+def meta_parser():
+    return pgen2.pgen.buildParser(pgen2.parser.parse_string(META_GRAMMAR))
+
+def meta_tokens(text=META_GRAMMAR):
+    return list(pgen2.tokenizer.Tokenizer().tokenizeString(text))
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestPushParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = meta_parser()
+        self.expected = self.parser.parseString(META_GRAMMAR)
+
+    def test_feed(self):
+        push_parser = self.parser.pushParser()
+        tokens = meta_tokens()
+        for tok in tokens[:-1]:
+            self.assertEqual(push_parser.feed(*tok), pgen2.dfa.E_OK)
+        self.assertEqual(push_parser.feed(*tokens[-1]), pgen2.dfa.E_DONE)
+        self.assertEqual(push_parser.finish(), self.expected)
+
+    def test_feed_many(self):
+        push_parser = self.parser.pushParser()
+        tokens = meta_tokens()
+        for index in range(0, len(tokens), 7):
+            result = push_parser.feed_many(tokens[index:index + 7])
+        self.assertEqual(result, pgen2.dfa.E_DONE)
+        self.assertEqual(push_parser.finish(), self.expected)
+        push_parser.reset()
+        self.assertEqual(push_parser.feed_many(iter(tokens)),
+                         pgen2.dfa.E_DONE)
+        self.assertEqual(push_parser.finish(), self.expected)
+
+    def test_errors(self):
+        push_parser = self.parser.pushParser()
+        push_parser.feed_many(meta_tokens("a: b\n")[:-1])
+        self.assertRaises(SyntaxError, push_parser.finish)
+        push_parser.reset()
+        self.assertEqual(push_parser.feed_many(meta_tokens("a: : b\n")),
+                         pgen2.dfa.E_SYNTAX)
+        self.assertRaises(SyntaxError, push_parser.finish)
+
+    def test_feed_many_interrupted(self):
+        tokens = meta_tokens()
+        def interrupted(count):
+            for tok in tokens[:count]:
+                yield tok
+            raise ValueError("input lost")
+        push_parser = self.parser.pushParser()
+        for count in (20, 45):
+            push_parser.reset()
+            self.assertRaises(ValueError, push_parser.feed_many,
+                              interrupted(count))
+            self.assertEqual(push_parser.lineno, tokens[count - 1][2])
+            self.assertEqual(push_parser.feed_many(tokens[count:]),
+                             pgen2.dfa.E_DONE)
+            self.assertEqual(push_parser.finish(), self.expected)
+
+    def test_snapshot(self):
+        push_parser = self.parser.pushParser()
+        tokens = meta_tokens()
+        middle = len(tokens) // 2
+        push_parser.feed_many(tokens[:middle])
+        checkpoint = push_parser.snapshot()
+        # Speculatively parse some bad input, then rewind.
+        push_parser.feed_many(meta_tokens("a: b c\nd: : e\n"))
+        push_parser.restore(checkpoint)
+        push_parser.feed_many(tokens[middle:])
+        self.assertEqual(push_parser.finish(), self.expected)
+        # Branch again from the same checkpoint.
+        push_parser.restore(checkpoint)
+        self.assertEqual(push_parser.feed_many(tokens[middle:]),
+                         pgen2.dfa.E_DONE)
+        self.assertEqual(push_parser.finish(), self.expected)
+
+    def test_snapshot_branches(self):
+        first_text, second_text = "a: b c\nd: e\n", "a: b | f\n"
+        first, second = meta_tokens(first_text), meta_tokens(second_text)
+        self.assertEqual(first[:3], second[:3])
+        push_parser = self.parser.pushParser()
+        push_parser.feed_many(first[:3])
+        checkpoint = push_parser.snapshot()
+        push_parser.feed_many(first[3:5])
+        later = push_parser.snapshot()
+        push_parser.feed_many(first[5:])
+        self.assertEqual(push_parser.finish(),
+                         self.parser.parseString(first_text))
+        # A later snapshot is good until the parse moves back past it.
+        push_parser.restore(later)
+        push_parser.feed_many(first[5:])
+        self.assertEqual(push_parser.finish(),
+                         self.parser.parseString(first_text))
+        # The branches from one snapshot are explored one at a time.
+        push_parser.restore(checkpoint)
+        push_parser.feed_many(second[3:])
+        self.assertEqual(push_parser.finish(),
+                         self.parser.parseString(second_text))
+        push_parser.restore(checkpoint)
+        push_parser.feed_many(first[3:])
+        self.assertEqual(push_parser.finish(),
+                         self.parser.parseString(first_text))
+
+    def test_snapshot_pickle(self):
+        push_parser = self.parser.pushParser()
+        tokens = meta_tokens()
+        push_parser.feed_many(tokens[:20])
+        saved = pickle.dumps(push_parser.snapshot())
+        resumed = self.parser.pushParser()
+        resumed.restore(pickle.loads(saved))
+        resumed.feed_many(tokens[20:])
+        self.assertEqual(resumed.finish(), self.expected)
+
+class TestParseLimits(unittest.TestCase):
+    def setUp(self):
+        self.grammar = meta_parser().toTuple()
+        self.tokens = meta_tokens()
+        self.expected = meta_parser().parseString(META_GRAMMAR)
+
+    def parse(self, text=META_GRAMMAR, **kws):
+        limits = pgen2.dfa.ParseLimits(**kws)
+        grammar_parser = pgen2.pgen.PyPgenParser(self.grammar, limits=limits)
+        return grammar_parser.parseString(text)
+
+    def test_counts(self):
+        nodes = [self.expected]
+        for node in nodes:
+            nodes.extend(node[1])
+        self.assertEqual(self.parse(maxTokens=len(self.tokens),
+                                    maxNodes=len(nodes)), self.expected)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded, self.parse,
+                          maxTokens=len(self.tokens) - 1)
+        self.assertRaises(pgen2.dfa.NodeLimitExceeded, self.parse,
+                          maxNodes=len(nodes) - 1)
+        push_parser = pgen2.dfa.PushParser(
+            self.grammar, self.grammar[2],
+            pgen2.dfa.ParseLimits(maxTokens=10))
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded,
+                          push_parser.feed_many, self.tokens)
+        self.assertEqual(push_parser.tokens, 11)
+        # The parse has failed; more tokens are ignored.
+        self.assertEqual(push_parser.result, pgen2.dfa.E_SYNTAX)
+        self.assertEqual(push_parser.feed_many(self.tokens[11:]),
+                         pgen2.dfa.E_SYNTAX)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded, push_parser.finish)
+        push_parser.reset()
+        for tok in self.tokens[:10]:
+            push_parser.feed(*tok)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded, push_parser.feed,
+                          *self.tokens[10])
+        self.assertEqual(push_parser.feed(*self.tokens[11]),
+                         pgen2.dfa.E_SYNTAX)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded, push_parser.finish)
+
+    def test_depth_and_deadline(self):
+        deep = "a: " + "(" * 20 + "b" + ")" * 20 + "\n"
+        self.parse(deep, maxDepth=100)
+        try:
+            self.parse(deep, maxDepth=30)
+        except pgen2.dfa.ParseLimitExceeded as exc:
+            self.assertTrue(isinstance(exc, pgen2.dfa.DepthLimitExceeded))
+            self.assertEqual((exc.limit, exc.lineno), (30, 1))
+        else:
+            self.fail("DepthLimitExceeded not raised")
+        interval = pgen2.dfa.ParseLimits.DEADLINE_INTERVAL
+        pgen2.dfa.ParseLimits.DEADLINE_INTERVAL = 1
+        try:
+            self.assertRaises(pgen2.dfa.DeadlineExceeded, self.parse,
+                              timeout=-1)
+        finally:
+            pgen2.dfa.ParseLimits.DEADLINE_INTERVAL = interval
+
+    def test_recover(self):
+        grammar_parser = pgen2.pgen.PyPgenParser(
+            self.grammar, limits=pgen2.dfa.ParseLimits(
+                maxTokens=len(self.tokens)))
+        self.assertEqual(grammar_parser.parseStringRecover(META_GRAMMAR),
+                         (self.expected, []))
+        bad = "a: : b\n" * len(self.tokens)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded,
+                          grammar_parser.parseStringRecover, bad)
+        deep = "a: " + "(" * 20 + "b" + ")" * 20 + "\n"
+        grammar_parser.limits = pgen2.dfa.ParseLimits(maxDepth=30)
+        self.assertRaises(pgen2.dfa.DepthLimitExceeded,
+                          grammar_parser.parseStringRecover, deep)
+        grammar_parser.limits = pgen2.dfa.ParseLimits(maxDepth=100)
+        self.assertEqual(grammar_parser.parseStringRecover(deep)[1], [])
+
+    def test_recognize(self):
+        grammar_parser = pgen2.pgen.PyPgenParser(
+            self.grammar, limits=pgen2.dfa.ParseLimits(
+                maxTokens=len(self.tokens), maxNodes=1))
+        self.assertEqual(grammar_parser.recognizeString(META_GRAMMAR), None)
+        grammar_parser.limits.maxTokens -= 1
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded,
+                          grammar_parser.recognizeString, META_GRAMMAR)
+        deep = "a: " + "(" * 20 + "b" + ")" * 20 + "\n"
+        for depth in range(1, 100):
+            grammar_parser.limits = pgen2.dfa.ParseLimits(maxDepth=depth)
+            try:
+                self.parse(deep, maxDepth=depth)
+            except pgen2.dfa.DepthLimitExceeded:
+                self.assertRaises(pgen2.dfa.DepthLimitExceeded,
+                                  grammar_parser.recognizeString, deep)
+            else:
+                self.assertEqual(grammar_parser.recognizeString(deep), None)
+                break
+        interval = pgen2.dfa.ParseLimits.DEADLINE_INTERVAL
+        pgen2.dfa.ParseLimits.DEADLINE_INTERVAL = 1
+        try:
+            grammar_parser.limits = pgen2.dfa.ParseLimits(timeout=-1)
+            self.assertRaises(pgen2.dfa.DeadlineExceeded,
+                              grammar_parser.recognizeString, deep)
+        finally:
+            pgen2.dfa.ParseLimits.DEADLINE_INTERVAL = interval
+
+class TestLazyAccelerators(unittest.TestCase):
+    def test_lazy(self):
+        grammar = pgen2.pgen.PyPgen()(pgen2.parser.parse_string(
+            "start: a NEWLINE* ENDMARKER\n"
+            "a: NAME | b\n"
+            "b: STRING\n"
+            "c: NUMBER ( c )*\n"))
+        eager = pgen2.pgen.PyPgenParser(grammar)
+        lazy = pgen2.pgen.PyPgenParser(grammar, lazy=True)
+        dfas = lazy.parseGrammar[0]
+        self.assertEqual(dfas.built(), 0)
+        self.assertEqual(lazy.parseString("x\n"), eager.parseString("x\n"))
+        self.assertEqual(dfas.built(), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(dfas)),
+                         eager.parseGrammar[0])
+        self.assertEqual(list(dfas), eager.parseGrammar[0])
+        self.assertEqual(dfas.built(), 4)
+
+class TestRecognize(unittest.TestCase):
+    def setUp(self):
+        self.parser = meta_parser()
+
+    def test_recognize(self):
+        self.assertEqual(self.parser.recognizeString(META_GRAMMAR), None)
+        for text in ("a: : b\n", "a: b\n: c\n", "a b\n", "a: b c :\n"):
+            try:
+                self.parser.parseString(text)
+            except SyntaxError as exc:
+                self.assertEqual(
+                    "Error in line %d%s" % self.parser.recognizeString(text),
+                    str(exc))
+            else:
+                self.fail("SyntaxError not raised")
+        tokens = meta_tokens("a: b\n")[:-1]
+        self.assertEqual(self.parser.recognizeTokens(iter(tokens)),
+                         (1, ", unexpected end of input"))
+
+    def test_tokenizer_errors(self):
+        self.assertEqual(self.parser.recognizeString("a: (b |\n"),
+                         (2, ", EOF in multi-line statement"))
+        self.assertEqual(self.parser.recognizeString("a: b\nc: [d\n\n"),
+                         (4, ", EOF in multi-line statement"))
+        block_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(BLOCK_GRAMMAR))
+        lineno, message = block_parser.recognizeString("a:\n    b\n  c\n")
+        self.assertEqual(lineno, 3)
+
+# ______________________________________________________________________
+
+class TestParseRecover(unittest.TestCase):
+    def error_nodes(self, tree):
+        found = []
+        nodes = [tree]
+        while nodes:
+            node = nodes.pop()
+            if node[0][0] == pgen2.dfa.ERROR_NODE:
+                found.append(node)
+            nodes.extend(node[1])
+        return found
+
+    def test_meta_grammar(self):
+        grammar_parser = meta_parser()
+        expected = grammar_parser.parseString(META_GRAMMAR)
+        self.assertEqual(grammar_parser.parseStringRecover(META_GRAMMAR),
+                         (expected, []))
+        text = "a: b\nc: : d\ne: f\ng h\ni: j\n"
+        tree, errors = grammar_parser.parseStringRecover(text)
+        try:
+            grammar_parser.parseString(text)
+        except SyntaxError as exc:
+            self.assertEqual("Error in line %d%s" % errors[0], str(exc))
+        self.assertEqual([lineno for lineno, message in errors], [2, 4])
+        rules = [child for child in tree[1]
+                 if child[0][0] == grammar_parser.stringToSymbolMap()["rule"]]
+        self.assertEqual([rule[1][0][0][1] for rule in rules],
+                         ["a", "c", "e", "g", "i"])
+        self.assertEqual([len(node[1]) for node in self.error_nodes(tree)],
+                         [1, 2])
+        tokens = meta_tokens("a: b\n")[:-1]
+        self.assertEqual(grammar_parser.parseTokensRecover(iter(tokens))[1],
+                         [(1, ", unexpected end of input")])
+
+    def test_tokenizer_errors(self):
+        grammar_parser = meta_parser()
+        tree, errors = grammar_parser.parseStringRecover(
+            "a: b\nc: : d\ne: (f |\n")
+        self.assertEqual(errors, [(2, ", unexpected ':'"),
+                                  (4, ", EOF in multi-line statement")])
+        rules = [child for child in tree[1]
+                 if child[0][0] == grammar_parser.stringToSymbolMap()["rule"]]
+        self.assertEqual([rule[1][0][0][1] for rule in rules],
+                         ["a", "c", "e"])
+
+    def test_blocks(self):
+        block_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(BLOCK_GRAMMAR))
+        text = "a:\n    b c\n    d:\n        e\n    f\ng h\ni\n"
+        tree, errors = block_parser.parseStringRecover(text)
+        self.assertEqual([lineno for lineno, message in errors], [2, 6])
+        # The block after a broken line is skipped with it, without
+        # reporting its INDENT as another error.
+        text = "a:\n    b\n    c d\n        e\n        f\n    g\nh\n"
+        tree, errors = block_parser.parseStringRecover(text)
+        self.assertEqual([lineno for lineno, message in errors], [3])
+        skipped = self.error_nodes(tree)[0][1]
+        self.assertEqual([node[0][1] for node in skipped
+                          if node[0][0] == token.NAME], ["d", "e", "f"])
+        tree, errors = block_parser.parseStringRecover("a\n    b\nc\n")
+        self.assertEqual([lineno for lineno, message in errors], [2])
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_dfa
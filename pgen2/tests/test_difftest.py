@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import unittest
+
+import pgen2.difftest
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR, META_GRAMMAR_PATH
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestDifferentialTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.grammar = self.parser.toTuple()
+
+    def test_matching_engines(self):
+        test = pgen2.difftest.DifferentialTest(
+            pgen2.difftest.parseEngine(self.parser),
+            pgen2.difftest.pushEngine(self.parser), "push")
+        inputs = list(pgen2.difftest.corpusInputs([META_GRAMMAR_PATH]))
+        inputs.append(("bad", "a: b\nc: : d\n"))
+        inputs.extend(pgen2.difftest.generatedInputs(self.grammar, 3, 500))
+        report = test.run(inputs)
+        self.assertTrue(report.ok(), str(report))
+        self.assertEqual((report.inputs, report.errors), (5, 1))
+        self.assertTrue(report.speedup() > 0)
+
+    def test_all_engines(self):
+        inputs = list(pgen2.difftest.corpusInputs([META_GRAMMAR_PATH]))
+        inputs.extend([("bad", "a: b\nc: : d\n"), ("name", "a b\n"),
+                       ("brackets", "a: (b\n)\n"), ("empty", "")])
+        inputs.extend(pgen2.difftest.generatedInputs(self.grammar, 3, 500))
+        names = []
+        for test in pgen2.difftest.engineTests(self.parser):
+            report = test.run(inputs)
+            self.assertTrue(report.ok(), str(report))
+            self.assertEqual((report.inputs, report.errors), (8, 2))
+            names.append(test.name)
+        self.assertEqual(names, ["PushParser", "parseLabelTokens",
+                                 "parseBatch", "parseRecover",
+                                 "SharedGrammar", "CombGrammar",
+                                 "recognize"])
+
+    def test_divergence(self):
+        def candidate(text):
+            tree = self.parser.parseString(text)
+            rule = tree[1][1]
+            return (tree[0], tree[1][:1] + [(rule[0], rule[1][:-1])] +
+                    tree[1][2:])
+        test = pgen2.difftest.DifferentialTest(
+            pgen2.difftest.parseEngine(self.parser), candidate)
+        report = test.run([("first", "a: b\n"), ("second", "a: b\nc: d\n"),
+                           ("third", "a: b\nc: d\n")])
+        self.assertEqual(report.divergences, 2)
+        name, path, detail1, detail2 = report.first
+        self.assertEqual((name, path, detail2), ("second", [1, 3], None))
+        self.assertEqual(detail1[0], 4)
+        self.assertTrue("first divergence in second" in str(report))
+        report = test.run([("first", "a: b\n"), ("second", "a: b\nc: d\n"),
+                           ("third", "a: b\nc: d\n")], True)
+        self.assertEqual((report.inputs, report.divergences), (2, 1))
+
+    def test_tokens(self):
+        def candidate(text):
+            return pgen2.difftest.tokenEngine()(text.replace("b", "c"))
+        test = pgen2.difftest.DifferentialTest(
+            pgen2.difftest.tokenEngine(), candidate,
+            compare=pgen2.difftest.compareSequences)
+        report = test.run([("same", "a: c\n"), ("other", "a: b\n")])
+        self.assertEqual(report.divergences, 1)
+        self.assertEqual(report.first[:2], ("other", [2]))
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_difftest
@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import token
+import unittest
+
+import pgen2.dfa
+import pgen2.generate
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Class definitions
+
+class Output(list):
+    write = list.append
+
+class TestSentenceGenerator(unittest.TestCase):
+    def setUp(self):
+        self.grammar = pgen2.pgen.PyPgen()(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.parser = pgen2.pgen.PyPgenParser(self.grammar)
+
+    def test_tokens_parse(self):
+        for mode in pgen2.generate.MODES:
+            generator = pgen2.generate.SentenceGenerator(
+                self.grammar, seed=7, mode=mode)
+            tokens = list(generator.tokens(size=2000))
+            self.assertEqual(tokens[-1][0], token.ENDMARKER)
+            tree = pgen2.dfa.parsetok(iter(tokens), self.grammar,
+                                      self.grammar[2])
+            self.assertEqual(tree[0][0], self.grammar[2])
+
+    def test_text_parse(self):
+        generator = pgen2.generate.SentenceGenerator(self.grammar, seed=3)
+        output = Output()
+        written = generator.write(output, size=5000)
+        text = "".join(output)
+        self.assertEqual(written, len(text))
+        self.assertTrue(len(text) >= 4000)
+        tree = self.parser.parseString(text)
+        self.assertEqual(tree[0][0], self.grammar[2])
+
+    def test_reproducible_and_bounded(self):
+        def generate(seed):
+            generator = pgen2.generate.SentenceGenerator(
+                self.grammar, seed=seed, maxDepth=6, mode="deep")
+            return list(generator.tokens("rhs"))
+        self.assertEqual(generate(11), generate(11))
+        self.assertNotEqual(generate(11), generate(12))
+        self.assertRaises(ValueError, pgen2.generate.SentenceGenerator,
+                          self.grammar, mode="sideways")
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_generate
@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import token
+import unittest
+
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+import pgen2.incremental
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestIncrementalPgen(unittest.TestCase):
+    def check_build(self, builder, grammar_text, **kws):
+        grammar_st = pgen2.parser.parse_string(grammar_text)
+        expected = pgen2.pgen.PyPgen(None, **kws)(grammar_st)
+        grammar = builder(grammar_st)
+        self.assertEqual(grammar, expected)
+        self.assertEqual(builder.accelerate(grammar),
+                         pgen2.dfa.addAccelerators(expected))
+
+    def test_rebuild(self):
+        builder = pgen2.incremental.IncrementalPgen()
+        self.check_build(builder, META_GRAMMAR)
+        self.assertEqual(builder.stats["rules"], 6)
+        self.check_build(builder, META_GRAMMAR)
+        self.assertEqual(builder.stats, {"rules": 0, "firstSets": 0,
+                                         "accelerators": 0})
+        # Moving rules down a line and changing one rule only recompiles
+        # that rule.
+        edited = "\n" + META_GRAMMAR.replace("alt: item+", "alt: item*")
+        self.check_build(builder, edited)
+        self.assertEqual(builder.stats["rules"], 1)
+        # Adding a new label changes the label numbering, which is handled
+        # as well.
+        edited = edited.replace("| NAME | STRING", "| NAME | NUMBER")
+        self.check_build(builder, edited)
+        self.assertEqual(builder.stats["rules"], 1)
+
+    def test_build_options(self):
+        grammar_text = META_GRAMMAR + "extra: NAME DOLLAR NAME NEWLINE\n"
+        kws = {"additional_tokens": {"DOLLAR": token.N_TOKENS},
+               "start_symbol": "rhs"}
+        builder = pgen2.incremental.IncrementalPgen(**kws)
+        self.check_build(builder, grammar_text, **kws)
+        grammar = builder(pgen2.parser.parse_string(grammar_text))
+        self.assertEqual(grammar[0][0][1], "rhs")
+        kws = {"additional_tokens": {"DOLLAR": token.N_TOKENS},
+               "processes": 2, "parallel_threshold": 1}
+        builder = pgen2.incremental.IncrementalPgen(**kws)
+        self.check_build(builder, grammar_text, **kws)
+        self.check_build(builder, grammar_text.replace("NAME DOLLAR",
+                                                       "DOLLAR"), **kws)
+        self.assertEqual(builder.stats["rules"], 1)
+
+    def test_build_parser(self):
+        builder = pgen2.incremental.IncrementalPgen()
+        grammar_parser = builder.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        grammar_st = grammar_parser.parseString(META_GRAMMAR)
+        self.assertEqual(grammar_st[0], (256, None, 0))
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_incremental
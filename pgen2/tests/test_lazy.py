@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import unittest
+
+import pgen2.dfa
+import pgen2.lazy
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Module data
+
+BLOCK_GRAMMAR = ("start: (stmt | NEWLINE)* ENDMARKER\n"
+                 "stmt: NAME ':' suite | NAME NEWLINE\n"
+                 "suite: NAME NEWLINE | NEWLINE INDENT stmt+ DEDENT\n")
+
+BLOCK_INPUT = """a:
+    b
+    c:
+        d
+    e: f
+g
+"""
+
+# ______________________________________________________________________
+# Function definitions
+
+def placeholders(tree):
+    found = []
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node[1], pgen2.lazy.LazyChildren):
+            found.append(node[1])
+            if not node[1].isParsed():
+                continue
+        nodes.extend(node[1])
+    return found
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestLazyParsing(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+
+    def test_brackets(self):
+        expected = self.parser.parseString(META_GRAMMAR)
+        tree = self.parser.parseStringLazy(META_GRAMMAR, ["atom"])
+        lazy = placeholders(tree)
+        self.assertEqual(len(lazy), 2)
+        self.assertFalse(any(children.isParsed() for children in lazy))
+        self.assertEqual(pgen2.lazy.expand(tree), expected)
+        self.assertTrue(all(children.isParsed() for children in lazy))
+        self.assertEqual(tree, expected)
+        self.assertRaises(ValueError, self.parser.parseStringLazy,
+                          META_GRAMMAR, ["rhs"])
+
+    def test_deferred_errors(self):
+        text = "a: b (c | : d) e\n"
+        try:
+            self.parser.parseString(text)
+        except SyntaxError as exc:
+            message = str(exc)
+        tree = self.parser.parseStringLazy(text, ["atom"])
+        lazy = placeholders(tree)
+        self.assertEqual(len(lazy), 1)
+        try:
+            len(lazy[0])
+        except SyntaxError as exc:
+            self.assertEqual(str(exc), message)
+        else:
+            self.fail("SyntaxError not raised")
+
+    def test_blocks(self):
+        block_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(BLOCK_GRAMMAR))
+        expected = block_parser.parseString(BLOCK_INPUT)
+        tree = block_parser.parseStringLazy(BLOCK_INPUT, ["suite"])
+        lazy = placeholders(tree)
+        # Only the outer block is a placeholder until it is parsed; the
+        # one line suite of "e" has no block to skip.
+        self.assertEqual(len(lazy), 1)
+        self.assertEqual(len(lazy[0]), 6)
+        self.assertEqual(len(placeholders(tree)), 2)
+        self.assertEqual(pgen2.lazy.expand(tree), expected)
+
+    def test_trailing_tokens(self):
+        call_parser = pgen2.pgen.buildParser(pgen2.parser.parse_string(
+            "start: NAME trailer NEWLINE\n"
+            "trailer: '(' NAME ')'\n"))
+        text = "f(x)\ng h\n"
+        tree = call_parser.parseStringLazy(text, ["trailer"])
+        self.assertEqual(len(placeholders(tree)), 1)
+        self.assertEqual(tree, call_parser.parseString(text))
+
+    def test_limits(self):
+        grammar_parser = pgen2.pgen.PyPgenParser(
+            self.parser.toTuple(),
+            limits=pgen2.dfa.ParseLimits(maxDepth=100))
+        tree = grammar_parser.parseStringLazy(META_GRAMMAR, ["atom"])
+        self.assertEqual(placeholders(tree), [])
+        self.assertEqual(tree, self.parser.parseString(META_GRAMMAR))
+        grammar_parser.limits = pgen2.dfa.ParseLimits(maxTokens=10)
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded,
+                          grammar_parser.parseStringLazy, META_GRAMMAR,
+                          ["atom"])
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_lazy
@@ -0,0 +1,240 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import sys
+import token
+import unittest
+
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR_PATH
+
+# ______________________________________________________________________
+# Module data
+
+META_LABELS = [(0, 'EMPTY'), (256, None), (257, None), (4, None), (0, None),
+               (1, None), (11, None), (258, None), (259, None), (18, None),
+               (260, None), (9, None), (10, None), (261, None), (16, None),
+               (14, None), (7, None), (8, None), (3, None)]
+
+CALC_GRAMMAR = ("start: (stmt | line)* ENDMARKER\n"
+                "stmt: 'let' NAME '=' line\n"
+                "line: expr NEWLINE\n"
+                "expr: term ('+' term)*\n"
+                "term: NAME | NUMBER | '(' expr ')'\n"
+                "loop: 'while' line\n")
+
+# ______________________________________________________________________
+# Function definitions
+
+def named_tree(tree, symbol_map):
+    (node_type, node_str, lineno), children = tree
+    return ((symbol_map.get(node_type, node_type), node_str, lineno),
+            [named_tree(child, symbol_map) for child in children])
+
+def frame_depth():
+    frame = sys._getframe()
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+def outcome(grammar_parser, text):
+    try:
+        return named_tree(grammar_parser.parseString(text),
+                          grammar_parser.symbolToStringMap())
+    except SyntaxError as exc:
+        return str(exc)
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestPyPgen(unittest.TestCase):
+    def test_add_label(self):
+        pgenObj = pgen2.pgen.PyPgen()
+        labels = [(token.ENDMARKER, "EMPTY")]
+        self.assertEqual(pgenObj.addLabel(labels, token.NAME, "a"), 1)
+        self.assertEqual(pgenObj.addLabel(labels, token.NAME, "b"), 2)
+        self.assertEqual(pgenObj.addLabel(labels, token.NAME, "a"), 1)
+        # A list the index has not seen yet is indexed from scratch.
+        other = [(token.NAME, "b"), (token.NAME, "b")]
+        self.assertEqual(pgenObj.addLabel(other, token.NAME, "b"), 0)
+        self.assertEqual(len(other), 2)
+        self.assertEqual(labels, [(token.ENDMARKER, "EMPTY"),
+                                  (token.NAME, "a"), (token.NAME, "b")])
+        # Labels added or removed in place are picked up.
+        labels.append((token.NAME, "c"))
+        self.assertEqual(pgenObj.addLabel(labels, token.NAME, "c"), 3)
+        del labels[1:]
+        self.assertEqual(pgenObj.addLabel(labels, token.NAME, "b"), 1)
+        self.assertEqual(labels, [(token.ENDMARKER, "EMPTY"),
+                                  (token.NAME, "b")])
+
+    def test_meta_labels(self):
+        grammar_st = pgen2.parser.parse_file(META_GRAMMAR_PATH)
+        grammar = pgen2.pgen.buildParser(grammar_st).toTuple()
+        self.assertEqual(grammar[1], META_LABELS)
+
+    def test_parallel_dfas(self):
+        grammar_st = pgen2.parser.parse_file(META_GRAMMAR_PATH)
+        serial = pgen2.pgen.buildParser(grammar_st).toTuple()
+        parallel = pgen2.pgen.buildParser(grammar_st, processes=2,
+                                          parallel_threshold=1).toTuple()
+        self.assertEqual(serial, parallel)
+
+    def test_parallel_dfas_subclass(self):
+        class NamedPgen(pgen2.pgen.PyPgen):
+            def __init__(self, name, **kws):
+                pgen2.pgen.PyPgen.__init__(self, None, **kws)
+                self.name = name
+        grammar_st = pgen2.parser.parse_file(META_GRAMMAR_PATH)
+        serial = pgen2.pgen.PyPgen()(grammar_st)
+        self.assertEqual(NamedPgen("meta", processes=2,
+                                   parallel_threshold=1)(grammar_st), serial)
+        import multiprocessing
+        pool = multiprocessing.Pool(2)
+        try:
+            for count in range(2):
+                self.assertEqual(NamedPgen("meta", pool=pool,
+                                           parallel_threshold=1)(grammar_st),
+                                 serial)
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_dfa_hooks(self):
+        calls = []
+        class HookedPgen(pgen2.pgen.PyPgen):
+            def addClosure(self, stateList, nfa, istate):
+                calls.append("addClosure")
+                pgen2.pgen.PyPgen.addClosure(self, stateList, nfa, istate)
+            def simplifyTempDfa(self, nfa, tempStates):
+                calls.append("simplifyTempDfa")
+                return pgen2.pgen.PyPgen.simplifyTempDfa(self, nfa,
+                                                         tempStates)
+            def tempDfaToDfa(self, nfa, tempStates):
+                calls.append("tempDfaToDfa")
+                return pgen2.pgen.PyPgen.tempDfaToDfa(self, nfa, tempStates)
+        grammar_st = pgen2.parser.parse_file(META_GRAMMAR_PATH)
+        serial = pgen2.pgen.PyPgen()(grammar_st)
+        for kws in ({}, {"processes": 2, "parallel_threshold": 1}):
+            del calls[:]
+            self.assertEqual(HookedPgen(**kws)(grammar_st), serial)
+            self.assertEqual(calls.count("simplifyTempDfa"), 6)
+            self.assertEqual(calls.count("tempDfaToDfa"), 6)
+            self.assertTrue(calls.count("addClosure") > 6)
+
+    def test_deep_nesting(self):
+        # The stdlib tokenizer allows at most 200 nested brackets, so the
+        # recursion limit is lowered below the nesting depth instead.
+        nesting = 150
+        pgenObj = pgen2.pgen.PyPgen()
+        text = ("start: " + "(" * nesting + "NAME" + ")" * nesting +
+                " NEWLINE\n")
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(frame_depth() + 50)
+        try:
+            grammar = pgenObj(pgen2.parser.parse_string(text))
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertEqual(grammar, pgenObj(pgen2.parser.parse_string(
+            "start: NAME NEWLINE\n")))
+        depth = sys.getrecursionlimit() + 100
+        text = "".join("x%d: x%d | NAME\n" % (index, index + 1)
+                       for index in range(depth)) + "x%d: NUMBER\n" % depth
+        grammar = pgenObj(pgen2.parser.parse_string(text))
+        labels = grammar[1]
+        first = [index for index in range(len(labels))
+                 if pgen2.dfa.testbit(grammar[0][0][4], index)]
+        self.assertEqual(sorted(labels[index] for index in first),
+                         [(token.NAME, None), (token.NUMBER, None)])
+
+    def test_prune_grammar(self):
+        grammar_st = pgen2.parser.parse_string(CALC_GRAMMAR)
+        full = pgen2.pgen.buildParser(grammar_st)
+        line_parser = full.specialize("line")
+        grammar = line_parser.toTuple()
+        self.assertEqual([dfa[1] for dfa in grammar[0]],
+                         ["line", "expr", "term"])
+        self.assertEqual([dfa[0] for dfa in grammar[0]],
+                         [token.NT_OFFSET, token.NT_OFFSET + 1,
+                          token.NT_OFFSET + 2])
+        self.assertEqual(grammar[2], token.NT_OFFSET)
+        # Unreachable keywords stay reserved; other dead labels go.
+        self.assertTrue((token.NAME, "while") in grammar[1])
+        self.assertFalse((token.EQUAL, None) in grammar[1])
+        self.assertTrue(len(grammar[1]) < len(full.toTuple()[1]))
+        full.setStart(full.stringToSymbolMap()["line"])
+        for text in ("a + (1 + b)\n", "while + 1\n", "a = 1\n", "(a\n)\n"):
+            self.assertEqual(outcome(line_parser, text), outcome(full, text))
+        self.assertEqual(pgen2.pgen.buildParser(
+            grammar_st, start_symbol="line").toTuple(), grammar)
+        pgenObj = pgen2.pgen.PyPgen()
+        self.assertRaises(ValueError, pgenObj.pruneGrammar, full.toTuple(),
+                          "missing")
+        self.assertRaises(ValueError, pgenObj.pruneGrammar,
+                          full.parseGrammar, "line")
+
+    def test_build_parser_options(self):
+        import pgen2.cache
+        grammar_st = pgen2.parser.parse_string(CALC_GRAMMAR)
+        plain = pgen2.pgen.buildParser(grammar_st)
+        cache = pgen2.cache.ParseCache()
+        limits = pgen2.dfa.ParseLimits(maxTokens=10)
+        grammar_parser = pgen2.pgen.buildParser(
+            grammar_st, cache=cache, limits=limits, lazy=True, fused=True,
+            start_symbol="line")
+        self.assertTrue(grammar_parser.cache is cache)
+        self.assertTrue(grammar_parser.limits is limits)
+        self.assertTrue(isinstance(grammar_parser.parseGrammar[0],
+                                   pgen2.dfa.LazyAccelerators))
+        self.assertTrue(grammar_parser.labelTable is not None)
+        self.assertEqual(grammar_parser.toTuple(),
+                         plain.specialize("line").toTuple())
+        self.assertEqual(outcome(grammar_parser, "a + 1\n"),
+                         outcome(plain.specialize("line"), "a + 1\n"))
+        self.assertRaises(pgen2.dfa.TokenLimitExceeded,
+                          grammar_parser.parseString, "a" + " + a" * 5 + "\n")
+
+    def test_parse_batch(self):
+        grammar_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(CALC_GRAMMAR))
+        texts = ["a + 1\n", "let a = = 1\n", "", "while + 1\n",
+                 "let b = (a + 2)\nb\n", "(a\n", "a +\n"]
+        results = list(grammar_parser.parseBatch(iter(texts)))
+        self.assertEqual(len(results), len(texts))
+        symbol_map = grammar_parser.symbolToStringMap()
+        for text, (tree, error) in zip(texts, results):
+            if text == "(a\n":
+                self.assertEqual(tree, None)
+                self.assertTrue(isinstance(error, pgen2.pgen.BATCH_ERRORS))
+            elif error is None:
+                self.assertEqual(named_tree(tree, symbol_map),
+                                 outcome(grammar_parser, text))
+            else:
+                self.assertEqual(tree, None)
+                self.assertEqual(str(error), outcome(grammar_parser, text))
+        self.assertEqual([error is None for tree, error in results],
+                         [True, False, True, False, True, False, False])
+        limited = pgen2.pgen.PyPgenParser(
+            grammar_parser.toTuple(),
+            limits=pgen2.dfa.ParseLimits(maxTokens=5))
+        results = list(limited.parse_batch(texts[:2] + texts[4:5]))
+        self.assertEqual(results[0], list(grammar_parser.parseBatch(
+            texts[:1]))[0])
+        self.assertTrue(isinstance(results[1][1], SyntaxError))
+        self.assertTrue(isinstance(results[2][1],
+                                   pgen2.dfa.TokenLimitExceeded))
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_pgen
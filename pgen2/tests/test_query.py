@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import token
+import unittest
+
+import pgen2.parser
+import pgen2.pgen
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Function definitions
+
+def walk(tree):
+    yield tree
+    for child in tree[1]:
+        for node in walk(child):
+            yield node
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestTreeIndex(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.tree = self.parser.parseString(META_GRAMMAR)
+        self.index = self.parser.queryIndex(self.tree)
+
+    def test_find(self):
+        rules = [node for node in walk(self.tree)
+                 if node[0][0] == self.parser.stringToSymbolMap()["rule"]]
+        self.assertEqual(len(rules), 6)
+        self.assertEqual(self.index.find("rule"), rules)
+        self.assertEqual(self.index.count("rule"), 6)
+        names = [node for node in walk(self.tree)
+                 if node[0][0] == token.NAME]
+        self.assertEqual(self.index.find("NAME"), names)
+        self.assertEqual(self.index.find(token.NAME), names)
+        self.assertRaises(KeyError, self.index.find, "no_such_symbol")
+
+    def test_descendants_and_ancestors(self):
+        rule_pos = self.index.positions("rule")[2]
+        rule = self.index.node(rule_pos)
+        self.assertEqual(self.index.find("NAME", rule_pos),
+                         [node for node in walk(rule)
+                          if node[0][0] == token.NAME])
+        self.assertEqual(len(self.index.descendants(rule_pos)),
+                         len(list(walk(rule))) - 1)
+        atom_pos = self.index.positions("atom", rule_pos)[0]
+        self.assertEqual(self.index.ancestors(atom_pos, "rule"), [rule_pos])
+        self.assertEqual(self.index.ancestors(atom_pos)[-1], 0)
+        self.assertTrue(self.index.isAncestor(rule_pos, atom_pos))
+        self.assertFalse(self.index.isAncestor(atom_pos, rule_pos))
+        self.assertFalse(self.index.isAncestor(
+            self.index.positions("rule")[1], atom_pos))
+        self.assertEqual(self.index.typeName(atom_pos), "atom")
+        self.assertEqual(self.index.position(rule), rule_pos)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_query
@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import threading
+import time
+import unittest
+
+import pgen2.registry
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Module data
+
+GRAMMARS = ["start: NAME* ENDMARKER\n",
+            "start: NUMBER* ENDMARKER\n",
+            "start: STRING* ENDMARKER\n"]
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestParserRegistry(unittest.TestCase):
+    def test_lru(self):
+        registry = pgen2.registry.ParserRegistry(maxEntries=2)
+        parsers = [registry.getParser(source) for source in GRAMMARS]
+        keys = [pgen2.registry.sourceFingerprint(source)
+                for source in GRAMMARS]
+        self.assertEqual(len(registry), 2)
+        self.assertFalse(keys[0] in registry)
+        self.assertTrue(registry.getParser(GRAMMARS[2]) is parsers[2])
+        self.assertTrue(registry.get(keys[1]) is parsers[1])
+        registry.getParser(GRAMMARS[0])
+        self.assertEqual([key for key, size in registry.footprints()],
+                         [keys[1], keys[0]])
+        stats = registry.stats()
+        self.assertEqual((stats["builds"], stats["hits"],
+                          stats["evictions"]), (4, 2, 2))
+        self.assertTrue(registry.evict(keys[1]))
+        self.assertFalse(registry.evict(keys[1]))
+        self.assertEqual(registry.stats()["bytes"],
+                         registry.footprint(keys[0]))
+
+    def test_memory_budget(self):
+        registry = pgen2.registry.ParserRegistry()
+        registry.getParser(GRAMMARS[0])
+        large = registry.getParser(META_GRAMMAR)
+        smallSize = registry.footprint(
+            pgen2.registry.sourceFingerprint(GRAMMARS[0]))
+        largeSize = registry.footprint(
+            pgen2.registry.sourceFingerprint(META_GRAMMAR))
+        self.assertTrue(0 < smallSize < largeSize)
+        self.assertEqual(registry.stats()["bytes"], smallSize + largeSize)
+        # A budget fitting only the large grammar evicts the small one; a
+        # parser over the whole budget is returned but not kept.
+        registry = pgen2.registry.ParserRegistry(maxBytes=largeSize)
+        registry.getParser(GRAMMARS[0])
+        registry.getParser(META_GRAMMAR)
+        self.assertEqual(registry.stats()["bytes"], largeSize)
+        registry = pgen2.registry.ParserRegistry(maxBytes=smallSize)
+        self.assertTrue(registry.getParser(META_GRAMMAR) is not None)
+        self.assertEqual(len(registry), 0)
+        # Evicted parsers stay usable.
+        self.assertEqual(large.parseString(META_GRAMMAR)[0][0], large.start)
+
+    def test_single_flight(self):
+        calls = []
+        def builder(source, tokenizer_cls):
+            calls.append(source)
+            time.sleep(0.05)
+            if "bad" in source:
+                raise SyntaxError("bad grammar")
+            return pgen2.registry.buildParser(source, tokenizer_cls)
+        registry = pgen2.registry.ParserRegistry(builder=builder)
+        results = []
+        def worker(source):
+            try:
+                results.append(registry.getParser(source))
+            except SyntaxError as exc:
+                results.append(exc)
+        threads = [threading.Thread(target=worker, args=(source,))
+                   for source in [GRAMMARS[0]] * 4 + ["bad"] * 3]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(calls), ["bad", GRAMMARS[0]])
+        parsers = [result for result in results
+                   if not isinstance(result, SyntaxError)]
+        self.assertEqual(len(parsers), 4)
+        self.assertTrue(all(parser is parsers[0] for parser in parsers))
+        self.assertEqual(len(results), 7)
+        # Failed builds are not cached.
+        self.assertRaises(SyntaxError, registry.getParser, "bad")
+        self.assertEqual(len(calls), 3)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_registry
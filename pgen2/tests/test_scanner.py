@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import sys
+import token
+import unittest
+
+import pgen2.parser
+import pgen2.pgen
+import pgen2.scanner
+
+# ______________________________________________________________________
+# Module data
+
+CALC_GRAMMAR = r'''#%token NAME [A-Za-z_][A-Za-z_0-9]*
+#%token NUMBER [0-9]+(\.[0-9]+)?
+#%token STRING "([^"\\\n]|\\.)*"
+#%token NEWLINE \n
+#%skip SPACE [ \t]+
+#%skip COMMENT //[^\n]*
+#%literal = == + - * / ( ) ;
+prog: (stmt | NEWLINE)* ENDMARKER
+stmt: 'let' NAME '=' expr ';' | expr ';'
+expr: term (('+' | '-' | '==') term)*
+term: atom (('*' | '/') atom)*
+atom: NAME | NUMBER | STRING | '(' expr ')'
+'''
+
+# ______________________________________________________________________
+# Function definitions
+
+def scan(scanner_cls, text):
+    return [(scanner_cls.tok_name[kind], string)
+            for kind, string, lineno in scanner_cls().tokenizeString(text)]
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestScanner(unittest.TestCase):
+    def test_longest_match(self):
+        scanner_cls = pgen2.scanner.makeScanner(
+            [("NAME", "[a-z]+"), ("NUMBER", r"\d+(\.\d*)?"),
+             ("DOTS", r"\.\.+"), ("SPACE", r"\s+")],
+            ["=", "==", "."], ["SPACE"])
+        self.assertEqual(scan(scanner_cls, "a == b=.1. ..\n"),
+                         [("NAME", "a"), ("EQEQUAL", "=="), ("NAME", "b"),
+                          ("EQUAL", "="), ("DOT", "."), ("NUMBER", "1."),
+                          ("DOTS", ".."), ("ENDMARKER", "ENDMARKER")])
+
+    def test_priority(self):
+        scanner_cls = pgen2.scanner.makeScanner(
+            [("HEX", "[0-9a-f]+"), ("NAME", "[a-z]+")])
+        self.assertEqual(scan(scanner_cls, "beef"),
+                         [("HEX", "beef"), ("ENDMARKER", "ENDMARKER")])
+        self.assertEqual(scan(scanner_cls, "beefy"),
+                         [("NAME", "beefy"), ("ENDMARKER", "ENDMARKER")])
+
+    def test_character_classes(self):
+        scanner_cls = pgen2.scanner.makeScanner(
+            [("STRING", r"'[^'\n]*'"), ("NAME", r"\w+"), ("SPACE", r"\s")],
+            skip=["SPACE"])
+        tokens = list(scanner_cls().tokenizeString(u"x 'caf\xe9 \u2603'\ny"))
+        self.assertEqual([string for kind, string, lineno in tokens],
+                         [u"x", u"'caf\xe9 \u2603'", u"y", "ENDMARKER"])
+        self.assertEqual([lineno for kind, string, lineno in tokens],
+                         [1, 1, 2, 2])
+
+    def test_errors(self):
+        makeScanner = pgen2.scanner.makeScanner
+        scanner_cls = makeScanner([("NAME", "[a-z]+"), ("NEWLINE", r"\n")])
+        self.assertRaises(SyntaxError, list,
+                          scanner_cls().tokenizeString("ab\nc?"))
+        self.assertRaises(ValueError, makeScanner, [("NAME", "[a-z]*")])
+        for pattern in ("(ab", "ab)", "[ab", "*a", "[z-a]"):
+            self.assertRaises(SyntaxError, makeScanner, [("NAME", pattern)])
+
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit() + 100
+        scanner_cls = pgen2.scanner.makeScanner(
+            [("NAME", "(" * depth + "[a-z]|_" + ")" * depth + "+"),
+             ("SPACE", " ")], skip=["SPACE"])
+        self.assertEqual(scan(scanner_cls, "ab _c"),
+                         [("NAME", "ab"), ("NAME", "_c"),
+                          ("ENDMARKER", "ENDMARKER")])
+
+    def test_grammar_parser(self):
+        rules, literals, skip = pgen2.scanner.readDefinitions(CALC_GRAMMAR)
+        self.assertEqual(len(rules), 6)
+        self.assertEqual(literals, ["=", "==", "+", "-", "*", "/", "(", ")",
+                                    ";"])
+        self.assertEqual(skip, ["SPACE", "COMMENT"])
+        calc_parser = pgen2.scanner.buildParser(CALC_GRAMMAR)
+        tree = calc_parser.parseString(
+            'let x = 3.5 * (y + "a\\"b"); // note\n\nx == 1;\n')
+        stmts = [child for child in tree[1]
+                 if child[0][0] == calc_parser.stringToSymbolMap()["stmt"]]
+        self.assertEqual(len(stmts), 2)
+        self.assertEqual(stmts[0][1][0][0], (token.NAME, "let", 1))
+        self.assertEqual(stmts[1][1][0][0][2], 3)
+        self.assertRaises(SyntaxError, calc_parser.parseString,
+                          "let 1 = x;\n")
+        # The same scanner class plugs into pgen2.pgen.buildParser().
+        scanner_cls = pgen2.scanner.makeScanner(rules, literals, skip)
+        other_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(CALC_GRAMMAR), scanner_cls)
+        self.assertEqual(other_parser.parseString("x;\n"),
+                         calc_parser.parseString("x;\n"))
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_scanner
@@ -0,0 +1,90 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pgen2.parser
+import pgen2.pgen
+import pgen2.sharedgrammar
+import pgen2.tokenizer
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+# ______________________________________________________________________
+# Function definitions
+
+def meta_tokens(text=META_GRAMMAR):
+    return list(pgen2.tokenizer.Tokenizer().tokenizeString(text))
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestSharedGrammar(unittest.TestCase):
+    def setUp(self):
+        self.parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.grammar = self.parser.toTuple()
+        self.expected = self.parser.parseString(META_GRAMMAR)
+
+    def check(self, shared):
+        self.assertEqual(shared.parse(meta_tokens()), self.expected)
+        self.assertEqual(shared.stringToSymbolMap(),
+                         self.parser.stringToSymbolMap())
+        for text in ("a: : b\n", "a: b\n: c\n", "a: b\nc\n"):
+            try:
+                self.parser.parseString(text)
+            except SyntaxError as exc:
+                expected = str(exc)
+            try:
+                shared.parse(meta_tokens(text))
+            except SyntaxError as exc:
+                self.assertEqual(str(exc), expected)
+            else:
+                self.fail("SyntaxError not raised for %r" % (text,))
+
+    def test_flatten(self):
+        data = pgen2.sharedgrammar.flatten(self.grammar)
+        self.check(pgen2.sharedgrammar.SharedGrammar(data))
+        self.assertRaises(ValueError, pgen2.sharedgrammar.SharedGrammar,
+                          b"\0" * 64)
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, "meta.pgg")
+            pgen2.sharedgrammar.writeFile(self.grammar, filename)
+            shared = pgen2.sharedgrammar.openFile(filename)
+            self.check(shared)
+            shared.release()
+        finally:
+            shutil.rmtree(directory)
+
+    @unittest.skipIf(shared_memory is None, "needs Python 3.8+")
+    def test_shared_memory(self):
+        block = pgen2.sharedgrammar.publish(self.grammar)
+        try:
+            worker_block, shared = pgen2.sharedgrammar.attach(block.name)
+            self.check(shared)
+            shared.release()
+            worker_block.close()
+        finally:
+            block.close()
+            block.unlink()
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_sharedgrammar
@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+# Module imports
+
+import threading
+import unittest
+
+import pgen2.dfa
+import pgen2.parser
+import pgen2.pgen
+import pgen2.tokenizer
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR, META_GRAMMAR_PATH
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestTokenStream(unittest.TestCase):
+    def test_streams(self):
+        tokenizer = pgen2.tokenizer.Tokenizer()
+        expected = list(pgen2.tokenizer.Tokenizer().tokenizeString(
+            META_GRAMMAR))
+        first = tokenizer.tokenStreamString(META_GRAMMAR)
+        second = tokenizer.tokenStreamString("a: b\n")
+        self.assertEqual(next(first), expected[0])
+        self.assertEqual(list(second)[0][1], "a")
+        self.assertEqual(first.last[1], expected[0][1])
+        self.assertEqual(list(first), expected[1:])
+        self.assertFalse(hasattr(tokenizer, "last"))
+        stream = tokenizer.tokenStreamFile(META_GRAMMAR_PATH)
+        self.assertEqual(list(stream), expected)
+        self.assertTrue(stream.infile.closed)
+
+    def test_shared_parser(self):
+        grammar_ast = pgen2.parser.parse_string(META_GRAMMAR)
+        grammar_parser = pgen2.pgen.buildParser(grammar_ast)
+        inputs = [META_GRAMMAR, "a: b\n", "a: (b | c)* d\n"]
+        expected = [pgen2.pgen.buildParser(grammar_ast).parseString(text)
+                    for text in inputs]
+        results = {}
+        def work(index):
+            results[index] = [grammar_parser.parseString(inputs[count % 3])
+                              for count in range(index, index + 30)]
+        threads = [threading.Thread(target=work, args=(index,))
+                   for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for index in range(8):
+            self.assertEqual(results[index],
+                             [expected[count % 3]
+                              for count in range(index, index + 30)])
+
+    def test_label_stream(self):
+        grammar = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR)).toTuple()
+        tokenizer = pgen2.tokenizer.Tokenizer()
+        table = tokenizer.labelTable(grammar)
+        text = META_GRAMMAR + "a: b '+' [c] 1\n"
+        expected = list(tokenizer.tokenStreamString(text))
+        labeled = list(tokenizer.labelStreamString(text, table))
+        self.assertEqual([token[1:] for token in labeled], expected)
+        self.assertEqual([token[0] for token in labeled],
+                         [pgen2.dfa.classify(grammar, type, name)
+                          for type, name, lineno in expected])
+        self.assertTrue(-1 in [token[0] for token in labeled])
+        plain = pgen2.pgen.PyPgenParser(grammar)
+        fused = pgen2.pgen.PyPgenParser(grammar, fused=True)
+        self.assertEqual(fused.parseString(META_GRAMMAR),
+                         plain.parseString(META_GRAMMAR))
+        self.assertEqual(fused.parseFile(META_GRAMMAR_PATH),
+                         plain.parseString(META_GRAMMAR))
+        for bad in ("a: : b\n", "a: b 1\n"):
+            self.assertRaises(SyntaxError, fused.parseString, bad)
+
+    def test_overridden_tokenize(self):
+        calls = []
+        class CountingTokenizer(pgen2.tokenizer.Tokenizer):
+            def tokenize(self, stream):
+                calls.append(stream)
+                return pgen2.tokenizer.Tokenizer.tokenize(self, stream)
+        grammar = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR)).toTuple()
+        expected = pgen2.pgen.PyPgenParser(grammar).parseString(META_GRAMMAR)
+        for fused in (False, True):
+            grammar_parser = pgen2.pgen.PyPgenParser(grammar,
+                                                     CountingTokenizer,
+                                                     fused=fused)
+            del calls[:]
+            self.assertEqual(grammar_parser.parseString(META_GRAMMAR),
+                             expected)
+            self.assertEqual(grammar_parser.parseFile(META_GRAMMAR_PATH),
+                             expected)
+            self.assertEqual(len(calls), 2)
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_tokenizer
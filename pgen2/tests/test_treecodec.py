@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# ______________________________________________________________________
+# Module imports
+
+import io
+import unittest
+
+import pgen2.parser
+import pgen2.pgen
+import pgen2.treecodec
+
+from pgen2.tests.test_meta_grammar import META_GRAMMAR
+
+# ______________________________________________________________________
+# Class definitions
+
+class TestTreeCodec(unittest.TestCase):
+    def setUp(self):
+        grammar_parser = pgen2.pgen.buildParser(
+            pgen2.parser.parse_string(META_GRAMMAR))
+        self.tree = grammar_parser.parseString(META_GRAMMAR)
+
+    def test_round_trip(self):
+        data = pgen2.treecodec.dumps(self.tree)
+        self.assertTrue(data.startswith(pgen2.treecodec.MAGIC))
+        self.assertEqual(pgen2.treecodec.loads(data), self.tree)
+        odd_tree = ((300, None, 70000), [((1, "été", 3), []),
+                                         ((1, "été", 2), []),
+                                         ((1000000, "", 0), [])])
+        self.assertEqual(pgen2.treecodec.loads(
+            pgen2.treecodec.dumps(odd_tree)), odd_tree)
+
+    def test_streaming(self):
+        fileObj = io.BytesIO()
+        writer = pgen2.treecodec.TreeWriter(fileObj)
+        for count in range(3):
+            writer.write(self.tree)
+        writer.close()
+        chunk_size = pgen2.treecodec.CHUNK_SIZE
+        pgen2.treecodec.CHUNK_SIZE = 16
+        try:
+            fileObj.seek(0)
+            self.assertEqual(list(pgen2.treecodec.TreeReader(fileObj)),
+                             [self.tree] * 3)
+        finally:
+            pgen2.treecodec.CHUNK_SIZE = chunk_size
+        fileObj.seek(0)
+        nodes = list(pgen2.treecodec.TreeReader(fileObj).iterNodes())
+        self.assertEqual(nodes[0], (256, None, 0, len(self.tree[1])))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, pgen2.treecodec.loads, b"nope")
+        data = pgen2.treecodec.dumps(self.tree)
+        self.assertRaises(ValueError, pgen2.treecodec.loads, data[:-3])
+
+# ______________________________________________________________________
+# Main (test) routine
+
+if __name__ == "__main__":
+    unittest.main()
+
+# ______________________________________________________________________
+# End of pgen2.tests.test_treecodec
@@ -197,24 +197,134 @@ class Tokenizer (object) :
         During the iteration, two more attributes can be used:
          - self.last: last recognized token (ie, last yielded)
          - self.infile: the input stream passed to method tokenize
+
+        Since this state lives on the instance, use tokenStream() instead
+        when the Tokenizer is shared between threads.
         """
         self.infile = stream
-        self.last = None
+        return self._generate(stream, self)
+
+    def _generate (self, stream, state) :
+        """Generator behind tokenize() and TokenStream.
+
+        The last recognized token is stored in state.last; nothing else is
+        written, so a configured Tokenizer can be shared between threads
+        as long as each tokenization has its own state object.
+        """
+        state.last = None
         err = self.ERRORTOKEN
+        extra = self._extra
+        skip = self._skip
+        op = self.OP
+        operatorMap = self.operatorMap
+        tok_name = self.tok_name
         for token in tokenize.generate_tokens(stream.readline) :
             if token[0] == err :
                 try :
-                    token = (self._extra[token[1]],) + token[1:]
+                    token = (extra[token[1]],) + token[1:]
                 except :
                     raise SyntaxError(token)
-            elif token[0] in self._skip :
+            elif token[0] in skip :
                 continue
-            elif token[0] == self.OP :
-                token = (self.operatorMap[token[1]],) + token[1:]
-            self.last = token
-            yield (self.last[0],
-                   self.last[1] or self.tok_name[self.last[0]],
-                   self.last[2][0])
+            elif token[0] == op :
+                token = (operatorMap[token[1]],) + token[1:]
+            state.last = token
+            yield (token[0], token[1] or tok_name[token[0]], token[2][0])
+
+    def labelTable (self, grammar) :
+        """Specialize this tokenizer to a compiled grammar.
+
+        Returns a (keywords, kinds, operators) table for labelStream():
+        keywords maps keyword strings to NAME labels, kinds maps token
+        kinds to labels, and operators maps operator literals to their
+        (kind, label) pair.  Tokens the grammar does not use get label -1,
+        like pgen2.dfa.classify() gives them.
+        """
+        from .dfa import labelMaps
+        keywords, kinds = labelMaps(grammar)
+        operators = dict((txt, (kind, kinds.get(kind, -1)))
+                         for txt, kind in self.operatorMap.items())
+        return keywords, kinds, operators
+
+    def _generateLabels (self, stream, state, table) :
+        """Generator behind labelStream().
+
+        Same as _generate(), but yields (label, kind, text, line number)
+        tuples, looking the labels up in a table built by labelTable().
+        """
+        keywords, kinds, operators = table
+        state.last = None
+        err = self.ERRORTOKEN
+        extra = self._extra
+        skip = self._skip
+        op = self.OP
+        name = self.NAME
+        if name in skip :
+            name = None
+        nameLabel = kinds.get(name, -1)
+        tok_name = self.tok_name
+        for token in tokenize.generate_tokens(stream.readline) :
+            kind = token[0]
+            if kind == name :
+                state.last = token
+                yield (keywords.get(token[1], nameLabel), kind, token[1],
+                       token[2][0])
+                continue
+            elif kind == err :
+                try :
+                    token = (extra[token[1]],) + token[1:]
+                except :
+                    raise SyntaxError(token)
+                kind = token[0]
+                label = kinds.get(kind, -1)
+            elif kind in skip :
+                continue
+            elif kind == op :
+                kind, label = operators[token[1]]
+                token = (kind,) + token[1:]
+            else :
+                label = kinds.get(kind, -1)
+            state.last = token
+            yield (label, kind, token[1] or tok_name[kind], token[2][0])
+
+    def labelStream (self, stream, table, filename = None) :
+        """Fused variant of tokenStream().
+
+        Returns a TokenStream yielding (label, kind, text, line number)
+        tokens, where label is the index in the grammar's label list that
+        pgen2.dfa.classify() would give; table comes from labelTable().
+        Parse the tokens with pgen2.dfa.parseLabelTokens().
+        """
+        return TokenStream(self, stream, filename, False, table)
+
+    def labelStreamString (self, inString, table) :
+        """Fused variant of tokenStreamString().
+        """
+        return TokenStream(self, io.StringIO(inString), "<string>", False,
+                           table)
+
+    def tokenStream (self, stream, filename = None) :
+        """Thread-safe variant of tokenize().
+
+        Returns a TokenStream iterating over the tokens of stream; the
+        per-tokenization state (last, infile, filename) lives on the
+        TokenStream instead of on the Tokenizer.
+        """
+        return TokenStream(self, stream, filename)
+
+    def tokenStreamString (self, inString) :
+        """Thread-safe variant of tokenizeString().
+        """
+        return TokenStream(self, io.StringIO(inString), "<string>")
+
+    def tokenStreamFile (self, filename) :
+        """Thread-safe variant of tokenizeFile().
+
+        The file is closed once the stream is exhausted (or by calling
+        the stream's close() method).
+        """
+        return TokenStream(self, open(filename), filename, True)
+
    # ____________________________________________________________
     def getOperatorMap (self):
         """getOperatorMap
@@ -241,6 +351,56 @@ class Tokenizer (object) :
 
 # ______________________________________________________________________
 
+class TokenStream (object) :
+    """Iterator over the tokens of a single input.
+
+    Created by Tokenizer.tokenStream() and friends; holds all the state of
+    one tokenization (the Tokenizer only holds configuration):
+     - self.tokenizer: the Tokenizer instance
+     - self.infile: the input stream
+     - self.filename: the input file name, or None
+     - self.last: last recognized token (ie, last yielded)
+    If a label table is given (see Tokenizer.labelStream()), the tokens
+    carry their grammar label index in front.
+    """
+    # ____________________________________________________________
+    def __init__ (self, tokenizer, stream, filename = None, owner = False,
+                  labels = None):
+        self.tokenizer = tokenizer
+        self.infile = stream
+        self.filename = filename
+        self.owner = owner
+        self.last = None
+        if labels is None:
+            self._tokens = tokenizer._generate(stream, self)
+        else:
+            self._tokens = tokenizer._generateLabels(stream, self, labels)
+
+    # ____________________________________________________________
+    def __iter__ (self):
+        return self
+
+    # ____________________________________________________________
+    def __next__ (self):
+        try:
+            return next(self._tokens)
+        except StopIteration:
+            self.close()
+            raise
+
+    next = __next__
+
+    # ____________________________________________________________
+    def close (self):
+        """TokenStream.close()
+        Closes the input stream if the TokenStream opened it.
+        """
+        if self.owner:
+            self.infile.close()
+            self.owner = False
+
+# ______________________________________________________________________
+
 class TokenizerFactory:
     """
     Deprecated.  Just construct a Tokenizer instance.
@@ -0,0 +1,354 @@
+#! /usr/bin/env python
+# ______________________________________________________________________
+"""Module pgen2.treecodec
+
+Compact binary serialization for parse trees built by pgen2.dfa.parsetok().
+
+Tree := ( ( Type : Int, String : String or None, Lineno : Int ), [ Tree ] )
+
+A stream starts with the 4 byte MAGIC header, followed by the nodes of one
+or more trees in preorder.  Each node is written as four unsigned LEB128
+varints:
+
+Node := Type, StringRef, LinenoDelta, ChildCount
+
+StringRef is 0 for None, 1 for a new string (followed by its UTF-8 length
+and bytes, which then get the next slot in the string table), or 2 + the
+string table index of a string seen earlier in the stream.  LinenoDelta is
+the zigzag encoded difference from the previous node's line number.
+
+Both TreeWriter and TreeReader work incrementally on file objects, so
+arbitrarily many trees can be streamed between processes or to disk
+without holding the whole encoding in memory.
+"""
+# ______________________________________________________________________
+# Module imports
+
+from __future__ import absolute_import
+
+import io
+import sys
+
+# ______________________________________________________________________
+# Module data
+
+MAGIC = b"PGT\x01"
+
+# Bytes buffered before TreeWriter flushes, and read at a time by
+# TreeReader.
+CHUNK_SIZE = 1 << 16
+
+# Upper bound on the encoded size of a node's four varints.
+MAX_NODE_HEADER = 40
+
+if sys.version_info[0] < 3:
+    def _encodeString (string):
+        if isinstance(string, unicode):
+            return string.encode("utf-8")
+        return string
+    def _decodeString (data):
+        return bytes(data)
+else:
+    def _encodeString (string):
+        return string.encode("utf-8")
+    def _decodeString (data):
+        return data.decode("utf-8")
+
+# ______________________________________________________________________
+
+class TreeWriter (object):
+    """Class TreeWriter
+
+    Streams trees to a binary file object.  Call close() (or flush()) when
+    done; close() does not close the underlying file object.
+    """
+    # ____________________________________________________________
+    def __init__ (self, fileObj):
+        """TreeWriter.__init__
+        """
+        self.fileObj = fileObj
+        self.strings = {}
+        self.lineno = 0
+        self.buffer = bytearray(MAGIC)
+
+    # ____________________________________________________________
+    def write (self, tree):
+        """TreeWriter.write
+        Appends one tree to the stream.
+        """
+        out = self.buffer
+        strings = self.strings
+        lineno = self.lineno
+        stack = [tree]
+        while stack:
+            (nodeType, string, nodeLineno), children = stack.pop()
+            # Type
+            value = nodeType
+            while value > 0x7f:
+                out.append((value & 0x7f) | 0x80)
+                value >>= 7
+            out.append(value)
+            # String reference
+            if string is None:
+                out.append(0)
+            else:
+                value = strings.get(string)
+                if value is None:
+                    strings[string] = len(strings) + 2
+                    data = _encodeString(string)
+                    out.append(1)
+                    value = len(data)
+                    while value > 0x7f:
+                        out.append((value & 0x7f) | 0x80)
+                        value >>= 7
+                    out.append(value)
+                    out.extend(data)
+                else:
+                    while value > 0x7f:
+                        out.append((value & 0x7f) | 0x80)
+                        value >>= 7
+                    out.append(value)
+            # Line number delta
+            value = nodeLineno - lineno
+            lineno = nodeLineno
+            if value < 0:
+                value = (-value << 1) - 1
+            else:
+                value <<= 1
+            while value > 0x7f:
+                out.append((value & 0x7f) | 0x80)
+                value >>= 7
+            out.append(value)
+            # Child count
+            value = len(children)
+            while value > 0x7f:
+                out.append((value & 0x7f) | 0x80)
+                value >>= 7
+            out.append(value)
+            stack.extend(reversed(children))
+            if len(out) >= CHUNK_SIZE:
+                self.fileObj.write(bytes(out))
+                del out[:]
+        self.lineno = lineno
+
+    # ____________________________________________________________
+    def flush (self):
+        """TreeWriter.flush
+        """
+        if self.buffer:
+            self.fileObj.write(bytes(self.buffer))
+            del self.buffer[:]
+        if hasattr(self.fileObj, "flush"):
+            self.fileObj.flush()
+
+    # ____________________________________________________________
+    def close (self):
+        """TreeWriter.close
+        """
+        self.flush()
+
+# ______________________________________________________________________
+
+class TreeReader (object):
+    """Class TreeReader
+
+    Streams trees (or, with iterNodes(), bare preorder node records) back
+    from a binary file object written by TreeWriter.  Iterating over a
+    TreeReader yields each tree in the stream.
+    """
+    # ____________________________________________________________
+    def __init__ (self, fileObj):
+        """TreeReader.__init__
+        """
+        self.fileObj = fileObj
+        self.strings = []
+        self.lineno = 0
+        self.buffer = bytearray()
+        self.pos = 0
+        self.eof = False
+        if self.fill(len(MAGIC)) < len(MAGIC):
+            raise ValueError("Truncated tree stream header.")
+        if bytes(self.buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a pgen2 tree stream.")
+        self.pos = len(MAGIC)
+
+    # ____________________________________________________________
+    def fill (self, count):
+        """TreeReader.fill
+        Reads from the file until at least count bytes past the current
+        position are buffered, or the file ends.  Returns the number of
+        bytes available.
+        """
+        buf = self.buffer
+        if self.pos > CHUNK_SIZE:
+            del buf[:self.pos]
+            self.pos = 0
+        while (not self.eof) and (len(buf) - self.pos < count):
+            data = self.fileObj.read(max(CHUNK_SIZE, count))
+            if not data:
+                self.eof = True
+            else:
+                buf.extend(data)
+        return len(buf) - self.pos
+
+    # ____________________________________________________________
+    def readVarint (self, buf, pos):
+        """TreeReader.readVarint
+        Slow path for multi-byte varints; returns (value, new position).
+        """
+        shift = value = 0
+        byte = buf[pos]
+        pos += 1
+        while byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            byte = buf[pos]
+            pos += 1
+        return value | (byte << shift), pos
+
+    # ____________________________________________________________
+    def readNode (self):
+        """TreeReader.readNode
+        Returns the next (type, string, lineno, childCount) record, or None
+        at the end of the stream.
+        """
+        if self.fill(MAX_NODE_HEADER) == 0:
+            return None
+        buf = self.buffer
+        pos = self.pos
+        try:
+            # Type
+            nodeType = buf[pos]
+            if nodeType & 0x80:
+                nodeType, pos = self.readVarint(buf, pos)
+            else:
+                pos += 1
+            # String reference
+            string = buf[pos]
+            if string & 0x80:
+                string, pos = self.readVarint(buf, pos)
+            else:
+                pos += 1
+            if 0 == string:
+                string = None
+            elif 1 == string:
+                length, pos = self.readVarint(buf, pos)
+                self.pos = pos
+                if self.fill(length + MAX_NODE_HEADER) < length:
+                    raise IndexError()
+                buf = self.buffer
+                pos = self.pos
+                string = _decodeString(buf[pos:pos + length])
+                pos += length
+                self.strings.append(string)
+            else:
+                string = self.strings[string - 2]
+            # Line number delta
+            delta = buf[pos]
+            if delta & 0x80:
+                delta, pos = self.readVarint(buf, pos)
+            else:
+                pos += 1
+            if delta & 1:
+                self.lineno -= (delta + 1) >> 1
+            else:
+                self.lineno += delta >> 1
+            # Child count
+            childCount = buf[pos]
+            if childCount & 0x80:
+                childCount, pos = self.readVarint(buf, pos)
+            else:
+                pos += 1
+        except IndexError:
+            raise ValueError("Truncated tree stream.")
+        self.pos = pos
+        return nodeType, string, self.lineno, childCount
+
+    # ____________________________________________________________
+    def iterNodes (self):
+        """TreeReader.iterNodes
+        Yields the (type, string, lineno, childCount) records of the stream
+        in preorder, without building trees.
+        """
+        node = self.readNode()
+        while node is not None:
+            yield node
+            node = self.readNode()
+
+    # ____________________________________________________________
+    def read (self):
+        """TreeReader.read
+        Returns the next tree in the stream, or None at the end of it.
+        """
+        root = None
+        stack = []
+        while 1:
+            record = self.readNode()
+            if record is None:
+                if stack:
+                    raise ValueError("Truncated tree stream.")
+                return None
+            nodeType, string, lineno, childCount = record
+            node = ((nodeType, string, lineno), [])
+            if stack:
+                top = stack[-1]
+                top[0].append(node)
+                top[1] -= 1
+            else:
+                root = node
+            if childCount:
+                stack.append([node[1], childCount])
+            else:
+                while stack and (0 == stack[-1][1]):
+                    stack.pop()
+            if not stack:
+                return root
+
+    # ____________________________________________________________
+    def __iter__ (self):
+        tree = self.read()
+        while tree is not None:
+            yield tree
+            tree = self.read()
+
+# ______________________________________________________________________
+
+def dump (tree, fileObj):
+    """dump()
+    Writes a single tree to a binary file object.
+    """
+    writer = TreeWriter(fileObj)
+    writer.write(tree)
+    writer.close()
+
+# ______________________________________________________________________
+
+def load (fileObj):
+    """load()
+    Reads a single tree from a binary file object.
+    """
+    tree = TreeReader(fileObj).read()
+    if tree is None:
+        raise ValueError("Empty tree stream.")
+    return tree
+
+# ______________________________________________________________________
+
+def dumps (tree):
+    """dumps()
+    Returns the encoding of a single tree as a byte string.
+    """
+    fileObj = io.BytesIO()
+    dump(tree, fileObj)
+    return fileObj.getvalue()
+
+# ______________________________________________________________________
+
+def loads (data):
+    """loads()
+    Decodes a single tree from a byte string.
+    """
+    return load(io.BytesIO(data))
+
+# ______________________________________________________________________
+# End of pgen2.treecodec